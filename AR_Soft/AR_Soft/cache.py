@@ -0,0 +1,244 @@
+"""
+Versioned read-through cache for reference data.
+
+Rarely changing data (ration components, ration tables, animal groups) is
+read through two tiers: a small in-process LRU and the shared
+``REFERENCE_CACHE_ALIAS`` Django cache (Redis in production), before
+falling back to the loader that hits the database.
+
+Every namespace has a version number stored in the shared cache and part of
+every key. Invalidating a namespace bumps the version, which orphans all of
+its entries at once instead of deleting them one by one; they expire with
+their timeout. Other processes notice the new version within
+``VERSION_TTL`` seconds, the longest their local tier may serve stale data.
+
+A shared cache that cannot be reached is skipped for ``RETRY_AFTER`` seconds
+and reads fall through to the database, so a Redis outage slows requests
+down but does not fail them.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .transactions import OnCommitBatch
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SIZE = 512
+VERSION_TTL = 5
+RETRY_AFTER = 30
+
+_MISSING = object()
+_registry = {}
+
+
+class LocalLRU:
+    """Thread-safe least-recently-used map with a per-entry expiry."""
+
+    def __init__(self, size=LOCAL_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ReferenceCache:
+    """
+    Read-through cache of one namespace.
+
+    ``get(key, loader)`` returns the cached value or stores ``loader()``;
+    ``get_many(keys, loader)`` does the same for a batch, calling
+    ``loader(missing_keys)`` once with every key neither tier had.
+    ``None`` is a valid cached value.
+    """
+
+    def __init__(self, namespace, timeout=None, local_ttl=VERSION_TTL, local_size=LOCAL_SIZE):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local_ttl = local_ttl
+        self.local = LocalLRU(local_size)
+        self.metrics = Counter()
+        self._version = None
+        self._version_expires_at = 0
+        self._shared_down_until = 0
+        _registry[namespace] = self
+
+    @property
+    def shared(self):
+        return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+    def get_timeout(self):
+        return self.timeout if self.timeout is not None else getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 600)
+
+    def call_shared(self, method, *args):
+        """Run a shared cache call, or return None while the shared cache is unreachable."""
+        if time.monotonic() < self._shared_down_until:
+            return None
+        try:
+            return getattr(self.shared, method)(*args)
+        except ValueError:
+            return None  # incr() of a key that does not exist
+        except Exception as exc:
+            self.metrics['errors'] += 1
+            self._shared_down_until = time.monotonic() + RETRY_AFTER
+            logger.warning("Reference cache unreachable (%s); reading %s from the database.", exc, self.namespace)
+            return None
+
+    def new_version(self):
+        """A time-based version, so an evicted counter never brings old entries back."""
+        return max(int(time.time() * 1000), (self._version or 0) + 1)
+
+    @property
+    def version_key(self):
+        return f'{self.namespace}:version'
+
+    def version(self):
+        if self._version is not None and time.monotonic() < self._version_expires_at:
+            return self._version
+        version = self.call_shared('get', self.version_key)
+        if version is None:
+            version = self.new_version()
+            self.call_shared('add', self.version_key, version, None)
+        if version != self._version:
+            self.local.clear()
+        self._version, self._version_expires_at = version, time.monotonic() + self.local_ttl
+        return version
+
+    def make_key(self, key, version):
+        return f'{self.namespace}:{version}:{key}'
+
+    def get(self, key, loader):
+        return self.get_many([key], lambda keys: {key: loader()})[key]
+
+    def get_many(self, keys, loader):
+        keys = list(dict.fromkeys(keys))
+        if PendingBump.find(key=self) is not None:
+            self.metrics['bypasses'] += len(keys)
+            loaded = loader(keys)
+            return {key: loaded.get(key) for key in keys}
+
+        version = self.version()
+        found = {}
+        for key in keys:
+            value = self.local.get(self.make_key(key, version))
+            if value is not _MISSING:
+                found[key] = value
+        self.metrics['local_hits'] += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.call_shared('get_many', [self.make_key(key, version) for key in missing]) or {}
+            for key in missing:
+                cache_key = self.make_key(key, version)
+                if cache_key in shared:
+                    found[key] = shared[cache_key]
+                    self.local.set(cache_key, found[key], self.local_ttl)
+                    self.metrics['shared_hits'] += 1
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            self.metrics['misses'] += len(missing)
+            loaded = loader(missing)
+            values = {self.make_key(key, version): loaded.get(key) for key in missing}
+            self.call_shared('set_many', values, self.get_timeout())
+            for key in missing:
+                found[key] = loaded.get(key)
+                self.local.set(self.make_key(key, version), found[key], self.local_ttl)
+        return found
+
+    def invalidate(self):
+        """
+        Orphan every entry of the namespace. Inside a transaction the bump is
+        repeated on commit, and until then this connection reads around the
+        cache, so uncommitted rows are never cached for other processes.
+        """
+        self.bump()
+        if transaction.get_connection().in_atomic_block:
+            PendingBump.current(key=self)
+
+    def bump(self):
+        self.metrics['invalidations'] += 1
+        self.local.clear()
+        version = self.call_shared('incr', self.version_key)
+        if version is None:
+            version = self.new_version()
+            self.call_shared('set', self.version_key, version, None)
+        self._version, self._version_expires_at = version, time.monotonic() + self.local_ttl
+
+    def stats(self):
+        lookups = self.metrics['local_hits'] + self.metrics['shared_hits'] + self.metrics['misses']
+        hits = self.metrics['local_hits'] + self.metrics['shared_hits']
+        return {
+            **{name: self.metrics[name] for name in ('local_hits', 'shared_hits', 'misses', 'bypasses', 'errors', 'invalidations')},
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+        }
+
+    def reset(self):
+        """Forget the local tier, the memoized version and the metrics."""
+        self.local.clear()
+        self.metrics.clear()
+        self._version = None
+        self._shared_down_until = 0
+
+
+class PendingBump(OnCommitBatch):
+    """On-commit bump of a namespace (the ``key``) invalidated inside a transaction."""
+
+    def run(self):
+        self.key.bump()
+
+
+def reference_caches():
+    return dict(_registry)
+
+
+def reference_cache_stats():
+    """Hit/miss counters of every namespace in this process."""
+    return {namespace: cache.stats() for namespace, cache in sorted(_registry.items())}
+
+
+class CachedListMixin:
+    """
+    Serve the unfiltered list of a view from a ``ReferenceCache``.
+
+    Only plain ``GET`` lists without query parameters are cached; filtered,
+    paginated and exported lists always hit the database.
+    """
+    list_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_cache is None or request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        def load():
+            # Plain dicts: DRF's ReturnDict/ReturnList carry the serializer along
+            return [dict(row) for row in super(CachedListMixin, self).list(request, *args, **kwargs).data]
+        return Response(self.list_cache.get('list', load))
@@ -0,0 +1,74 @@
+"""
+Conditional GET (ETag / Last-Modified) for polled endpoints.
+
+The validators of a list are computed with one aggregate query over the
+filtered queryset (its row count and latest modification time), so a poll
+of an unchanged list is answered with 304 Not Modified before anything is
+loaded or serialized. Views with a ``list_cache`` keep the validators of the
+unfiltered list in it, so polling that list costs no query at all.
+"""
+import calendar
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_response(request, etag, last_modified, build):
+    """
+    Return 304/412 when the request's preconditions say the client copy is
+    current, else ``build()`` with the ``ETag``/``Last-Modified`` headers set.
+    """
+    timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+class ConditionalListMixin:
+    """
+    ETag/Last-Modified validators for a list view.
+
+    ``last_modified_fields`` are the timestamps whose maximum changes when a
+    listed row does (``updated_at``, or a related row's). Views whose rows
+    carry no such timestamp leave it empty and set ``validator_cache`` to a
+    ``ReferenceCache`` whose version is bumped on every change; they send an
+    ETag only.
+    """
+    last_modified_fields = ('updated_at',)
+    validator_cache = None
+
+    def get_list_validators(self, queryset):
+        aggregates = {f'last_modified_{i}': Max(field) for i, field in enumerate(self.last_modified_fields)}
+        row = queryset.order_by().aggregate(rows=Count('pk', distinct=True), **aggregates)
+        timestamps = [row[name] for name in aggregates if row[name] is not None]
+        last_modified = max(timestamps) if timestamps else None
+        version = self.validator_cache.version() if self.validator_cache is not None else None
+
+        etag = make_etag(queryset.model._meta.label, self.request.get_full_path(),
+                         getattr(self.request.accepted_renderer, 'media_type', None),
+                         row['rows'], last_modified, version)
+        return etag, last_modified if self.last_modified_fields else None
+
+    def list(self, request, *args, **kwargs):
+        def validators():
+            return self.get_list_validators(self.filter_queryset(self.get_queryset()))
+
+        # The unfiltered list's validators are kept next to it in the list cache
+        list_cache = getattr(self, 'list_cache', None)
+        if list_cache is not None and not request.query_params:
+            etag, last_modified = list_cache.get(f'validators:{request.accepted_renderer.media_type}', validators)
+        else:
+            etag, last_modified = validators()
+        return conditional_response(request, etag, last_modified,
+                                    lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs))
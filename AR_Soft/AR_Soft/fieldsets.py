@@ -0,0 +1,56 @@
+"""
+Sparse fieldsets: ``?fields=id,eartag,room`` or ``?exclude=created_at``.
+
+``SparseFieldsetMixin`` trims the fields of the top-level serializer of a
+read request to the requested ones. The view's queryset is then projected
+onto the columns those fields read (``AR_Soft.optimizer``), so the columns
+that are not rendered are not read from the database either, and a list of
+plain columns is read with ``values()`` without building model instances.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def split_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def sparse_fieldset(request):
+    """``(fields, exclude)`` names asked for by a read request, or ``None``."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if FIELDS_PARAM not in params and EXCLUDE_PARAM not in params:
+        return None
+    fields = split_names(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    return fields, split_names(params.get(EXCLUDE_PARAM, ''))
+
+
+def select_fields(available, fieldset):
+    """
+    The names of ``available`` kept by ``fieldset`` (``(fields, exclude)``), in
+    their declared order. Unknown names are a client error.
+    """
+    fields, exclude = fieldset
+    unknown = [name for name in (fields or []) + exclude if name not in available]
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: f"Unknown fields: {', '.join(unknown)}. "
+                                             f"Available: {', '.join(available)}."})
+    return [name for name in available if (fields is None or name in fields) and name not in exclude]
+
+
+class SparseFieldsetMixin:
+    """Render only the fields named by ``?fields=``/``?exclude=`` on a read request."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = getattr(self, 'parent', None)
+        root = getattr(parent, 'parent', None) if isinstance(parent, ListSerializer) else parent
+        fieldset = sparse_fieldset(self.context.get('request')) if root is None else None
+        if fieldset is None:
+            return fields
+        return {name: fields[name] for name in select_fields(list(fields), fieldset)}
@@ -0,0 +1,241 @@
+"""
+Per-request query count and latency instrumentation.
+
+``RequestMetricsMiddleware`` measures every request: the SQL queries run and
+the time spent in the database (through ``connection.execute_wrapper`` on
+every connection), the time spent rendering the response body, and the total
+latency. Measurements are aggregated per resolved URL name in this process
+and exposed in the Prometheus text format (``render_prometheus``, served by
+``MetricsView``). With ``REQUEST_METRICS_HEADERS`` (``DEBUG`` by default)
+they are also sent back as ``X-Query-Count`` and ``Server-Timing`` headers.
+
+Serializers are evaluated by the view before the response is rendered, so
+the queries they trigger count towards the request's queries and database
+time; ``serialize`` is the renderer turning the serialized data into bytes.
+The body of a streaming response is produced after the middleware returns
+and is not part of the latency.
+
+Each measurement is also sent as the ``request_measured`` signal, which
+``AR_Soft.testing.QueryBudgetMixin`` uses to enforce per-endpoint query
+budgets in tests.
+"""
+import copy
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+from .cache import reference_cache_stats
+
+UNRESOLVED = '<unresolved>'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+request_measured = Signal()  # sender=RequestMetricsMiddleware, metrics=RequestMetrics
+
+
+class RequestMetrics:
+    """What one request cost. Times are in seconds."""
+
+    def __init__(self, capture_sql=False):
+        self.endpoint = UNRESOLVED
+        self.method = None
+        self.status = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.total_time = 0.0
+        self.statements = [] if capture_sql else None
+        self._started = time.perf_counter()
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """``execute_wrapper`` hook counting and timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        if self._render_started is not None:
+            self.serialize_time = time.perf_counter() - self._render_started
+
+    def finish(self, request, response):
+        self.total_time = time.perf_counter() - self._started
+        match = getattr(request, 'resolver_match', None)
+        self.endpoint = match.view_name if match else UNRESOLVED
+        self.method = request.method
+        self.status = response.status_code
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+class Histogram:
+    """Cumulative Prometheus histogram: counts per upper bound, sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.max_queries = 0
+        self.statuses = defaultdict(int)
+
+    def observe(self, metrics):
+        self.latency.observe(metrics.total_time)
+        self.queries.observe(metrics.queries)
+        self.db_time += metrics.db_time
+        self.serialize_time += metrics.serialize_time
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.statuses[metrics.status] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe ``(endpoint, method) -> EndpointStats`` of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(EndpointStats)
+
+    def observe(self, metrics):
+        with self._lock:
+            self._endpoints[metrics.endpoint, metrics.method].observe(metrics)
+
+    def snapshot(self):
+        """``{(endpoint, method): stats}`` copied under the lock, sorted."""
+        with self._lock:
+            return copy.deepcopy(dict(sorted(self._endpoints.items())))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """Measure every request; placed first so its latency covers the other middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(capture_sql=getattr(settings, 'REQUEST_METRICS_CAPTURE_SQL', False))
+        request.metrics = metrics
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        metrics.finish(request, response)
+
+        registry.observe(metrics)
+        request_measured.send(sender=self.__class__, metrics=metrics)
+        if getattr(settings, 'REQUEST_METRICS_HEADERS', settings.DEBUG):
+            response['X-Query-Count'] = str(metrics.queries)
+            response['Server-Timing'] = metrics.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # Rendering (DRF's renderers) starts right after this hook
+        request.metrics.start_render()
+        response.add_post_render_callback(request.metrics.finish_render)
+        return response
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+
+
+def _histogram_lines(name, histogram, **labels):
+    base = _labels(**labels)
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        yield f'{name}_bucket{{{base},le="{bound}"}} {count}'
+    yield f'{name}_bucket{{{base},le="+Inf"}} {histogram.count}'
+    yield f'{name}_sum{{{base}}} {histogram.sum:g}'
+    yield f'{name}_count{{{base}}} {histogram.count}'
+
+
+def render_prometheus():
+    """The request metrics and reference cache counters in Prometheus text format."""
+    endpoints = registry.snapshot()
+    lines = [
+        '# HELP ar_soft_request_duration_seconds Request latency per endpoint.',
+        '# TYPE ar_soft_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), stats in endpoints.items():
+        lines.extend(_histogram_lines('ar_soft_request_duration_seconds', stats.latency,
+                                      endpoint=endpoint, method=method))
+    lines += [
+        '# HELP ar_soft_request_queries SQL queries per request per endpoint.',
+        '# TYPE ar_soft_request_queries histogram',
+    ]
+    for (endpoint, method), stats in endpoints.items():
+        lines.extend(_histogram_lines('ar_soft_request_queries', stats.queries, endpoint=endpoint, method=method))
+
+    counters = (
+        ('ar_soft_request_db_seconds_total', 'Time spent in the database per endpoint.', 'db_time'),
+        ('ar_soft_request_serialize_seconds_total', 'Time spent rendering responses per endpoint.', 'serialize_time'),
+    )
+    for name, help_text, attribute in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines.extend(f'{name}{{{_labels(endpoint=endpoint, method=method)}}} {getattr(stats, attribute):g}'
+                     for (endpoint, method), stats in endpoints.items())
+
+    lines += [
+        '# HELP ar_soft_request_queries_max Most SQL queries run by one request per endpoint.',
+        '# TYPE ar_soft_request_queries_max gauge',
+    ]
+    lines.extend(f'ar_soft_request_queries_max{{{_labels(endpoint=endpoint, method=method)}}} {stats.max_queries}'
+                 for (endpoint, method), stats in endpoints.items())
+
+    lines += [
+        '# HELP ar_soft_responses_total Responses per endpoint and status code.',
+        '# TYPE ar_soft_responses_total counter',
+    ]
+    for (endpoint, method), stats in endpoints.items():
+        lines.extend(f'ar_soft_responses_total{{{_labels(endpoint=endpoint, method=method, status=code)}}} {count}'
+                     for code, count in sorted(stats.statuses.items()))
+
+    lines += [
+        '# HELP ar_soft_reference_cache_events_total Reference cache lookups and maintenance per namespace.',
+        '# TYPE ar_soft_reference_cache_events_total counter',
+    ]
+    for namespace, stats in reference_cache_stats().items():
+        lines.extend(f'ar_soft_reference_cache_events_total{{{_labels(namespace=namespace, event=event)}}} {value}'
+                     for event, value in stats.items() if event != 'hit_ratio')
+    return '\n'.join(lines) + '\n'
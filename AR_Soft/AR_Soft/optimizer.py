@@ -0,0 +1,217 @@
+"""
+``select_related``/``prefetch_related`` derived from a serializer.
+
+A serializer reads related objects through the ``source`` of its fields
+(``animal.eartag``, ``table_component.ration_table.name``), its nested
+serializers (``group_details``) and related fields that render more than a
+primary key. ``related_lookups`` walks those paths over the model's
+relations: forward foreign keys and one-to-one relations become
+``select_related`` joins, and everything below a to-many relation becomes a
+``prefetch_related`` lookup, so serializing a list costs a fixed number of
+queries whatever its length.
+
+``SerializerMethodField`` values are opaque; a serializer lists the
+relations they read in ``Meta.method_field_sources``::
+
+    method_field_sources = {'cost': 'aggregate'}
+
+The same walk records the columns the fields read. When a request asks for
+a sparse fieldset (``AR_Soft.fieldsets``), the queryset is projected onto
+them: with ``values()`` when every field is a plain column of the model,
+else with ``only()``. Serializers with fields that read something other
+than a model field (method fields, properties) are not projected.
+
+``OptimizedQuerysetMixin`` applies the lookups of a view's serializer to
+the querysets it serializes.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework.fields import SerializerMethodField
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from .fieldsets import sparse_fieldset
+
+
+class Lookups:
+    """The ``select_related``/``prefetch_related`` paths and columns of a serializer."""
+
+    def __init__(self):
+        self.select = set()
+        self.prefetch = set()
+        self.columns = set()
+        self.related = False  # Reads a relation, not only columns of the model
+        self.opaque = False   # Reads attributes that are not model fields
+
+    def follow(self, model, prefix, many, parts):
+        """
+        Follow the relations at the start of ``parts`` from ``model`` and record
+        them; stops at the first attribute that is not a relation. Returns the
+        model, lookup prefix and to-many flag at the end of the relations, and
+        the number of parts followed.
+        """
+        followed = 0
+        for part in parts:
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            path = f'{prefix}__{part}' if prefix else part
+            many = many or field.many_to_many or field.one_to_many
+            (self.prefetch if many else self.select).add(path)
+            model, prefix = field.related_model, path
+            followed += 1
+        if followed:
+            self.related = True
+        return model, prefix, many, followed
+
+    def add_column(self, model, prefix, many, name):
+        """Record the column ``name`` of ``model``; anything else makes the serializer opaque."""
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            self.opaque = True
+            return
+        if not field.concrete:
+            self.opaque = True
+        elif not many:
+            # Columns below a prefetch are read by the prefetch query
+            self.columns.add(f'{prefix}__{name}' if prefix else name)
+
+    def collect(self, serializer, model, prefix='', many=False):
+        meta = getattr(serializer, 'Meta', None)
+        method_sources = getattr(meta, 'method_field_sources', {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, SerializerMethodField):
+                sources = method_sources.get(name, ())
+                for source in [sources] if isinstance(sources, str) else sources:
+                    self.follow(model, prefix, many, source.split('.'))
+                self.opaque = True
+                continue
+
+            parts = [] if field.source == '*' else field.source.split('.')
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, BaseSerializer):
+                related_model, related_prefix, related_many, _ = self.follow(model, prefix, many, parts)
+                self.collect(nested, related_model, related_prefix, related_many)
+            elif isinstance(field, ManyRelatedField):
+                self.follow(model, prefix, many, parts)
+            elif isinstance(field, RelatedField) and not field.use_pk_only_optimization():
+                self.follow(model, prefix, many, parts)
+                self.opaque = True  # Rendered from the related object, e.g. its __str__
+            elif not parts:
+                self.opaque = True
+            else:
+                # The last part is a column (or a foreign key read as its id)
+                end_model, end_prefix, end_many, followed = self.follow(model, prefix, many, parts[:-1])
+                if followed < len(parts) - 1:
+                    self.opaque = True
+                else:
+                    self.add_column(end_model, end_prefix, end_many, parts[-1])
+                    if isinstance(field, RelatedField):
+                        self.related = True
+        return self
+
+    def minimal(self, paths):
+        """Drop the paths that a longer one already covers."""
+        return tuple(sorted(path for path in paths
+                            if not any(other.startswith(f'{path}__') for other in paths)))
+
+    def result(self):
+        # A prefetch below a join is reached through the join
+        return self.minimal(self.select), self.minimal(self.prefetch)
+
+    def projection(self):
+        """``('values' | 'only', columns)``, or ``None`` when the columns are not known."""
+        if self.opaque:
+            return None
+        return ('only' if self.related else 'values'), tuple(sorted(self.columns))
+
+
+def related_lookups(serializer):
+    """``(select_related, prefetch_related)`` paths of a serializer instance."""
+    return Lookups().collect(serializer, serializer.Meta.model).result()
+
+
+@lru_cache(maxsize=None)
+def serializer_lookups(serializer_class):
+    return related_lookups(serializer_class())
+
+
+def optimize_queryset(queryset, serializer_class, lookups=None):
+    """
+    ``queryset`` with the joins and prefetches ``serializer_class`` needs.
+    Querysets of dicts (``values()``) and plain lists are returned as is.
+    """
+    if not isinstance(queryset, QuerySet) or queryset._fields is not None:
+        return queryset
+    select, prefetch = lookups if lookups is not None else serializer_lookups(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def project_queryset(queryset, projection, keep=()):
+    """
+    ``queryset`` reading only the ``projection`` columns, plus ``keep`` (the
+    columns a paginator orders by).
+    """
+    if projection is None or not isinstance(queryset, QuerySet) or queryset._fields is not None:
+        return queryset
+    method, columns = projection
+    columns = list(dict.fromkeys([*columns, *keep]))
+    if method == 'values':
+        return queryset.values(*columns)
+    return queryset.only(*columns)
+
+
+class OptimizedQuerysetMixin:
+    """
+    Load what a generic view's serializer reads with its rows.
+
+    Applied where the view's querysets are filtered (``list`` and
+    ``get_object``), paginated or handed to ``get_serializer`` (custom
+    actions), so views keep building their querysets as before. The
+    sparse fieldset projection is applied to the querysets that are
+    serialized as lists only, never to the one ``get_object`` reads.
+    """
+
+    def get_serializer_lookups(self):
+        """The ``Lookups`` of the serializer of this request's sparse fieldset, if it asks for one."""
+        if sparse_fieldset(getattr(self, 'request', None)) is None:
+            return None
+        if not hasattr(self, '_sparse_lookups'):
+            serializer = self.get_serializer()
+            self._sparse_lookups = Lookups().collect(serializer, serializer.Meta.model)
+        return self._sparse_lookups
+
+    def optimize_queryset(self, queryset):
+        lookups = self.get_serializer_lookups()
+        return optimize_queryset(queryset, self.get_serializer_class(),
+                                 lookups.result() if lookups is not None else None)
+
+    def project_queryset(self, queryset):
+        lookups = self.get_serializer_lookups()
+        if lookups is None:
+            return queryset
+        ordering = getattr(self, 'cursor_ordering', ('pk',)) if getattr(self, 'paginator', None) else ()
+        return project_queryset(queryset, lookups.projection(), keep=[field.lstrip('-') for field in ordering])
+
+    def filter_queryset(self, queryset):
+        return self.optimize_queryset(super().filter_queryset(queryset))
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.project_queryset(self.optimize_queryset(queryset)))
+
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            args = (self.project_queryset(self.optimize_queryset(args[0])), *args[1:])
+        return super().get_serializer(*args, **kwargs)
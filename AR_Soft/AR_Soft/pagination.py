@@ -0,0 +1,30 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a stable per-view ordering.
+
+    Views declare ``cursor_ordering`` (e.g. ``('recorded_at', 'id')``), backed
+    by a matching composite index, so every page is an index seek from the
+    previous position and deep pages cost the same as the first one.
+
+    Pagination is opt-in: it only kicks in when the client sends ``cursor``
+    or ``page_size``, so clients expecting a plain list keep working.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('pk',)
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
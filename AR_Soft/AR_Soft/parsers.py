@@ -0,0 +1,28 @@
+"""
+Request parsers shared by the bulk upload endpoints.
+"""
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Parse a ``text/csv`` body with a header row into a list of dicts.
+    Empty cells are left out, so they read as "not provided".
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, '')}
+                for row in reader
+            ]
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f"CSV parse error - {exc}")
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +55,8 @@ INSTALLED_APPS = [
     'animal_ration',
     'ration_components',
     'ration_logs',
+    'dashboard',
+    'benchmarks',
     'authentication',
     'django_celery_beat',  # Add Celery Beat for periodic tasks
 ]
@@ -65,9 +69,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'authentication.permissions.PublicOrAuthenticated',
     ],
+    # Opt-in keyset pagination: only applied when ?cursor= or ?page_size= is sent
+    'DEFAULT_PAGINATION_CLASS': 'AR_Soft.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 100,
 }
 
 MIDDLEWARE = [
+    'AR_Soft.instrumentation.RequestMetricsMiddleware',  # First, so its latency covers the other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware should be placed before CommonMiddleware
@@ -171,6 +179,40 @@ CELERY_TIMEZONE = 'UTC'
 # Celery Beat configuration
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
 
+# Periodic tasks, installed into the database scheduler on beat startup
+CELERY_BEAT_SCHEDULE = {
+    'snapshot-ration-tables': {
+        'task': 'ration_logs.tasks.snapshot_ration_tables',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    # Safe to tick more than once: each accrual date is claimed once (animal_ration.runs)
+    'update-feed-costs': {
+        'task': 'animal_ration.tasks.update_feed_costs',
+        'schedule': crontab(hour=1, minute=0),
+    },
+}
+
+# Send per-request X-Query-Count and Server-Timing headers (AR_Soft/instrumentation.py)
+REQUEST_METRICS_HEADERS = DEBUG
+
+# Write ration audit logs from a Celery task instead of the committing request
+AUDIT_LOG_ASYNC = False
+
+# Caches: reference data (ration components, tables, groups) is read through
+# an in-process LRU in front of the shared Redis cache (see AR_Soft/cache.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reference': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+        'KEY_PREFIX': 'ar_soft',
+    },
+}
+REFERENCE_CACHE_ALIAS = 'reference'
+REFERENCE_CACHE_TIMEOUT = 600  # Seconds an orphaned version's entries linger
+
 
 # CORS settings for React frontend
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,49 @@
+"""
+Test helpers shared by the apps.
+"""
+from django.test import override_settings
+
+from .instrumentation import request_measured
+
+
+class QueryBudgetMixin:
+    """
+    Fail a test when one of its requests runs more SQL queries than the
+    budget of its endpoint. Budgets are keyed by URL name::
+
+        query_budgets = {'animal-group-list': 2}
+
+    ``default_query_budget`` applies to endpoints without one of their own.
+    Subclasses overriding ``setUp`` must call ``super().setUp()``.
+    """
+    query_budgets = {}
+    default_query_budget = None
+
+    def setUp(self):
+        super().setUp()
+        self.query_budget_overruns = []
+        capture = override_settings(REQUEST_METRICS_CAPTURE_SQL=True)
+        capture.enable()
+        self.addCleanup(capture.disable)
+        request_measured.connect(self.check_query_budget)
+        self.addCleanup(request_measured.disconnect, self.check_query_budget)
+        self.addCleanup(self.assertWithinQueryBudgets)
+
+    def query_budget(self, endpoint):
+        return self.query_budgets.get(endpoint, self.default_query_budget)
+
+    def check_query_budget(self, sender, metrics, **kwargs):
+        budget = self.query_budget(metrics.endpoint)
+        if budget is not None and metrics.queries > budget:
+            self.query_budget_overruns.append((metrics, budget))
+
+    def assertWithinQueryBudgets(self):
+        if not self.query_budget_overruns:
+            return
+        reports = []
+        for metrics, budget in self.query_budget_overruns:
+            statements = '\n'.join(f'    {i}. {sql}' for i, sql in enumerate(metrics.statements or [], start=1))
+            reports.append(f'{metrics.method} {metrics.endpoint} ran {metrics.queries} queries, '
+                           f'budget {budget}:\n{statements}')
+        self.query_budget_overruns = []
+        self.fail('Query budget exceeded\n' + '\n'.join(reports))
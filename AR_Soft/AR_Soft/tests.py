@@ -0,0 +1,324 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now, timedelta
+from rest_framework import serializers, status
+from rest_framework.test import APITestCase
+from animal_ration.feed_cost import active_ration_logs, in_animal_range
+from animal_ration.models import AnimalRationLog
+from Animal.models import Animal, AnimalGroup, Group
+from Animal.serializers import AnimalGroupSerializer
+from AR_Soft.instrumentation import registry
+from AR_Soft.optimizer import related_lookups, serializer_lookups
+from AR_Soft.testing import QueryBudgetMixin
+from AR_Soft.transactions import OnCommitBatch
+from benchmarks.herd import SCALES, generate_herd
+from Farmer.models import Company
+from ration_components.models import RationComponent, RationTable, RationTableComponent
+from ration_components.serializers import RationTableSerializer
+from ration_logs.serializers import RationTableComponentLogSerializer
+from Slaughter.models import Slaughter
+from Slaughter.serializers import SlaughterSerializer
+from Weight.models import Weight
+from Weight.serializers import WeightSerializer
+
+
+class HerdFixtureMixin:
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        with self.captureOnCommitCallbacks(execute=True):
+            company = Company.objects.create(name="Test Company")
+            group = Group.objects.create(name="Finishers")
+            for i in range(5):
+                animal = Animal.objects.create(eartag=f"TR{i:04d}", company=company, room="Room A")
+                AnimalGroup.objects.create(animal=animal, group=group)
+                Weight.objects.create(animal=animal, weight=300.0, recorded_at=now() - timedelta(days=1))
+
+
+class RequestMetricsTestCase(HerdFixtureMixin, APITestCase):
+    """Every request is measured per URL name and exported in the Prometheus text format."""
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_debug_headers_report_queries_and_timings(self):
+        response = self.client.get("/api/dashboard/")
+        self.assertEqual(response["X-Query-Count"], "3")
+        timings = dict(part.split(";", 1)[0:2] for part in response["Server-Timing"].split(", "))
+        self.assertEqual(set(timings), {"db", "serialize", "total"})
+        self.assertIn('desc="3 queries"', response["Server-Timing"])
+
+    @override_settings(REQUEST_METRICS_HEADERS=False)
+    def test_headers_are_off_outside_debug(self):
+        self.assertNotIn("X-Query-Count", self.client.get("/api/dashboard/"))
+
+    def test_metrics_endpoint_aggregates_per_url_name(self):
+        self.client.get("/api/dashboard/")
+        self.client.get("/api/dashboard/")
+        self.client.get("/api/animals/", {"company": "x"})
+
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn('ar_soft_request_duration_seconds_count{endpoint="dashboard",method="GET"} 2', text)
+        self.assertIn('ar_soft_request_queries_sum{endpoint="dashboard",method="GET"} 6', text)
+        self.assertIn('ar_soft_request_queries_bucket{endpoint="dashboard",method="GET",le="2"} 0', text)
+        self.assertIn('ar_soft_request_queries_bucket{endpoint="dashboard",method="GET",le="5"} 2', text)
+        self.assertIn('ar_soft_request_queries_max{endpoint="dashboard",method="GET"} 3', text)
+        self.assertIn('ar_soft_responses_total{endpoint="animal-list",method="GET",status="200"} 1', text)
+
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.content.decode(), "Authentication credentials were not provided.")
+
+
+class QuerysetOptimizerTestCase(SimpleTestCase):
+    """Joins and prefetches follow the source paths of the serializer fields."""
+
+    def test_lookups_of_source_paths(self):
+        self.assertEqual(serializer_lookups(AnimalGroupSerializer), (('animal', 'group'), ()))
+        self.assertEqual(serializer_lookups(RationTableComponentLogSerializer),
+                         (('table_component__component', 'table_component__ration_table'), ()))
+        # Declared for the method fields
+        self.assertEqual(serializer_lookups(RationTableSerializer), (('aggregate',), ()))
+        self.assertEqual(serializer_lookups(SlaughterSerializer), (('animal',), ()))
+        # Primary keys only
+        self.assertEqual(serializer_lookups(WeightSerializer), ((), ()))
+
+    def test_everything_below_a_to_many_relation_is_prefetched(self):
+        class GroupMembersSerializer(serializers.ModelSerializer):
+            members = AnimalGroupSerializer(source='animal_groups', many=True, read_only=True)
+            animal_ids = serializers.PrimaryKeyRelatedField(source='animal_groups', many=True, read_only=True)
+
+            class Meta:
+                model = Group
+                fields = ['id', 'members', 'animal_ids']
+
+        self.assertEqual(related_lookups(GroupMembersSerializer()),
+                         ((), ('animal_groups__animal', 'animal_groups__group')))
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """Every list costs a fixed number of queries, whatever the number of rows."""
+
+    query_budgets = {
+        'animal-list': 1,
+        'weight-list': 1,
+        'group-list': 2,  # The list and its validators
+        'animal-group-list': 1,
+        'animal-group-detail': 1,
+        'slaughter-list': 1,
+        'slaughter-detail': 1,
+        'animal-ration-log-list': 1,
+        'animal-ration-log-get-active-rations': 1,
+        'ration-component-list': 2,
+        'ration-table-list': 2,
+        'ration-table-component-list': 1,
+        'component-change-log-list': 1,
+        'ration-table-log-list': 1,
+        'ration-table-component-log-list': 1,
+        'ration-table-component-log-logs-by-ration-table': 1,
+        'dashboard': 3,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        generate_herd(SCALES['tiny'])
+
+    def test_list_endpoints_within_budget(self):
+        ration_table = RationTable.objects.first()
+        urls = [
+            "/api/animals/", "/api/weights/", "/api/groups/", "/api/animal_groups/",
+            f"/api/animal_groups/{AnimalGroup.objects.first().pk}/",
+            "/api/slaughters/", f"/api/slaughters/{Slaughter.objects.first().pk}/",
+            "/api/animal-ration-logs/", "/api/animal-ration-logs/active/?page_size=10",
+            "/api/ration-components/", "/api/ration-tables/", "/api/ration-table-components/",
+            "/api/component-change-logs/", "/api/ration-table-logs/", "/api/ration-table-component-logs/",
+            f"/api/ration-table-component-logs/ration-table/{ration_table.pk}/",
+            "/api/dashboard/",
+        ]
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK, url)
+
+    def test_an_overrun_fails_the_test_with_its_queries(self):
+        self.query_budgets = {**self.query_budgets, 'dashboard': 2}
+        self.client.get("/api/dashboard/")
+        with self.assertRaises(AssertionError) as overrun:
+            self.assertWithinQueryBudgets()
+        message = str(overrun.exception)
+        self.assertIn("GET dashboard ran 3 queries, budget 2", message)
+        self.assertIn('FROM "dashboard_companysummary"', message)
+
+
+class SparseFieldsetTestCase(HerdFixtureMixin, APITestCase):
+    """?fields=/?exclude= trim the rendered fields and the columns read for them."""
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response, [query["sql"] for query in queries]
+
+    def test_plain_columns_are_read_as_values(self):
+        response, (sql,) = self.get("/api/animals/", {"fields": "id,eartag,room"})
+        self.assertEqual(list(response.data[0]), ["id", "eartag", "room"])
+        self.assertIn('"Animal_animal"."room"', sql)
+        self.assertNotIn('"Animal_animal"."race"', sql)
+        self.assertNotIn('"Animal_animal"."latest_weight"', sql)
+
+        response, _ = self.get("/api/animals/", {"exclude": "created_at, updated_at"})
+        self.assertNotIn("created_at", response.data[0])
+        self.assertIn("feed_cost", response.data[0])
+
+    def test_related_columns_are_read_with_only(self):
+        response, (sql,) = self.get("/api/animal-ration-logs/", {"fields": "animal_eartag,is_active"})
+        self.assertEqual(list(response.data[0]), ["animal_eartag", "is_active"])
+        self.assertIn('"Animal_animal"."eartag"', sql)
+        self.assertNotIn('"Animal_animal"."race"', sql)
+        self.assertNotIn("ration_components_rationtable", sql)
+
+    def test_pages_keep_their_cursor(self):
+        response, (sql,) = self.get("/api/weights/", {"fields": "weight", "page_size": 2})
+        self.assertEqual([list(row) for row in response.data["results"]], [["weight"], ["weight"]])
+        response, _ = self.get(response.data["next"], {})
+        self.assertEqual([list(row) for row in response.data["results"]], [["weight"], ["weight"]])
+
+    def test_method_fields_are_rendered_from_whole_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            slaughter = Slaughter.objects.create(animal=Animal.objects.first(), carcas_weight=200.0, sale_price=10.0)
+        response, _ = self.get(f"/api/slaughters/{slaughter.pk}/", {"fields": "id,profit"})
+        self.assertEqual(set(response.data), {"id", "profit"})
+        response, _ = self.get("/api/slaughters/", {"fields": "profit"})
+        self.assertEqual(list(response.data[0]), ["profit"])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/api/animals/", {"fields": "eartag,colour"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("colour", str(response.data["fields"]))
+
+    def test_writes_and_exports(self):
+        company = Company.objects.first()
+        response = self.client.post("/api/animals/?fields=eartag",
+                                    {"eartag": "TR9999", "company": company.pk, "room": "Room B"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("room", response.data)
+
+        response = self.client.get("/api/animals/", {"format": "csv", "fields": "eartag,room"})
+        self.assertEqual(b"".join(response.streaming_content).decode().splitlines()[0], "eartag,room")
+
+
+class HotQueryIndexTestCase(TestCase):
+    """The hot filter paths are index seeks, not table scans, on SQLite and PostgreSQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_herd(SCALES['tiny'])
+        cls.animal = Animal.objects.order_by('pk').first()
+        cls.component = RationComponent.objects.order_by('pk').first()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # The fixture is tiny: keep the planner from preferring a scan on cost alone
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, *indexes):
+        plan = queryset.explain()
+        self.assertTrue(any(index in plan for index in indexes),
+                        f"Expected {' or '.join(indexes)} in the plan of\n{queryset.query}\n{plan}")
+
+    def test_ration_logs(self):
+        logs = AnimalRationLog.objects
+        # AnimalRationLog.save and the slaughter signal, then AnimalRationLog.delete
+        self.assertUsesIndex(logs.filter(animal=self.animal, is_active=True).order_by('-start_date')[:1],
+                             'ration_log_animal_idx', 'ration_log_active_idx')
+        self.assertUsesIndex(logs.filter(animal=self.animal, is_active=False).order_by('-start_date')[:1],
+                             'ration_log_animal_idx')
+        # The nightly run: its chunk boundaries and one chunk
+        self.assertUsesIndex(logs.filter(is_active=True).order_by('animal_id').values_list('animal_id').distinct(),
+                             'ration_log_active_idx')
+        self.assertUsesIndex(active_ration_logs().filter(in_animal_range((self.animal.pk, self.animal.pk + 10))),
+                             'ration_log_active_idx', 'ration_log_animal_idx')
+
+    def test_weights(self):
+        # The unique constraint on (animal, recorded_at) serves the latest readings of an animal
+        self.assertUsesIndex(Weight.objects.filter(animal=self.animal).order_by('-recorded_at')[:2],
+                             'unique_weight_per_date', 'sqlite_autoindex_Weight_weight')
+
+    def test_animals(self):
+        self.assertUsesIndex(Animal.objects.filter(company_id=self.animal.company_id), 'animal_company_status_idx')
+        self.assertUsesIndex(Animal.objects.filter(is_slaughtered=False).order_by('id')[:100], 'animal_in_herd_idx')
+        self.assertUsesIndex(Animal.objects.alias(race_lower=Lower('race')).filter(race_lower=Lower(Value('angus'))),
+                             'animal_race_lower_idx')
+
+    def test_live_soft_deleted_rows(self):
+        self.assertUsesIndex(RationComponent.objects.order_by('id')[:100], 'component_live_idx')
+        self.assertUsesIndex(RationTable.objects.order_by('id')[:100], 'ration_table_live_idx')
+        self.assertUsesIndex(RationTableComponent.objects.filter(component=self.component), 'component_usage_live_idx')
+        self.assertUsesIndex(RationTableComponent.objects.filter(ration_table_id__in=[1, 2]),
+                             'table_component_live_idx')
+
+
+class Collected(OnCommitBatch):
+    runs = []
+
+    def __init__(self, using=None, key=None):
+        super().__init__(using, key)
+        self.items = []
+
+    def run(self):
+        self.runs.append((self.key, self.items))
+
+
+class ScopedCollected(Collected):
+    savepoint_scoped = True
+
+
+class OnCommitBatchTestCase(TestCase):
+    """One on-commit batch per key and block; savepoint-scoped batches are discarded with their savepoint."""
+
+    def setUp(self):
+        Collected.runs = []
+
+    def collect(self, batch_class, item, key=None):
+        batch_class.current(key=key).items.append(item)
+
+    def test_nested_savepoints_share_a_batch(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.collect(Collected, 1)
+            try:
+                with transaction.atomic():
+                    self.collect(Collected, 2)
+                    self.collect(Collected, "other", key="other")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.collect(Collected, 3)
+            self.assertIs(Collected.find(), Collected.current())
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Collected.runs, [(None, [1, 2, 3])])
+        self.assertIsNone(Collected.find())
+
+    def test_scoped_batches_roll_back_with_their_savepoint(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.collect(ScopedCollected, 1)
+            with transaction.atomic():
+                self.collect(ScopedCollected, 2)
+            try:
+                with transaction.atomic():
+                    self.collect(ScopedCollected, 3)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(ScopedCollected.runs, [(None, [1]), (None, [2])])
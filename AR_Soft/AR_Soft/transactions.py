@@ -0,0 +1,63 @@
+"""
+Work batched over a transaction and done once, when it commits.
+
+Signal receivers queue rows to write, summaries to recompute or caches to
+invalidate many times per transaction; ``OnCommitBatch`` collects them in a
+single ``on_commit`` callback per connection, savepoint stack and key, so
+the work is done once however many saves queued it. The batch of the
+current block is found among the connection's pending ``run_on_commit``
+callbacks with the savepoint ids Django registered it under.
+
+A savepoint that is rolled back discards the callbacks registered inside
+it. With ``savepoint_scoped`` set, every savepoint gets a batch of its own,
+so its work is discarded with it (audit rows). Otherwise a batch of an
+enclosing block is reused, so nested savepoints share one batch, and work
+queued in a savepoint that is later rolled back is still done: only for
+work that is idempotent, like a refresh or an invalidation.
+"""
+from django.db import transaction
+
+
+class OnCommitBatch:
+    """Subclasses collect their work in ``add``-style methods and do it in ``run``."""
+
+    savepoint_scoped = False
+
+    def __init__(self, using=None, key=None):
+        self.using = using
+        self.key = key
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.run()
+
+    def run(self):
+        raise NotImplementedError
+
+    @classmethod
+    def pending_batches(cls, using=None, key=None):
+        """``(savepoint ids, batch)`` of this class and key waiting for the transaction to commit."""
+        for savepoint_ids, callback, *_ in transaction.get_connection(using).run_on_commit:
+            if type(callback) is cls and callback.key == key and not callback.done:
+                yield savepoint_ids, callback
+
+    @classmethod
+    def find(cls, using=None, key=None):
+        """Any batch of this class and key still waiting, whatever block it was registered in."""
+        return next((batch for _, batch in cls.pending_batches(using, key)), None)
+
+    @classmethod
+    def current(cls, using=None, key=None):
+        """
+        The batch to add to in the current atomic block, registered with
+        ``on_commit`` on first use. Must be called inside a transaction.
+        """
+        savepoint_ids = set(transaction.get_connection(using).savepoint_ids)
+        for batch_savepoint_ids, batch in cls.pending_batches(using, key):
+            if batch_savepoint_ids == savepoint_ids or (
+                    not cls.savepoint_scoped and batch_savepoint_ids <= savepoint_ids):
+                return batch
+        batch = cls(using, key)
+        transaction.on_commit(batch, using=using)
+        return batch
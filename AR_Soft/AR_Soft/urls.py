@@ -20,6 +20,7 @@ from rest_framework.authtoken.views import obtain_auth_token
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
+from .views import MetricsView, ReferenceCacheStatsView
 
 
 # Schema view for Swagger documentation
@@ -45,6 +46,9 @@ urlpatterns = [
     path('api/', include('animal_ration.urls')),
     path('api/', include('ration_components.urls')),
     path('api/', include('ration_logs.urls')),
+    path('api/', include('dashboard.urls')),
+    path('api/cache/stats/', ReferenceCacheStatsView.as_view(), name='reference-cache-stats'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     # Using custom login view with email authentication
     path("api/auth/", include("authentication.urls")),
     
@@ -0,0 +1,40 @@
+"""
+Project-level API views.
+"""
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import reference_cache_stats
+from .instrumentation import render_prometheus
+
+
+class ReferenceCacheStatsView(APIView):
+    """Hit/miss counters of the reference caches in the serving process."""
+
+    def get(self, request):
+        return Response(reference_cache_stats())
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):  # An error response, e.g. {"detail": "..."}
+            data = str(data.get('detail', data))
+        return data.encode(self.charset)
+
+
+class MetricsView(APIView):
+    """
+    Request and reference cache metrics of the serving process, in the
+    Prometheus text format. Scrape with a ``Token`` authorization header.
+    """
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request):
+        return Response(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -6,3 +6,4 @@ class AnimalConfig(AppConfig):
 
     def ready(self):
         import Animal.signals  # Import the signals module
+        import Animal.cache  # Cache invalidation receivers
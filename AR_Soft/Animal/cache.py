@@ -0,0 +1,28 @@
+"""
+Reference cache of animal groups, invalidated on every group save or delete.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from AR_Soft.cache import ReferenceCache
+from .models import Group
+
+group_cache = ReferenceCache('animal_groups')
+
+
+def load_group_dry_matters(keys):
+    group_ids = {int(key.split(':')[1]) for key in keys}
+    dry_matters = dict(Group.objects.filter(pk__in=group_ids).values_list('pk', 'dry_matter'))
+    return {f'dry_matter:{pk}': dry_matters.get(pk) for pk in group_ids}
+
+
+def group_dry_matters(group_ids):
+    """Return ``{group_id: dry_matter}`` through the cache."""
+    cached = group_cache.get_many([f'dry_matter:{pk}' for pk in group_ids], load_group_dry_matters)
+    return {int(key.split(':')[1]): value for key, value in cached.items()}
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cache(sender, **kwargs):
+    group_cache.invalidate()
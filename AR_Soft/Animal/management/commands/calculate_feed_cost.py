@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.db.models import F
 from Animal.models import Animal
+from animal_ration.models import FeedCostEntry
 from django.utils.timezone import now
 
 class Command(BaseCommand):
@@ -17,9 +19,18 @@ class Command(BaseCommand):
             except Animal.DoesNotExist:
                 self.stderr.write(f"Animal with eartag '{eartag}' does not exist.")
         else:
-            animals = Animal.objects.all()
-            for animal in animals:
-                self.calculate_and_print_feed_cost(animal)
+            # One aggregate query over the ledger for the whole herd
+            end_date = now()
+            totals = dict(
+                FeedCostEntry.objects.between(end=end_date)
+                .filter(date__gte=F('animal__created_at__date'))
+                .totals_by('animal').values_list('animal', 'cost')
+            )
+            for animal in Animal.objects.only('id', 'eartag', 'created_at'):
+                self.stdout.write(
+                    f"Feed cost for animal '{animal.eartag}' from {animal.created_at} to {end_date}: "
+                    f"{totals.get(animal.pk, 0)}"
+                )
 
     def calculate_and_print_feed_cost(self, animal):
         start_date = animal.created_at
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Animal', '0005_remove_group_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='latest_weight',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='latest_weight_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='previous_weight',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='previous_weight_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Farmer', '0002_alter_farmer_email_alter_farmer_phone'),
+        ('Animal', '0006_animal_latest_weight'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='animal',
+            name='company',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='animals', to='Farmer.company'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['company', 'is_slaughtered'], name='animal_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(condition=models.Q(('is_slaughtered', False)), fields=['id'], name='animal_in_herd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(django.db.models.functions.text.Lower('race'), name='animal_race_lower_idx'),
+        ),
+    ]
@@ -1,24 +1,47 @@
 from django.utils.timezone import localtime, make_aware, is_naive
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from Farmer.models import Company  # Import Company model from the company app
 from animal_ration.models import AnimalRationLog
 from ration_components.models import RationTableComponent
 
 class Animal(models.Model):
     eartag = models.CharField(max_length=255, unique=True)  # Unique identifier for the animal
-    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="animals")  # Link to parent Company
+    # Indexed by animal_company_status_idx, which leads with the company
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="animals", db_index=False)
     race = models.CharField(max_length=255, null=True)  # Breed of the animal
     gender = models.BooleanField(null=True)  # True for male, False for female
     room = models.CharField(max_length=255)  # Location or room where the animal resides
     cost = models.FloatField(null=True, blank=True)  # Cost of the animal
     is_slaughtered = models.BooleanField(default=False)  # Flag indicating if the animal went to slaughter
-    feed_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Cost of feeding the animal
+    feed_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Sum of the animal's FeedCostEntry ledger
+    # Denormalized from the Weight table, maintained by Weight.signals
+    latest_weight = models.FloatField(null=True, blank=True)
+    latest_weight_at = models.DateTimeField(null=True, blank=True)
+    previous_weight = models.FloatField(null=True, blank=True)
+    previous_weight_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)  # Automatically set on creation
     updated_at = models.DateTimeField(auto_now=True)      # Automatically update on save
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'is_slaughtered'], name='animal_company_status_idx'),  # Per-company lists, dashboard counts
+            # Pages of the animals still in the herd; a partial index, as SQLite cannot seek on NOT is_slaughtered
+            models.Index(fields=['id'], condition=Q(is_slaughtered=False), name='animal_in_herd_idx'),
+            models.Index(Lower('race'), name='animal_race_lower_idx'),  # Case-insensitive race filter
+        ]
+
     def __str__(self):
         return f"{self.eartag} ({self.race})"
 
+    def calculate_feed_cost(self, start_date=None, end_date=None):
+        """
+        Feed cost accrued between two dates (inclusive), summed from the
+        daily feed cost ledger. Datetimes are reduced to their local date.
+        """
+        return self.feed_cost_entries.between(start_date, end_date).total()
+
     
 #### Animal Grouping ####
 
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import Animal, Group, AnimalGroup
 
-class AnimalSerializer(serializers.ModelSerializer):
+class AnimalSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Animal
         fields = [
@@ -11,13 +12,13 @@ class AnimalSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'feed_cost','feed_cost']
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ['id', 'name', 'description', 'created_at', 'dry_matter']
 
 
-class AnimalGroupSerializer(serializers.ModelSerializer):
+class AnimalGroupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # Use PrimaryKeyRelatedField for input but still provide readable output
     animal = serializers.PrimaryKeyRelatedField(queryset=Animal.objects.all())  # Accepts animal ID as input
     group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())    # Accepts group ID as input
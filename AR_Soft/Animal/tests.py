@@ -1,8 +1,14 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APITestCase
 from django.utils.timezone import make_aware, datetime, timedelta, is_naive, now
 from ration_components.models import RationComponent, RationTable, RationTableComponent
 from animal_ration.models import AnimalRationLog
-from Animal.models import Animal
+from Animal.models import Animal, Group
 from Farmer.models import Company
 
 
@@ -110,3 +116,43 @@ def test_feed_cost_calculation_with_created_at(self):
     # Expected cost (manually calculated based on test data)
     expected_cost = 220.00  # Replace with the actual expected value based on your setup
     self.assertAlmostEqual(feed_cost, expected_cost, places=2, msg="Feed cost calculation failed.")
+
+
+class AnimalExportTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.company = Company.objects.create(name="FarmCo")
+        self.other_company = Company.objects.create(name="OtherCo")
+        Animal.objects.create(eartag="A1", company=self.company, race="Holstein", gender=True, room="Barn 1")
+        Animal.objects.create(eartag="A2", company=self.company, race="Angus", gender=False, room="Barn 1")
+        Animal.objects.create(eartag="A3", company=self.other_company, race="holstein", gender=True, room="Barn 2")
+
+    def test_csv_export_honors_filters(self):
+        response = self.client.get("/api/animals/", {"format": "csv", "race": "HOLSTEIN", "gender": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["eartag"] for row in rows], ["A1", "A3"])
+        self.assertEqual(rows[0]["company"], str(self.company.id))
+
+    def test_ndjson_export_by_company(self):
+        response = self.client.get("/api/animals/", {"format": "ndjson", "company_id": self.company.id})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["eartag"] for line in lines], ["A1", "A2"])
+
+
+class GroupConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.group = Group.objects.create(name="Finishers", dry_matter=0.025)
+
+    def test_group_list_etag_follows_group_changes(self):
+        etag = self.client.get("/api/groups/")["ETag"]
+        self.assertEqual(self.client.get("/api/groups/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.group.dry_matter = 0.03
+        self.group.save()
+        response = self.client.get("/api/groups/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
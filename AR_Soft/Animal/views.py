@@ -1,16 +1,25 @@
 # animal/views.py
 
+from django.db.models import Value
+from django.db.models.functions import Lower
 from rest_framework import generics, status
 from rest_framework.response import Response
+from AR_Soft.cache import CachedListMixin
+from AR_Soft.conditional import ConditionalListMixin
+from AR_Soft.exports import StreamingExportMixin
+from AR_Soft.optimizer import OptimizedQuerysetMixin
+from .cache import group_cache
 from .models import Animal, Group, AnimalGroup
 from .serializers import AnimalSerializer, AnimalGroupSerializer, GroupSerializer
 
-class AnimalListView(generics.ListCreateAPIView):
+class AnimalListView(OptimizedQuerysetMixin, StreamingExportMixin, generics.ListCreateAPIView):
     """
     API view to list all animals or create a new one (or multiple).
     Includes filtering by company_id, race, gender, and is_slaughtered.
+    Supports streaming exports with ?format=ndjson or ?format=csv.
     """
     serializer_class = AnimalSerializer
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
         queryset = Animal.objects.all()
@@ -28,7 +37,8 @@ class AnimalListView(generics.ListCreateAPIView):
         # Filter by race if provided (case-insensitive match)
         race = self.request.query_params.get('race')
         if race:
-            queryset = queryset.filter(race__iexact=race)
+            # lower() on both sides rather than iexact, so animal_race_lower_idx applies
+            queryset = queryset.alias(race_lower=Lower('race')).filter(race_lower=Lower(Value(race)))
 
         # Filter by gender if provided (convert 0/1 to Boolean)
         gender = self.request.query_params.get('gender')
@@ -66,7 +76,7 @@ class AnimalListView(generics.ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class AnimalDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AnimalDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific animal by ID.
     """
@@ -78,14 +88,18 @@ class AnimalDetailView(generics.RetrieveUpdateDestroyAPIView):
 ## GROUP ##
 ############################
 
-class GroupListView(generics.ListCreateAPIView):
+class GroupListView(OptimizedQuerysetMixin, ConditionalListMixin, CachedListMixin, generics.ListCreateAPIView):
     """
     API view to list all groups or create a new group.
     """
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
+    list_cache = group_cache
+    # Groups have no updated_at; the group cache version changes on every save
+    last_modified_fields = ()
+    validator_cache = group_cache
 
-class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
+class GroupDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific group by ID.
     """
@@ -93,7 +107,7 @@ class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = GroupSerializer
 
 
-class AnimalGroupListView(generics.ListCreateAPIView):
+class AnimalGroupListView(OptimizedQuerysetMixin, generics.ListCreateAPIView):
     """
     API view to list all animal-group relationships or add a new animal to a group.
     """
@@ -129,7 +143,7 @@ class AnimalGroupListView(generics.ListCreateAPIView):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
-class AnimalGroupDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AnimalGroupDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific animal-group assignment by ID.
     """
@@ -1,12 +1,13 @@
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import Farmer, Company
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Company
         fields = ['id', 'name', 'address']
 
-class FarmerSerializer(serializers.ModelSerializer):
+class FarmerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     company = CompanySerializer()  # Nested serializer
 
     class Meta:
@@ -1,21 +1,22 @@
 from rest_framework import generics
+from AR_Soft.optimizer import OptimizedQuerysetMixin
 from .models import Farmer, Company
 from .serializers import FarmerSerializer, CompanySerializer
 
 # List view to get all farmers
-class FarmerListView(generics.ListCreateAPIView):
+class FarmerListView(OptimizedQuerysetMixin, generics.ListCreateAPIView):
     queryset = Farmer.objects.all()
     serializer_class = FarmerSerializer
 
 # Detail view to get a single farmer
-class FarmerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FarmerDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Farmer.objects.all()
     serializer_class = FarmerSerializer
 
-class CompanyListView(generics.ListCreateAPIView):
+class CompanyListView(OptimizedQuerysetMixin, generics.ListCreateAPIView):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
 
-class CompanyDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CompanyDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Slaughter', '0008_alter_slaughter_kdv'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='slaughter',
+            index=models.Index(fields=['-date', 'id'], name='slaughter_date_id_idx'),
+        ),
+    ]
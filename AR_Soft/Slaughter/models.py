@@ -9,6 +9,10 @@ class Slaughter(models.Model):
     date = models.DateTimeField(default=timezone.now)
     kdv = models.FloatField(default=0.0, blank=True)  # Default KDV to 0.0
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date', 'id'], name='slaughter_date_id_idx'),  # Keyset pagination
+        ]
     
     def save(self, *args, **kwargs):
         # Update the is_slaughter field in the Animal model
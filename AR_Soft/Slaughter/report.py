@@ -0,0 +1,74 @@
+# Slaughter/report.py
+"""
+Slaughter profitability computed in SQL.
+
+Revenue, tax (KDV), animal cost, feed cost and profit are database
+expressions over a slaughter and its animal, so a report grouped by company,
+race, month or group is a single aggregate query whatever the number of
+slaughters. The formulas mirror ``Slaughter.calculate_profit``.
+"""
+from django.db.models import Count, DateField, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce, TruncMonth
+
+REPORT_METRICS = ('slaughters', 'total_carcas_weight', 'revenue', 'tax', 'animal_cost', 'feed_cost', 'profit')
+
+
+def revenue():
+    return F('sale_price') * F('carcas_weight')
+
+
+def tax():
+    return F('sale_price') * F('carcas_weight') * F('kdv')
+
+
+def animal_cost():
+    return Coalesce(F('animal__cost'), Value(0.0))
+
+
+def feed_cost():
+    return Coalesce(Cast('animal__feed_cost', FloatField()), Value(0.0))
+
+
+def profit():
+    return revenue() - (animal_cost() + feed_cost() + tax())
+
+
+# group_by value -> (label columns, expressions they are computed from)
+REPORT_GROUPINGS = {
+    'company': {'company_id': F('animal__company_id'), 'company': F('animal__company__name')},
+    'race': {'race': F('animal__race')},
+    'month': {'month': TruncMonth('date', output_field=DateField())},
+    # An animal in several groups is counted in each of them
+    'group': {'group_id': F('animal__animal_groups__group_id'), 'group': F('animal__animal_groups__group__name')},
+}
+
+
+def report_aggregates():
+    return {
+        'slaughters': Count('id'),
+        'total_carcas_weight': Coalesce(Sum('carcas_weight'), Value(0.0)),
+        'revenue': Coalesce(Sum(revenue(), output_field=FloatField()), Value(0.0)),
+        'tax': Coalesce(Sum(tax(), output_field=FloatField()), Value(0.0)),
+        'animal_cost': Coalesce(Sum(animal_cost(), output_field=FloatField()), Value(0.0)),
+        'feed_cost': Coalesce(Sum(feed_cost(), output_field=FloatField()), Value(0.0)),
+        'profit': Coalesce(Sum(profit(), output_field=FloatField()), Value(0.0)),
+    }
+
+
+def report_columns(group_by):
+    """Columns of a ``profitability_report`` row, labels first."""
+    return [*REPORT_GROUPINGS[group_by], *REPORT_METRICS]
+
+
+def profitability_report(queryset, group_by):
+    """Rows of ``REPORT_METRICS`` per ``group_by`` bucket, computed in one query."""
+    labels = REPORT_GROUPINGS[group_by]
+    return list(queryset
+                .values(**labels)
+                .annotate(**report_aggregates())
+                .order_by(*labels))
+
+
+def profitability_totals(queryset):
+    """``REPORT_METRICS`` over the whole queryset."""
+    return queryset.aggregate(**report_aggregates())
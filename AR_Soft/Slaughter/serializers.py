@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import Slaughter
 from datetime import datetime, date
 
-class SlaughterSerializer(serializers.ModelSerializer):
+class SlaughterSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     profit = serializers.SerializerMethodField()
     feed_cost = serializers.SerializerMethodField()
     cost = serializers.SerializerMethodField()
@@ -10,6 +11,7 @@ class SlaughterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Slaughter
         fields = ['id', 'animal', 'date', 'carcas_weight', 'sale_price', 'kdv', 'profit', 'feed_cost', 'cost']
+        method_field_sources = {'profit': 'animal', 'feed_cost': 'animal', 'cost': 'animal'}
 
     def get_profit(self, obj):
         return obj.calculate_profit()
@@ -1,7 +1,14 @@
+import csv
+import io
+from datetime import date, datetime, time
+
+from django.contrib.auth.models import User
 from django.test import TestCase
-from django.utils.timezone import now
-from Animal.models import Animal
+from django.utils.timezone import make_aware, now
+from rest_framework.test import APITestCase
+from Animal.models import Animal, AnimalGroup, Group
 from Slaughter.models import Slaughter
+from Slaughter.report import REPORT_METRICS
 from Farmer.models import Company
 
 
@@ -125,3 +132,76 @@ class SlaughterAPITests(TestCase):
             )
         )
         self.assertAlmostEqual(response.json()["total_profit"], expected_total_profit)
+
+
+class SlaughterReportTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        north = Company.objects.create(name="North Farm")
+        south = Company.objects.create(name="South Farm")
+        self.slaughters = []
+        for eartag, company, race, cost, feed_cost, day in (
+            ("R1", north, "Holstein", 200.0, 50.0, date(2024, 1, 10)),
+            ("R2", north, "Angus", 300.0, 20.0, date(2024, 1, 20)),
+            ("R3", south, "Holstein", 250.0, 0.0, date(2024, 2, 5)),
+        ):
+            animal = Animal.objects.create(eartag=eartag, company=company, race=race, room="Room A",
+                                           cost=cost, feed_cost=feed_cost)
+            self.slaughters.append(Slaughter.objects.create(
+                animal=animal, carcas_weight=250.0, sale_price=20.0, kdv=0.1,
+                date=make_aware(datetime.combine(day, time(12))),
+            ))
+        group = Group.objects.create(name="Fattening")
+        AnimalGroup.objects.create(animal=self.slaughters[0].animal, group=group)
+
+    def profits(self, slaughters):
+        return sum(slaughter.calculate_profit() for slaughter in slaughters)
+
+    def test_report_by_company_in_one_query(self):
+        with self.assertNumQueries(2):  # grouped rows + totals
+            response = self.client.get("/api/slaughters/report/", {"group_by": "company"})
+
+        self.assertEqual(response.status_code, 200)
+        north, south = response.data["results"]
+        self.assertEqual((north["company"], north["slaughters"]), ("North Farm", 2))
+        self.assertAlmostEqual(north["profit"], self.profits(self.slaughters[:2]))
+        self.assertAlmostEqual(north["tax"], 2 * 250.0 * 20.0 * 0.1)
+        self.assertAlmostEqual(south["feed_cost"], 0.0)
+        self.assertAlmostEqual(response.data["totals"]["profit"], self.profits(self.slaughters))
+
+    def test_report_by_month_race_and_group_with_window(self):
+        response = self.client.get("/api/slaughters/report/", {"group_by": "month", "start": "2024-01-15"})
+        self.assertEqual([(row["month"], row["slaughters"]) for row in response.data["results"]],
+                         [(date(2024, 1, 1), 1), (date(2024, 2, 1), 1)])
+
+        response = self.client.get("/api/slaughters/report/", {"group_by": "race"})
+        self.assertEqual([(row["race"], row["slaughters"]) for row in response.data["results"]],
+                         [("Angus", 1), ("Holstein", 2)])
+
+        response = self.client.get("/api/slaughters/report/", {"group_by": "group"})
+        grouped = {row["group"]: row["slaughters"] for row in response.data["results"]}
+        self.assertEqual(grouped, {None: 2, "Fattening": 1})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get("/api/slaughters/report/", {"group_by": "farmer"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/slaughters/report/", {"start": "january"}).status_code, 400)
+        for url in ("/api/slaughters/report/", "/api/slaughters/total-profit/"):
+            for params in ({"start": "2026-02-30"}, {"end": "2026-13-01"}):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
+
+    def test_csv_export(self):
+        response = self.client.get("/api/slaughters/report/", {"group_by": "race", "format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.DictReader(io.StringIO(response.content.decode())))
+        self.assertEqual([row["race"] for row in rows], ["Angus", "Holstein"])
+        self.assertAlmostEqual(float(rows[1]["profit"]), self.profits([self.slaughters[0], self.slaughters[2]]))
+
+        response = self.client.get("/api/slaughters/report/", {"group_by": "month", "start": "2030-01-01",
+                                                               "format": "csv"})
+        self.assertEqual(response.content.decode().splitlines(), [",".join(["month", *REPORT_METRICS])])
+
+    def test_total_profit(self):
+        response = self.client.get("/api/slaughters/total-profit/", {"end": "2024-01-31"})
+        self.assertAlmostEqual(response.data["total_profit"], self.profits(self.slaughters[:2]))
@@ -1,8 +1,10 @@
 # Slaughter/urls.py
 from django.urls import path
-from .views import SlaughterListView, SlaughterDetailView
+from .views import SlaughterListView, SlaughterDetailView, SlaughterReportView, SlaughterTotalProfitView
 
 urlpatterns = [
     path('slaughters/', SlaughterListView.as_view(), name='slaughter-list'),
+    path('slaughters/report/', SlaughterReportView.as_view(), name='slaughter-report'),
+    path('slaughters/total-profit/', SlaughterTotalProfitView.as_view(), name='slaughter-total-profit'),
     path('slaughters/<int:pk>/', SlaughterDetailView.as_view(), name='slaughter-detail'),
 ]
@@ -1,10 +1,17 @@
 # Slaughter/views.py
-from rest_framework import generics
+from django.utils.dateparse import parse_date
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
+from AR_Soft.exports import CSVRenderer
+from AR_Soft.optimizer import OptimizedQuerysetMixin
 from .models import Slaughter
+from .report import REPORT_GROUPINGS, profitability_report, profitability_totals, report_columns
 from .serializers import SlaughterSerializer
 
-class SlaughterViewSet(ModelViewSet):
+class SlaughterViewSet(OptimizedQuerysetMixin, ModelViewSet):
     """
     ViewSet for Slaughter model. Includes list, create, retrieve, update, and delete operations,
     as well as a custom endpoint for calculating total profit.
@@ -13,17 +20,84 @@ class SlaughterViewSet(ModelViewSet):
     serializer_class = SlaughterSerializer
 
 
-class SlaughterListView(generics.ListCreateAPIView):
+class SlaughterListView(OptimizedQuerysetMixin, generics.ListCreateAPIView):
     """
     List and create Slaughter records.
     """
     queryset = Slaughter.objects.all()
     serializer_class = SlaughterSerializer
+    cursor_ordering = ('-date', 'id')
 
 
-class SlaughterDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SlaughterDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a single Slaughter record.
     """
     queryset = Slaughter.objects.all()
     serializer_class = SlaughterSerializer
+
+
+class SlaughterWindowMixin:
+    """Filter slaughters by the optional ``start``/``end`` dates (inclusive)."""
+
+    def get_slaughters(self, request):
+        queryset = Slaughter.objects.all()
+        for name, lookup in (('start', 'date__date__gte'), ('end', 'date__date__lte')):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:  # Well formed but not a real date, e.g. 2026-02-30
+                    day = None
+                if day is None:
+                    raise ValidationError({name: "Must be a date in YYYY-MM-DD format."})
+                queryset = queryset.filter(**{lookup: day})
+        return queryset
+
+
+class SlaughterReportView(SlaughterWindowMixin, APIView):
+    """
+    Profitability report: revenue, tax (KDV), animal cost, feed cost and
+    profit per ``group_by`` bucket (company, race, month or group), computed
+    in SQL. Optional ``start``/``end`` dates limit the window and
+    ``?format=csv`` downloads the rows as CSV.
+    """
+
+    def get_renderers(self):
+        return super().get_renderers() + [CSVRenderer()]
+
+    def get_csv_fields(self):
+        """Header of the CSV download, written even when no slaughter matches."""
+        return report_columns(self.request.query_params.get('group_by', 'company'))
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'company')
+        if group_by not in REPORT_GROUPINGS:
+            return Response({"error": f"group_by must be one of: {', '.join(REPORT_GROUPINGS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_slaughters(request)
+        rows = profitability_report(queryset, group_by)
+        if request.accepted_renderer.format == CSVRenderer.format:
+            response = Response(rows)
+            response['Content-Disposition'] = f'attachment; filename="slaughter-profit-by-{group_by}.csv"'
+            return response
+
+        return Response({
+            "group_by": group_by,
+            "start": request.query_params.get('start'),
+            "end": request.query_params.get('end'),
+            "results": rows,
+            "totals": profitability_totals(queryset),
+        })
+
+
+class SlaughterTotalProfitView(SlaughterWindowMixin, APIView):
+    """
+    Total profit of all slaughters (optionally within ``start``/``end``),
+    aggregated in SQL.
+    """
+
+    def get(self, request):
+        queryset = self.get_slaughters(request)
+        return Response({"total_profit": profitability_totals(queryset)['profit']})
@@ -1,9 +1,16 @@
 # weight/admin.py
 from django.contrib import admin
-from .models import Weight
+from .models import GrowthCurve, Weight
 
 @admin.register(Weight)
 class WeightAdmin(admin.ModelAdmin):
     list_display = ('animal', 'weight', 'recorded_at')
     list_filter = ('animal', 'recorded_at')
     search_fields = ('animal__eartag',)
+
+
+@admin.register(GrowthCurve)
+class GrowthCurveAdmin(admin.ModelAdmin):
+    list_display = ('animal', 'model', 'readings', 'rmse', 'fitted_at')
+    list_filter = ('model',)
+    search_fields = ('animal__eartag',)
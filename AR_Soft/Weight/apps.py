@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WeightConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Weight'
+
+    def ready(self):
+        import Weight.signals  # Keeps Animal.latest_weight* in sync
@@ -0,0 +1,71 @@
+# weight/gains.py
+"""
+Window-function queries behind the group weight gain endpoints.
+
+Each animal's consecutive readings are paired in SQL with LAG over
+``recorded_at`` partitioned by animal, so a whole group is answered with a
+single statement instead of one query per animal. The latest pair comes
+straight from the latest/previous weight columns on Animal.
+"""
+from itertools import groupby
+
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+
+from Animal.models import Animal, AnimalGroup
+from .models import Weight
+
+
+def gain_entry(start_weight, start_date, end_weight, end_date):
+    """Weight difference, day span and daily gain between two readings."""
+    weight_diff = end_weight - start_weight
+    days_diff = (end_date - start_date).days
+    daily_gain = weight_diff / days_diff if days_diff != 0 else None
+    return weight_diff, days_diff, daily_gain
+
+
+def group_weights(group_id):
+    """Weights of every animal assigned to the group."""
+    return Weight.objects.filter(
+        animal_id__in=AnimalGroup.objects.filter(group_id=group_id).values('animal_id')
+    )
+
+
+def latest_weight_pairs(group_id):
+    """
+    The latest and previous reading of every animal in the group that has
+    at least two readings, ordered by animal. Read from the denormalized
+    columns on Animal, so the weight table is not touched.
+    """
+    return (Animal.objects
+            .filter(animal_groups__group_id=group_id, previous_weight_at__isnull=False)
+            .order_by('id')
+            .values('previous_weight',
+                    animal_id=F('id'), animal__eartag=F('eartag'),
+                    weight=F('latest_weight'), recorded_at=F('latest_weight_at'),
+                    previous_date=F('previous_weight_at')))
+
+
+def gain_histories(group_id, chunk_size=2000):
+    """
+    Yield ``(animal_id, records_count, gain_history)`` for every animal in the
+    group that has weight records, streaming the paired readings from the
+    database in chunks.
+    """
+    partition = {'partition_by': [F('animal_id')], 'order_by': F('recorded_at').asc()}
+    rows = (group_weights(group_id)
+            .annotate(previous_weight=Window(Lag('weight'), **partition),
+                      previous_date=Window(Lag('recorded_at'), **partition))
+            .order_by('animal_id', 'recorded_at')
+            .values_list('animal_id', 'weight', 'recorded_at', 'previous_weight', 'previous_date')
+            .iterator(chunk_size=chunk_size))
+
+    for animal_id, readings in groupby(rows, key=lambda row: row[0]):
+        records_count = 0
+        gain_history = []
+        for _, weight, recorded_at, previous_weight, previous_date in readings:
+            records_count += 1
+            if previous_date is None:
+                continue
+            gain_history.append((previous_weight, previous_date, weight, recorded_at))
+        yield animal_id, records_count, gain_history
@@ -0,0 +1,212 @@
+# weight/growth.py
+"""
+Growth curves fitted with NumPy, batched over whole groups.
+
+The readings of every animal being fitted are loaded in one query and laid
+out as an (animals x readings) matrix, so the linear least-squares fit and
+the Levenberg-Marquardt iterations of the Gompertz fit are array operations
+over all animals at once rather than a Python loop per animal. Each animal
+keeps the curve with the lower error; a Gompertz curve needs at least
+``MIN_GOMPERTZ_READINGS`` readings.
+
+Fitted parameters are stored in ``GrowthCurve`` and dropped when one of the
+animal's readings changes (Weight.signals, Weight.ingest), so
+``growth_curves`` only fits the animals whose curve is missing. Predictions
+(``CurveSet``) are evaluated for every curve at once as well.
+"""
+from datetime import datetime, time, timezone
+
+import numpy as np
+from django.utils.timezone import make_aware
+
+from .models import GrowthCurve, Weight
+
+MIN_READINGS = 2
+MIN_GOMPERTZ_READINGS = 5
+GOMPERTZ_ITERATIONS = 60
+SECONDS_PER_DAY = 86400.0
+
+
+def start_of(day):
+    """Midnight at the start of ``day``, local time."""
+    return make_aware(datetime.combine(day, time.min))
+
+
+class ReadingMatrix:
+    """
+    Readings of many animals as padded ``(animals, readings)`` arrays.
+    ``days`` counts from each animal's first reading; padding is zero in
+    ``days`` and ``weights`` and False in ``mask``.
+    """
+
+    def __init__(self, rows):
+        """``rows`` are ``(animal_id, weight, recorded_at)`` ordered by animal and date."""
+        animal_ids, weights, recorded_ats = zip(*rows) if rows else ((), (), ())
+        animal_col = np.array(animal_ids, dtype=np.int64)
+        seconds = np.array([recorded_at.timestamp() for recorded_at in recorded_ats], dtype=float)
+
+        self.animal_ids, first, self.counts = np.unique(animal_col, return_index=True, return_counts=True)
+        self.origins = seconds[first]
+        row = np.repeat(np.arange(len(self.animal_ids)), self.counts)
+        column = np.arange(len(animal_col)) - np.repeat(first, self.counts)
+
+        shape = (len(self.animal_ids), self.counts.max() if len(self.counts) else 0)
+        self.days = np.zeros(shape)
+        self.weights = np.zeros(shape)
+        self.mask = np.zeros(shape, dtype=bool)
+        self.days[row, column] = (seconds - np.repeat(self.origins, self.counts)) / SECONDS_PER_DAY
+        self.weights[row, column] = np.array(weights, dtype=float)
+        self.mask[row, column] = True
+
+    def subset(self, selected):
+        matrix = object.__new__(ReadingMatrix)
+        for name in ('animal_ids', 'counts', 'origins', 'days', 'weights', 'mask'):
+            setattr(matrix, name, getattr(self, name)[selected])
+        return matrix
+
+    def squared_error(self, predicted):
+        return np.where(self.mask, (self.weights - predicted) ** 2, 0.0).sum(axis=1)
+
+
+def gompertz(a, b, c, days):
+    return a * np.exp(-b * np.exp(-c * days))
+
+
+def fit_linear(matrix):
+    """Least-squares ``(intercept, slope)`` of every animal, from per-animal sums."""
+    n, t, w = matrix.counts, matrix.days, matrix.weights
+    st, sw, stt, stw = t.sum(axis=1), w.sum(axis=1), (t * t).sum(axis=1), (t * w).sum(axis=1)
+    denominator = n * stt - st ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Readings taken at a single instant have no slope
+        slope = np.where(denominator > 1e-9, (n * stw - st * sw) / denominator, 0.0)
+    return (sw - slope * st) / n, slope
+
+
+def fit_gompertz(matrix, intercept, slope):
+    """
+    Levenberg-Marquardt fit of ``(a, b, c)`` for every animal at once,
+    started from the linear fit. Returns the parameters and squared errors.
+    """
+    start = np.maximum(intercept, 1.0)
+    a = np.maximum(matrix.weights.max(axis=1), start) * 1.5
+    b = np.log(a / start)
+    c = np.clip(slope / (start * b), 1e-4, 1.0)
+    params = np.stack([a, b, c], axis=1)
+    diagonal = np.arange(3)
+
+    with np.errstate(all='ignore'):
+        error = matrix.squared_error(gompertz(*params.T[..., None], matrix.days))
+        damping = np.full(len(params), 1e-2)
+        for _ in range(GOMPERTZ_ITERATIONS):
+            a, b, c = params.T[..., None]
+            decay = np.exp(-c * matrix.days)
+            predicted = a * np.exp(-b * decay)
+            jacobian = np.stack([predicted / a, -predicted * decay, predicted * b * matrix.days * decay], axis=2)
+            jacobian[~matrix.mask] = 0.0
+            residuals = np.where(matrix.mask, matrix.weights - predicted, 0.0)
+
+            normal = np.einsum('nmi,nmj->nij', jacobian, jacobian)
+            gradient = np.einsum('nmi,nm->ni', jacobian, residuals)
+            normal[:, diagonal, diagonal] *= 1.0 + damping[:, None]
+            normal[:, diagonal, diagonal] += 1e-9
+            step = np.linalg.solve(normal, gradient[..., None])[..., 0]
+
+            candidate = params + step
+            candidate_error = matrix.squared_error(gompertz(*candidate.T[..., None], matrix.days))
+            better = (candidate > 0).all(axis=1) & np.isfinite(candidate_error) & (candidate_error < error)
+            params = np.where(better[:, None], candidate, params)
+            error = np.where(better, candidate_error, error)
+            damping = np.clip(np.where(better, damping / 3, damping * 4), 1e-9, 1e9)
+    return params, error
+
+
+def fit_curves(rows):
+    """Unsaved ``GrowthCurve`` of every animal in ``rows`` with at least ``MIN_READINGS`` readings."""
+    matrix = ReadingMatrix(rows)
+    matrix = matrix.subset(matrix.counts >= MIN_READINGS)
+    if not len(matrix.animal_ids):
+        return []
+
+    intercept, slope = fit_linear(matrix)
+    linear_error = matrix.squared_error(intercept[:, None] + slope[:, None] * matrix.days)
+    params = np.stack([intercept, slope, np.full(len(slope), np.nan)], axis=1)
+    error = linear_error
+
+    candidates = matrix.counts >= MIN_GOMPERTZ_READINGS
+    if candidates.any():
+        fitted, fitted_error = fit_gompertz(matrix.subset(candidates), intercept[candidates], slope[candidates])
+        better = fitted_error < linear_error[candidates]
+        params[np.flatnonzero(candidates)[better]] = fitted[better]
+        error = error.copy()
+        error[np.flatnonzero(candidates)[better]] = fitted_error[better]
+
+    return [
+        GrowthCurve(
+            animal_id=int(animal_id),
+            model=GrowthCurve.LINEAR if np.isnan(c) else GrowthCurve.GOMPERTZ,
+            a=float(a), b=float(b), c=None if np.isnan(c) else float(c),
+            origin=datetime.fromtimestamp(origin, tz=timezone.utc),
+            readings=int(count), rmse=float(np.sqrt(squared_error / count)),
+        )
+        for animal_id, (a, b, c), origin, count, squared_error
+        in zip(matrix.animal_ids, params, matrix.origins, matrix.counts, error)
+    ]
+
+
+def growth_curves(animals):
+    """
+    ``{animal_id: GrowthCurve}`` of the animals in the queryset that have at
+    least two readings. Stored curves are reused; the missing ones are
+    fitted in one batch and stored.
+    """
+    curves = {curve.animal_id: curve for curve in GrowthCurve.objects.filter(animal__in=animals)}
+    rows = list(Weight.objects
+                .filter(animal__in=animals.filter(growth_curve__isnull=True))
+                .order_by('animal_id', 'recorded_at')
+                .values_list('animal_id', 'weight', 'recorded_at'))
+    fitted = fit_curves(rows)
+    GrowthCurve.objects.bulk_create(
+        fitted, batch_size=1000, update_conflicts=True, unique_fields=['animal'],
+        update_fields=['model', 'a', 'b', 'c', 'origin', 'readings', 'rmse', 'fitted_at'],
+    )
+    curves.update((curve.animal_id, curve) for curve in fitted)
+    return curves
+
+
+def invalidate_growth_curves(animal_ids):
+    """Drop the stored curves of animals whose readings changed."""
+    GrowthCurve.objects.filter(animal_id__in=animal_ids).delete()
+
+
+class CurveSet:
+    """Predictions of many growth curves, evaluated as arrays."""
+
+    def __init__(self, curves):
+        self.curves = list(curves)
+        self.gompertz = np.array([curve.model == GrowthCurve.GOMPERTZ for curve in self.curves], dtype=bool)
+        self.a = np.array([curve.a for curve in self.curves], dtype=float)
+        self.b = np.array([curve.b for curve in self.curves], dtype=float)
+        self.c = np.array([np.nan if curve.c is None else curve.c for curve in self.curves], dtype=float)
+        self.origins = np.array([curve.origin.timestamp() for curve in self.curves], dtype=float)
+
+    def days_since_origin(self, at):
+        return (at.timestamp() - self.origins) / SECONDS_PER_DAY
+
+    def weights_at(self, at):
+        """Predicted weight of every curve at the datetime ``at``."""
+        days = self.days_since_origin(at)
+        with np.errstate(invalid='ignore'):
+            return np.where(self.gompertz, gompertz(self.a, self.b, self.c, days), self.a + self.b * days)
+
+    def days_to_weight(self, target, at):
+        """
+        Days from ``at`` until each curve reaches ``target`` kg: 0 when it
+        already has, NaN when it never does (a flat or falling line, or a
+        Gompertz asymptote below the target).
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            linear = np.where(self.b > 0, (target - self.a) / self.b, np.nan)
+            curve = np.where(target < self.a, -np.log(np.log(self.a / target) / self.b) / self.c, np.nan)
+        reached = np.where(self.gompertz, curve, linear)
+        return np.maximum(reached - self.days_since_origin(at), 0.0)
@@ -0,0 +1,203 @@
+# weight/ingest.py
+"""
+Bulk ingestion of scale-station weight uploads.
+
+Rows are validated in memory, eartags are resolved to animals in one query,
+duplicates against the ``unique_weight_per_date`` constraint are found with
+one set query and the accepted readings are inserted in batches with
+``ON CONFLICT DO NOTHING RETURNING``. A reading stored concurrently between
+the check and the insert is skipped and not returned, so the report only
+counts the rows this upload actually wrote. Every row gets an accept/reject
+entry in the returned report. The set-based writes bypass the Weight
+signals, so the latest-weight columns and dashboard gains of the touched
+animals are refreshed, and their growth curves dropped, once for the whole
+upload.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+
+from Animal.models import Animal, AnimalGroup
+from dashboard.summary import queue_summary_refresh
+from .growth import invalidate_growth_curves
+from .latest import refresh_latest_weights
+from .models import Weight
+from .serializers import WeightIngestRowSerializer
+
+INGEST_BATCH_SIZE = 1000
+
+ACCEPTED = 'accepted'
+UPDATED = 'updated'
+REJECTED = 'rejected'
+
+
+def resolve_animals(readings):
+    """
+    Map every reading to an animal id. Returns ``{index: animal_id}`` and
+    ``{index: error}`` for readings whose animal does not exist.
+    """
+    eartags = {data['eartag'] for _, data in readings if data.get('eartag')}
+    animal_ids = {data['animal'] for _, data in readings if data.get('animal') is not None}
+    known = dict(
+        Animal.objects
+        .filter(Q(eartag__in=eartags) | Q(pk__in=animal_ids))
+        .values_list('eartag', 'id')
+    )
+    known_ids = set(known.values())
+
+    resolved, errors = {}, {}
+    for index, data in readings:
+        eartag, animal_id = data.get('eartag'), data.get('animal')
+        if eartag:
+            if eartag not in known:
+                errors[index] = f"Unknown eartag '{eartag}'."
+            elif animal_id is not None and known[eartag] != animal_id:
+                errors[index] = f"Eartag '{eartag}' does not belong to animal {animal_id}."
+            else:
+                resolved[index] = known[eartag]
+        elif animal_id not in known_ids:
+            errors[index] = f"Unknown animal {animal_id}."
+        else:
+            resolved[index] = animal_id
+    return resolved, errors
+
+
+def existing_readings(animal_ids, recorded_ats):
+    """
+    ``{(animal_id, recorded_at): weight}`` already stored for the uploaded
+    animals and time window.
+    """
+    if not animal_ids:
+        return {}
+    rows = (Weight.objects
+            .filter(animal_id__in=animal_ids, recorded_at__range=(min(recorded_ats), max(recorded_ats)))
+            .values_list('animal_id', 'recorded_at', 'weight'))
+    return {(animal_id, recorded_at): weight for animal_id, recorded_at, weight in rows}
+
+
+def insert_new_readings(weights, batch_size=INGEST_BATCH_SIZE):
+    """
+    Insert ``weights``, skipping those whose animal already has a reading at
+    that time, and return the ones this insert wrote. The skipped rows are
+    told apart by the keys the insert returns, not by their values, which a
+    concurrent writer may have stored the same.
+    """
+    opts = Weight._meta
+    fields = [opts.get_field('animal'), opts.get_field('weight'), opts.get_field('recorded_at')]
+    animal, _, recorded_at = fields
+    quote = connection.ops.quote_name
+    key = f"{quote(animal.column)}, {quote(recorded_at.column)}"
+    by_key = {(weight.animal_id, weight.recorded_at): weight for weight in weights}
+
+    # Returned timestamps go through the same conversions as a queryset's
+    column = recorded_at.get_col(opts.db_table)
+    converters = connection.ops.get_db_converters(column) + recorded_at.get_db_converters(connection)
+
+    def stored_key(animal_id, value):
+        for converter in converters:
+            value = converter(value, column, connection)
+        return animal_id, value
+
+    inserted = []
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, weights) or batch_size)
+    for start in range(0, len(weights), batch_size):
+        batch = weights[start:start + batch_size]
+        sql = (f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+               f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+               f"ON CONFLICT ({key}) DO NOTHING RETURNING {key}")
+        params = [field.get_db_prep_save(getattr(weight, field.attname), connection)
+                  for weight in batch for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            inserted.extend(by_key[stored_key(*row)] for row in cursor.fetchall())
+    return inserted
+
+
+def already_exists(recorded_at):
+    return {"non_field_errors": [f"A weight record for this animal on {recorded_at} already exists."]}
+
+
+def ingest_weights(rows, update_existing=False, batch_size=INGEST_BATCH_SIZE):
+    """
+    Validate and store a list of weight readings.
+
+    Readings that collide with a stored one are rejected, or overwrite its
+    weight when ``update_existing`` is set. Returns the ingestion report.
+    """
+    results = [None] * len(rows)
+
+    readings = []
+    for index, row in enumerate(rows):
+        serializer = WeightIngestRowSerializer(data=row)
+        if serializer.is_valid():
+            readings.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "status": REJECTED, "errors": serializer.errors}
+
+    resolved, errors = resolve_animals(readings)
+    for index, error in errors.items():
+        results[index] = {"index": index, "status": REJECTED, "errors": {"animal": [error]}}
+
+    readings = [(index, data) for index, data in readings if index in resolved]
+    stored = existing_readings(
+        {resolved[index] for index, _ in readings},
+        [data['recorded_at'] for _, data in readings],
+    )
+
+    new_weights, updated_weights, seen = [], [], set()
+    for index, data in readings:
+        key = (resolved[index], data['recorded_at'])
+        if key in seen:
+            results[index] = {"index": index, "status": REJECTED,
+                              "errors": {"non_field_errors": ["Duplicate reading in this upload."]}}
+            continue
+        seen.add(key)
+
+        weight = Weight(animal_id=key[0], weight=data['weight'], recorded_at=key[1])
+        if key not in stored:
+            new_weights.append((index, weight))
+            results[index] = {"index": index, "status": ACCEPTED}
+        elif update_existing:
+            updated_weights.append(weight)
+            results[index] = {"index": index, "status": UPDATED}
+        else:
+            results[index] = {"index": index, "status": REJECTED, "errors": already_exists(key[1])}
+
+    with transaction.atomic():
+        if update_existing:
+            # A reading inserted concurrently since the check is overwritten like any stored one
+            updated_weights += [weight for _, weight in new_weights]
+        else:
+            # The insert skips readings that a concurrent upload stored since the check
+            inserted = {id(weight) for weight in insert_new_readings([weight for _, weight in new_weights],
+                                                                     batch_size=batch_size)}
+            accepted = []
+            for index, weight in new_weights:
+                if id(weight) in inserted:
+                    accepted.append((index, weight))
+                else:
+                    results[index] = {"index": index, "status": REJECTED,
+                                      "errors": already_exists(weight.recorded_at)}
+            new_weights = accepted
+        if updated_weights:
+            Weight.objects.bulk_create(
+                updated_weights,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['animal', 'recorded_at'],
+                update_fields=['weight'],
+            )
+        animal_ids = {weight.animal_id for _, weight in new_weights} | {weight.animal_id for weight in updated_weights}
+        refresh_latest_weights(animal_ids)
+        invalidate_growth_curves(animal_ids)
+        queue_summary_refresh(groups=AnimalGroup.objects
+                              .filter(animal_id__in=animal_ids)
+                              .values_list('group_id', flat=True)
+                              .distinct())
+
+    return {
+        "received": len(rows),
+        "accepted": sum(1 for result in results if result["status"] == ACCEPTED),
+        "updated": sum(1 for result in results if result["status"] == UPDATED),
+        "rejected": sum(1 for result in results if result["status"] == REJECTED),
+        "results": results,
+    }
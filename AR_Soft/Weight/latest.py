@@ -0,0 +1,74 @@
+# weight/latest.py
+"""
+Maintenance of the latest/previous weight columns denormalized onto Animal.
+
+The two most recent readings of each animal are picked with ROW_NUMBER()
+over ``recorded_at`` partitioned by animal and written back with
+``bulk_update``, so any number of animals is refreshed in a constant number
+of queries. Recomputing from the readings (rather than shifting the stored
+values) keeps the columns right for backfilled, edited and deleted readings.
+"""
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from Animal.models import Animal
+from .models import Weight
+
+LATEST_WEIGHT_FIELDS = ['latest_weight', 'latest_weight_at', 'previous_weight', 'previous_weight_at']
+REBUILD_CHUNK_SIZE = 1000
+
+
+def latest_readings(animal_ids):
+    """Return ``{animal_id: [(weight, recorded_at), ...]}`` with up to two readings, newest first."""
+    rows = (Weight.objects
+            .filter(animal_id__in=animal_ids)
+            .annotate(row_number=Window(RowNumber(),
+                                        partition_by=[F('animal_id')],
+                                        order_by=F('recorded_at').desc()))
+            .filter(row_number__lte=2)
+            .order_by('animal_id', 'row_number')
+            .values_list('animal_id', 'weight', 'recorded_at'))
+
+    readings = {}
+    for animal_id, weight, recorded_at in rows:
+        readings.setdefault(animal_id, []).append((weight, recorded_at))
+    return readings
+
+
+def refresh_latest_weights(animal_ids, batch_size=REBUILD_CHUNK_SIZE):
+    """
+    Recompute the latest/previous weight columns of the given animals.
+
+    The animal rows are locked first so concurrent readings for the same
+    animal are applied one after the other. Returns the number of animals
+    refreshed.
+    """
+    animal_ids = sorted(set(animal_ids))
+    if not animal_ids:
+        return 0
+
+    with transaction.atomic():
+        locked = list(Animal.objects.select_for_update()
+                      .filter(pk__in=animal_ids)
+                      .order_by('pk')
+                      .values_list('pk', flat=True))
+        readings = latest_readings(locked)
+
+        animals = []
+        for animal_id in locked:
+            (latest, latest_at), (previous, previous_at) = (readings.get(animal_id, []) + [(None, None)] * 2)[:2]
+            animals.append(Animal(pk=animal_id,
+                                  latest_weight=latest, latest_weight_at=latest_at,
+                                  previous_weight=previous, previous_weight_at=previous_at))
+        Animal.objects.bulk_update(animals, LATEST_WEIGHT_FIELDS, batch_size=batch_size)
+    return len(animals)
+
+
+def rebuild_latest_weights(chunk_size=REBUILD_CHUNK_SIZE):
+    """Refresh the columns of every animal, ``chunk_size`` animals per transaction."""
+    animal_ids = list(Animal.objects.order_by('pk').values_list('pk', flat=True))
+    refreshed = 0
+    for start in range(0, len(animal_ids), chunk_size):
+        refreshed += refresh_latest_weights(animal_ids[start:start + chunk_size])
+    return refreshed
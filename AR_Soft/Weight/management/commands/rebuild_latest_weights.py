@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from Weight.latest import REBUILD_CHUNK_SIZE, rebuild_latest_weights
+
+
+class Command(BaseCommand):
+    help = "Rebuild the latest/previous weight columns of every animal from the Weight table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=REBUILD_CHUNK_SIZE,
+                            help="Number of animals refreshed per transaction.")
+
+    def handle(self, *args, **kwargs):
+        refreshed = rebuild_latest_weights(chunk_size=kwargs['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt latest weights for {refreshed} animals."))
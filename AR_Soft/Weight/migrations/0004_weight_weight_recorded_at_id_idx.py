@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Weight', '0003_alter_weight_recorded_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weight',
+            index=models.Index(fields=['recorded_at', 'id'], name='weight_recorded_at_id_idx'),
+        ),
+    ]
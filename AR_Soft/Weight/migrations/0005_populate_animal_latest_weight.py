@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def populate_latest_weights(apps, schema_editor):
+    Animal = apps.get_model('Animal', 'Animal')
+    Weight = apps.get_model('Weight', 'Weight')
+
+    rows = (Weight.objects
+            .annotate(row_number=Window(RowNumber(),
+                                        partition_by=[F('animal_id')],
+                                        order_by=F('recorded_at').desc()))
+            .filter(row_number__lte=2)
+            .order_by('animal_id', 'row_number')
+            .values_list('animal_id', 'row_number', 'weight', 'recorded_at'))
+
+    animals = {}
+    for animal_id, row_number, weight, recorded_at in rows:
+        animal = animals.setdefault(animal_id, Animal(pk=animal_id))
+        if row_number == 1:
+            animal.latest_weight, animal.latest_weight_at = weight, recorded_at
+        else:
+            animal.previous_weight, animal.previous_weight_at = weight, recorded_at
+
+    Animal.objects.bulk_update(
+        animals.values(),
+        ['latest_weight', 'latest_weight_at', 'previous_weight', 'previous_weight_at'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Animal', '0006_animal_latest_weight'),
+        ('Weight', '0004_weight_weight_recorded_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_latest_weights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Animal', '0006_animal_latest_weight'),
+        ('Weight', '0005_populate_animal_latest_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrowthCurve',
+            fields=[
+                ('animal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='growth_curve', serialize=False, to='Animal.animal')),
+                ('model', models.CharField(choices=[('linear', 'Linear'), ('gompertz', 'Gompertz')], max_length=10)),
+                ('a', models.FloatField()),
+                ('b', models.FloatField()),
+                ('c', models.FloatField(blank=True, null=True)),
+                ('origin', models.DateTimeField()),
+                ('readings', models.PositiveIntegerField()),
+                ('rmse', models.FloatField()),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
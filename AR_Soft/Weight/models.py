@@ -12,6 +12,36 @@ class Weight(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['animal', 'recorded_at'], name='unique_weight_per_date')
         ]
+        indexes = [
+            models.Index(fields=['recorded_at', 'id'], name='weight_recorded_at_id_idx'),  # Keyset pagination
+        ]
 
     def __str__(self):
         return f"{self.animal.eartag} - {self.weight} kg on {self.recorded_at}"
+
+
+class GrowthCurve(models.Model):
+    """
+    Growth curve fitted to all of an animal's readings, kept until its next
+    reading (see Weight.growth). ``t`` is days since ``origin``, the first
+    reading: linear curves are ``a + b*t``, Gompertz curves ``a*exp(-b*exp(-c*t))``.
+    """
+    LINEAR = 'linear'
+    GOMPERTZ = 'gompertz'
+    MODEL_CHOICES = [
+        (LINEAR, 'Linear'),
+        (GOMPERTZ, 'Gompertz'),
+    ]
+
+    animal = models.OneToOneField(Animal, on_delete=models.CASCADE, primary_key=True, related_name='growth_curve')
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    a = models.FloatField()
+    b = models.FloatField()
+    c = models.FloatField(null=True, blank=True)
+    origin = models.DateTimeField()
+    readings = models.PositiveIntegerField()
+    rmse = models.FloatField()  # Root mean square error of the fit, in kg
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model} curve of {self.animal_id}"
@@ -1,9 +1,10 @@
 # weight/serializers.py
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import Weight
 from django.utils import timezone
 
-class WeightSerializer(serializers.ModelSerializer):
+class WeightSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Weight
         fields = ['id', 'animal', 'weight', 'recorded_at']
@@ -41,3 +42,27 @@ class WeightSerializer(serializers.ModelSerializer):
 
         # Proceed with the update for the other fields
         return super().update(instance, validated_data)
+
+
+class WeightIngestRowSerializer(serializers.Serializer):
+    """
+    One reading of a bulk scale-station upload. The animal is given either
+    by ``eartag`` or by ``animal`` id; both are resolved in bulk afterwards,
+    so validating a row never touches the database.
+    """
+    eartag = serializers.CharField(required=False)
+    animal = serializers.IntegerField(required=False)
+    weight = serializers.FloatField(min_value=0.0)
+    recorded_at = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if not data.get('eartag') and data.get('animal') is None:
+            raise serializers.ValidationError("Either 'eartag' or 'animal' is required.")
+
+        if data.get('recorded_at') is None:
+            data['recorded_at'] = timezone.now()
+        elif data['recorded_at'] > timezone.now():
+            raise serializers.ValidationError(
+                {"recorded_at": "The recorded date cannot be in the future."}
+            )
+        return data
@@ -0,0 +1,40 @@
+# weight/signals.py
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from Animal.models import Animal, AnimalGroup
+from Farmer.models import Company
+from dashboard.summary import queue_summary_refresh
+from .growth import invalidate_growth_curves
+from .latest import refresh_latest_weights
+from .models import Weight
+
+
+@receiver(post_init, sender=Weight)
+def remember_weight_animal(sender, instance, **kwargs):
+    # Moving a reading to another animal has to refresh the old animal too
+    instance._original_animal_id = instance.animal_id
+
+
+def refresh_animals(animal_ids):
+    """Latest weights, growth curves and dashboard gains of the animals whose readings changed."""
+    refresh_latest_weights(animal_ids)
+    invalidate_growth_curves(animal_ids)
+    queue_summary_refresh(groups=AnimalGroup.objects
+                          .filter(animal_id__in=animal_ids)
+                          .values_list('group_id', flat=True))
+
+
+@receiver(post_save, sender=Weight)
+def refresh_animal_weight_on_save(sender, instance, **kwargs):
+    refresh_animals({instance.animal_id, instance._original_animal_id} - {None})
+    instance._original_animal_id = instance.animal_id
+
+
+@receiver(post_delete, sender=Weight)
+def refresh_animal_weight_on_delete(sender, instance, origin=None, **kwargs):
+    # The animal itself is being deleted, with its group memberships, directly or
+    # along with its company, whether one instance or a queryset of them
+    if isinstance(origin, (Animal, Company)) or getattr(origin, 'model', None) in (Animal, Company):
+        return
+    refresh_animals([instance.animal_id])
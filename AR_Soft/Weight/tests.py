@@ -1,3 +1,8 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -112,3 +117,373 @@ class WeightAPITestCase(APITestCase):
         response = self.client.get(f"/api/weights/group-all-gain/{self.group.id}/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 1)
+
+
+class GroupGainQueryTestCase(APITestCase):
+    """
+    The group gain endpoints pair readings with window functions and must
+    not issue one query per animal.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.company = Company.objects.create(name="Test Company")
+        self.group = Group.objects.create(name="Test Group")
+        self.base = now() - timedelta(days=30)
+
+    def add_animals(self, count, start=0):
+        for i in range(start, start + count):
+            animal = Animal.objects.create(
+                eartag=f"TR{i:04d}", company=self.company, race="Holstein", gender=True, room="Room A"
+            )
+            AnimalGroup.objects.create(animal=animal, group=self.group)
+            Weight.objects.create(animal=animal, weight=300.0 + i, recorded_at=self.base)
+            Weight.objects.create(animal=animal, weight=310.0 + i, recorded_at=self.base + timedelta(days=10))
+            Weight.objects.create(animal=animal, weight=325.0 + i, recorded_at=self.base + timedelta(days=20))
+
+    def test_group_daily_gain_values(self):
+        self.add_animals(2)
+        lonely = Animal.objects.create(eartag="SOLO", company=self.company, room="Room B")
+        AnimalGroup.objects.create(animal=lonely, group=self.group)
+        Weight.objects.create(animal=lonely, weight=280.0, recorded_at=self.base)
+
+        response = self.client.get(f"/api/weights/group-daily-gain/{self.group.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["animals_count"], 3)
+        self.assertEqual(response.data["gains_count"], 2)
+        self.assertAlmostEqual(response.data["group_average_daily_gain"], 1.5)
+        first = response.data["results"][0]
+        self.assertEqual(first["eartag"], "TR0000")
+        self.assertEqual(first["latest_weight"], 325.0)
+        self.assertEqual(first["previous_weight"], 310.0)
+        self.assertEqual(first["days_diff"], 10)
+        self.assertEqual(first["previous_date"], self.base + timedelta(days=10))
+
+    def test_group_all_weight_gain_values(self):
+        self.add_animals(1)
+        empty = Animal.objects.create(eartag="EMPTY", company=self.company, room="Room B")
+        AnimalGroup.objects.create(animal=empty, group=self.group)
+
+        response = self.client.get(f"/api/weights/group-all-gain/{self.group.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["animals_count"], 2)
+        # (10 + 15) kg over (10 + 10) days summed per pair
+        self.assertAlmostEqual(response.data["group_average_daily_gain"], (1.0 + 1.5) / 20)
+        history = response.data["results"][0]["gain_history"]
+        self.assertEqual(response.data["results"][0]["records_count"], 3)
+        self.assertEqual([entry["weight_diff"] for entry in history], [10.0, 15.0])
+        self.assertEqual(history[0]["start_date"], self.base)
+        self.assertEqual(response.data["results"][1],
+                         {"animal_id": empty.id, "eartag": "EMPTY", "records_count": 0, "gain_history": []})
+
+    def test_group_gain_query_count_is_fixed(self):
+        self.add_animals(25)
+        with self.assertNumQueries(3):
+            self.client.get(f"/api/weights/group-daily-gain/{self.group.id}/")
+        with self.assertNumQueries(3):
+            self.client.get(f"/api/weights/group-all-gain/{self.group.id}/")
+
+
+class WeightExportTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.company = Company.objects.create(name="Test Company")
+        self.animal = Animal.objects.create(eartag="12345", company=self.company, room="Room A")
+        self.other = Animal.objects.create(eartag="67890", company=self.company, room="Room B")
+        Weight.objects.create(animal=self.animal, weight=50.0, recorded_at=now() - timedelta(days=2))
+        Weight.objects.create(animal=self.animal, weight=55.0, recorded_at=now())
+        Weight.objects.create(animal=self.other, weight=70.0, recorded_at=now())
+
+    def test_ndjson_export_streams_filtered_rows(self):
+        response = self.client.get("/api/weights/", {"format": "ndjson", "eartag": "12345"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["weight"] for row in rows], [50.0, 55.0])
+        self.assertEqual(set(rows[0]), {"id", "animal", "weight", "recorded_at"})
+        self.assertEqual(rows[0]["animal"], self.animal.id)
+
+    def test_csv_export(self):
+        response = self.client.get("/api/weights/", {"format": "csv", "animal_id": self.other.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", response["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ["id", "animal", "weight", "recorded_at"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], "70.0")
+
+    def test_default_format_is_unchanged(self):
+        response = self.client.get("/api/weights/")
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data), 3)
+
+
+class WeightCursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        company = Company.objects.create(name="Test Company")
+        self.recorded_at = now() - timedelta(days=5)
+        for i in range(5):
+            animal = Animal.objects.create(eartag=f"TR{i}", company=company, room="Room A")
+            # Several animals weighed at the same instant exercise the id tie-breaker
+            Weight.objects.create(animal=animal, weight=300.0 + i, recorded_at=self.recorded_at)
+            Weight.objects.create(animal=animal, weight=310.0 + i, recorded_at=self.recorded_at + timedelta(days=i + 1))
+
+    def test_cursor_walk_returns_every_row_once_in_order(self):
+        seen = []
+        url = "/api/weights/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data["results"])
+            url = response.data["next"]
+
+        expected = list(Weight.objects.order_by("recorded_at", "id").values_list("id", flat=True))
+        self.assertEqual([row["id"] for row in seen], expected)
+
+    def test_unpaginated_without_cursor_parameters(self):
+        response = self.client.get("/api/weights/")
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 10)
+
+
+class WeightBulkIngestTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.company = Company.objects.create(name="Test Company")
+        self.animal1 = Animal.objects.create(eartag="SC1", company=self.company, room="Room A")
+        self.animal2 = Animal.objects.create(eartag="SC2", company=self.company, room="Room A")
+        self.recorded_at = now() - timedelta(days=1)
+        Weight.objects.create(animal=self.animal1, weight=300.0, recorded_at=self.recorded_at)
+
+    def post(self, rows, query=""):
+        return self.client.post(f"/api/weights/bulk/{query}", rows, format="json")
+
+    def test_report_accepts_and_rejects_per_row(self):
+        later = (self.recorded_at + timedelta(hours=1)).isoformat()
+        rows = [
+            {"eartag": "SC1", "weight": 305.0, "recorded_at": later},
+            {"animal": self.animal2.id, "weight": 280.0, "recorded_at": later},
+            {"eartag": "SC1", "weight": 301.0, "recorded_at": self.recorded_at.isoformat()},  # already stored
+            {"eartag": "SC2", "weight": 281.0, "recorded_at": later},  # duplicate within upload
+            {"eartag": "UNKNOWN", "weight": 250.0},
+            {"eartag": "SC1", "animal": self.animal2.id, "weight": 250.0},  # mismatch
+            {"eartag": "SC1", "weight": -1},
+            {"weight": 250.0},
+            {"eartag": "SC2", "weight": 250.0, "recorded_at": (now() + timedelta(days=1)).isoformat()},
+        ]
+        response = self.post(rows)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["received"], 9)
+        self.assertEqual(response.data["accepted"], 2)
+        self.assertEqual(response.data["rejected"], 7)
+        self.assertEqual([r["status"] for r in response.data["results"]],
+                         ["accepted", "accepted"] + ["rejected"] * 7)
+        self.assertEqual(Weight.objects.count(), 3)
+        self.assertEqual(Weight.objects.get(animal=self.animal1, recorded_at=self.recorded_at).weight, 300.0)
+
+    def test_on_conflict_update_overwrites_existing_reading(self):
+        rows = [{"eartag": "SC1", "weight": 310.0, "recorded_at": self.recorded_at.isoformat()}]
+        response = self.post(rows, "?on_conflict=update")
+
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(Weight.objects.count(), 1)
+        self.assertEqual(Weight.objects.get().weight, 310.0)
+
+    def test_reading_stored_concurrently_is_reported_rejected(self):
+        from unittest.mock import patch
+        from Weight import ingest
+
+        later = (self.recorded_at + timedelta(hours=1)).isoformat()
+        rows = [
+            {"eartag": "SC1", "weight": 300.0, "recorded_at": self.recorded_at.isoformat()},
+            {"eartag": "SC2", "weight": 280.0, "recorded_at": later},
+        ]
+        # The stored reading of SC1, of the same weight, lands between the duplicate check and the insert
+        stored = ingest.existing_readings
+        checks = [{}]
+        with patch.object(ingest, "existing_readings",
+                          side_effect=lambda *args: checks.pop() if checks else stored(*args)):
+            response = self.post(rows)
+
+        self.assertEqual(response.data["accepted"], 1)
+        self.assertEqual(response.data["rejected"], 1)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["rejected", "accepted"])
+        self.assertEqual(Weight.objects.get(animal=self.animal1).weight, 300.0)
+
+    def test_non_list_payload_is_rejected(self):
+        response = self.post({"eartag": "SC1", "weight": 300.0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_does_not_grow_with_upload_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def upload(count, offset):
+            rows = [{"eartag": ("SC1", "SC2")[i % 2], "weight": 300.0 + i,
+                     "recorded_at": (self.recorded_at - timedelta(minutes=offset + i)).isoformat()}
+                    for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.post(rows)
+            self.assertEqual(response.data["accepted"], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(upload(4, 1), upload(40, 100))
+
+
+class LatestWeightDenormalizationTestCase(TestCase):
+    def setUp(self):
+        company = Company.objects.create(name="Test Company")
+        self.animal = Animal.objects.create(eartag="LW1", company=company, room="Room A")
+        self.other = Animal.objects.create(eartag="LW2", company=company, room="Room A")
+        self.day0 = now() - timedelta(days=10)
+
+    def latest(self, animal):
+        animal.refresh_from_db()
+        return (animal.latest_weight, animal.latest_weight_at, animal.previous_weight, animal.previous_weight_at)
+
+    def test_insert_and_out_of_order_backfill(self):
+        Weight.objects.create(animal=self.animal, weight=300.0, recorded_at=self.day0 + timedelta(days=5))
+        self.assertEqual(self.latest(self.animal), (300.0, self.day0 + timedelta(days=5), None, None))
+
+        # A backfilled older reading only becomes the previous weight
+        Weight.objects.create(animal=self.animal, weight=280.0, recorded_at=self.day0)
+        self.assertEqual(self.latest(self.animal),
+                         (300.0, self.day0 + timedelta(days=5), 280.0, self.day0))
+
+        Weight.objects.create(animal=self.animal, weight=290.0, recorded_at=self.day0 + timedelta(days=2))
+        self.assertEqual(self.latest(self.animal)[2:], (290.0, self.day0 + timedelta(days=2)))
+
+    def test_update_move_and_delete(self):
+        first = Weight.objects.create(animal=self.animal, weight=280.0, recorded_at=self.day0)
+        second = Weight.objects.create(animal=self.animal, weight=300.0, recorded_at=self.day0 + timedelta(days=5))
+
+        second.weight = 305.0
+        second.save()
+        self.assertEqual(self.latest(self.animal)[0], 305.0)
+
+        second.animal = self.other
+        second.save()
+        self.assertEqual(self.latest(self.animal), (280.0, self.day0, None, None))
+        self.assertEqual(self.latest(self.other)[0], 305.0)
+
+        first.delete()
+        self.assertEqual(self.latest(self.animal), (None, None, None, None))
+
+    def test_deleting_animals_skips_the_refresh_of_their_readings(self):
+        from unittest.mock import patch
+
+        for animal in (self.animal, self.other):
+            Weight.objects.create(animal=animal, weight=300.0, recorded_at=self.day0)
+
+        with patch("Weight.signals.refresh_animals") as refresh:
+            Animal.objects.filter(pk=self.animal.pk).delete()
+            self.other.company.delete()
+        refresh.assert_not_called()
+        self.assertFalse(Weight.objects.exists())
+
+    def test_bulk_ingest_refreshes_columns(self):
+        from Weight.ingest import ingest_weights
+
+        ingest_weights([{"eartag": "LW1", "weight": 250.0 + i,
+                         "recorded_at": (self.day0 + timedelta(days=i)).isoformat()} for i in range(3)])
+        self.assertEqual(self.latest(self.animal),
+                         (252.0, self.day0 + timedelta(days=2), 251.0, self.day0 + timedelta(days=1)))
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+
+        Weight.objects.create(animal=self.animal, weight=300.0, recorded_at=self.day0)
+        Animal.objects.filter(pk=self.animal.pk).update(latest_weight=None, latest_weight_at=None)
+
+        call_command("rebuild_latest_weights", stdout=io.StringIO())
+        self.assertEqual(self.latest(self.animal), (300.0, self.day0, None, None))
+
+
+class GrowthCurveTestCase(APITestCase):
+    """Growth curves are fitted per group in one batch and kept until the next reading."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.company = Company.objects.create(name="Test Company")
+        self.group = Group.objects.create(name="Finishers")
+        self.day0 = (now() - timedelta(days=200)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def add_animal(self, eartag, weights, every=20):
+        animal = Animal.objects.create(eartag=eartag, company=self.company, room="Room A")
+        AnimalGroup.objects.create(animal=animal, group=self.group)
+        Weight.objects.bulk_create([
+            Weight(animal=animal, weight=weight, recorded_at=self.day0 + timedelta(days=every * i))
+            for i, weight in enumerate(weights)
+        ])
+        return animal
+
+    def test_linear_and_gompertz_fits(self):
+        from Weight.growth import gompertz
+
+        steady = self.add_animal("LIN", [300.0, 320.0, 340.0])
+        curving = self.add_animal("GOMP", [float(gompertz(700.0, 1.2, 0.01, 20 * i)) for i in range(10)])
+        self.add_animal("ONE", [310.0])
+
+        at = (self.day0 + timedelta(days=100)).date()
+        response = self.client.get(f"/api/weights/group-growth/{self.group.id}/", {"at": at, "target": 400})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["animals_count"], response.data["fitted_count"]), (3, 2))
+
+        rows = {row["animal_id"]: row for row in response.data["results"]}
+        self.assertEqual(rows[steady.id]["model"], "linear")
+        self.assertAlmostEqual(rows[steady.id]["parameters"]["b"], 1.0)
+        self.assertAlmostEqual(rows[steady.id]["predicted_weight"], 400.0, delta=0.6)  # Midnight, not noon
+        self.assertEqual(rows[curving.id]["model"], "gompertz")
+        self.assertAlmostEqual(rows[curving.id]["parameters"]["a"], 700.0, places=2)
+        self.assertEqual(rows[curving.id]["days_to_target"], 0.0)  # Already past 400 kg
+
+        response = self.client.get(f"/api/weights/growth/{curving.id}/", {"target": 800})
+        self.assertIsNone(response.data["days_to_target"])  # Above the asymptote
+        response = self.client.get(f"/api/weights/growth/{steady.id}/", {"target": "heavy"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forecast_dates(self):
+        steady = self.add_animal("LIN", [300.0, 320.0, 340.0])
+        flat = self.add_animal("FLAT", [300.0, 300.0 + 1e-9])
+
+        for params in ({"at": "2026-02-30"}, {"at": "2026-13-01"}, {"at": "yesterday"}, {"target": "1e400"}):
+            response = self.client.get(f"/api/weights/growth/{steady.id}/", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Reached only after the last representable date: unreachable, not an overflow
+        for animal, target in ((steady, "1e9"), (steady, "1e300"), (flat, "400")):
+            response = self.client.get(f"/api/weights/growth/{animal.id}/", {"target": target})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual((response.data["days_to_target"], response.data["target_date"]), (None, None))
+
+        # Local midnight of the 1st is still the 31st in UTC
+        with self.settings(TIME_ZONE="Pacific/Auckland"):
+            response = self.client.get(f"/api/weights/growth/{steady.id}/", {"at": "2030-01-01", "target": 300})
+        self.assertEqual(response.data["days_to_target"], 0.0)
+        self.assertEqual(str(response.data["target_date"]), "2030-01-01")
+
+    def test_curves_are_stored_until_a_new_reading(self):
+        from Weight.models import GrowthCurve
+
+        animal = self.add_animal("LIN", [300.0, 320.0, 340.0])
+        for i in range(20):
+            self.add_animal(f"TR{i:04d}", [300.0 + i, 330.0 + i, 350.0 + i])
+
+        with self.assertNumQueries(5):  # Group, eartags, stored curves, readings, insert
+            self.client.get(f"/api/weights/group-growth/{self.group.id}/")
+        self.assertEqual(GrowthCurve.objects.count(), 21)
+        with self.assertNumQueries(4):
+            self.client.get(f"/api/weights/group-growth/{self.group.id}/")
+
+        Weight.objects.create(animal=animal, weight=400.0, recorded_at=self.day0 + timedelta(days=60))
+        self.assertFalse(GrowthCurve.objects.filter(animal=animal).exists())
+        response = self.client.get(f"/api/weights/growth/{animal.id}/")
+        self.assertEqual(response.data["readings"], 4)
@@ -1,11 +1,15 @@
 from django.urls import path
-from .views import WeightListView, WeightDetailView, DailyWeightGainView, AllWeightGainView, GroupDailyGainView,GroupAllWeightGainView
+from .views import WeightListView, WeightDetailView, DailyWeightGainView, AllWeightGainView, GroupDailyGainView,GroupAllWeightGainView, WeightBulkIngestView
+from .views import AnimalGrowthView, GroupGrowthView
 
 urlpatterns = [
     path('weights/', WeightListView.as_view(), name='weight-list'),
+    path('weights/bulk/', WeightBulkIngestView.as_view(), name='weight-bulk-ingest'),
     path('weights/<int:pk>/', WeightDetailView.as_view(), name='weight-detail'),
     path('weights/daily-gain/<int:animal_id>/', DailyWeightGainView.as_view(), name='daily-weight-gain'),
     path('weights/all-gain/<int:animal_id>/', AllWeightGainView.as_view(), name='all-gain'),
     path('weights/group-daily-gain/<int:group_id>/', GroupDailyGainView.as_view(), name='group-daily-gain'),
     path('weights/group-all-gain/<int:group_id>/', GroupAllWeightGainView.as_view(), name='group-all-gain'),
+    path('weights/growth/<int:animal_id>/', AnimalGrowthView.as_view(), name='animal-growth'),
+    path('weights/group-growth/<int:group_id>/', GroupGrowthView.as_view(), name='group-growth'),
 ]
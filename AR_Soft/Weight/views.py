@@ -1,20 +1,31 @@
 # weight/views.py
+import math
+
 from rest_framework import generics, status
 from rest_framework.response import Response
+from AR_Soft.exports import StreamingExportMixin
+from AR_Soft.optimizer import OptimizedQuerysetMixin
 from .models import Weight
 from .serializers import WeightSerializer
 from rest_framework.views import APIView
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from Animal.models import Group, Animal
+from .gains import gain_entry, gain_histories, latest_weight_pairs
+from .growth import CurveSet, growth_curves, start_of
+from .ingest import ingest_weights
 
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localtime, now, timedelta
 
-class WeightListView(generics.ListCreateAPIView):
+class WeightListView(OptimizedQuerysetMixin, StreamingExportMixin, generics.ListCreateAPIView):
     """
     API view to list all weight records or create a new one (or multiple).
-    Includes filtering by animal_id.
+    Includes filtering by animal_id and eartag.
+    Supports streaming exports with ?format=ndjson or ?format=csv.
     """
     serializer_class = WeightSerializer
+    cursor_ordering = ('recorded_at', 'id')
 
     def get_queryset(self):
         queryset = Weight.objects.all()
@@ -45,7 +56,33 @@ class WeightListView(generics.ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class WeightDetailView(generics.RetrieveUpdateDestroyAPIView):
+class WeightBulkIngestView(APIView):
+    """
+    Bulk upload of scale-station readings.
+
+    Accepts a list of ``{eartag | animal, weight, recorded_at}`` rows (or
+    ``{"readings": [...]}``) and stores every valid one in batches. Invalid
+    rows do not fail the upload; they are reported back per row. Readings
+    that already exist are rejected unless ``?on_conflict=update`` is given,
+    in which case their weight is overwritten.
+    """
+
+    def post(self, request):
+        rows = request.data.get('readings') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a list of weight readings."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        on_conflict = request.query_params.get('on_conflict', 'reject')
+        if on_conflict not in ('reject', 'update'):
+            return Response({"error": "on_conflict must be 'reject' or 'update'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report = ingest_weights(rows, update_existing=on_conflict == 'update')
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class WeightDetailView(OptimizedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific weight record.
     """
@@ -55,24 +92,23 @@ class WeightDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 class DailyWeightGainView(APIView):
     """
-    API view to calculate the daily weight gain of an animal based on its last two weight records.
+    API view to calculate the daily weight gain of an animal based on its last two weight records,
+    read from the latest/previous weight columns on Animal.
     """
 
     def get(self, request, animal_id):
-        # Fetch the last two weight records for the given animal, ordered by recorded_at descending
-        weights = Weight.objects.filter(animal_id=animal_id).order_by('-recorded_at')[:2]
+        # The last two weight records are kept on the animal itself
+        animal = Animal.objects.filter(pk=animal_id).values(
+            'latest_weight', 'latest_weight_at', 'previous_weight', 'previous_weight_at'
+        ).first()
 
         # Ensure there are at least two records
-        if len(weights) < 2:
+        if animal is None or animal['previous_weight_at'] is None:
             raise NotFound("Not enough weight records to calculate daily weight gain.")
 
-        # Extract the weights and dates
-        latest_weight = weights[0]
-        previous_weight = weights[1]
-
         # Calculate the weight difference and days between records
-        weight_diff = latest_weight.weight - previous_weight.weight
-        days_diff = (latest_weight.recorded_at - previous_weight.recorded_at).days
+        weight_diff = animal['latest_weight'] - animal['previous_weight']
+        days_diff = (animal['latest_weight_at'] - animal['previous_weight_at']).days
 
         if days_diff == 0:
             return Response(
@@ -85,10 +121,10 @@ class DailyWeightGainView(APIView):
 
         return Response({
             "animal_id": animal_id,
-            "latest_weight": latest_weight.weight,
-            "latest_date": latest_weight.recorded_at,
-            "previous_weight": previous_weight.weight,
-            "previous_date": previous_weight.recorded_at,
+            "latest_weight": animal['latest_weight'],
+            "latest_date": animal['latest_weight_at'],
+            "previous_weight": animal['previous_weight'],
+            "previous_date": animal['previous_weight_at'],
             "weight_diff": weight_diff,
             "days_diff": days_diff,
             "daily_gain": daily_gain
@@ -157,45 +193,29 @@ class GroupDailyGainView(APIView):
         # 1) Validate the group actually exists
         group = get_object_or_404(Group, pk=group_id)
 
-        # 2) Find all animals in this group
-        animals_in_group = Animal.objects.filter(animal_groups__group=group).distinct()
-
-        # 3) Prepare a list to hold the results
+        # 2) Prepare a list to hold the results
         daily_gains = []
         total_gain = 0
         valid_animals_count = 0
 
-        for animal in animals_in_group:
-            # 4) Get the last two Weight records for this animal
-            weights = (Weight.objects
-                       .filter(animal=animal)
-                       .order_by('-recorded_at')[:2])
-
-            # If fewer than 2 records, we can't compute daily gain
-            if len(weights) < 2:
-                continue
-
-            latest_weight = weights[0]
-            previous_weight = weights[1]
-
-            weight_diff = latest_weight.weight - previous_weight.weight
-            days_diff = (latest_weight.recorded_at - previous_weight.recorded_at).days
+        # 3) Latest and previous weight of every animal with 2+ records, in one query
+        for pair in latest_weight_pairs(group.pk):
+            weight_diff, days_diff, daily_gain = gain_entry(
+                pair['previous_weight'], pair['previous_date'], pair['weight'], pair['recorded_at']
+            )
 
-            if days_diff == 0:
-                daily_gain = None
-            else:
-                daily_gain = weight_diff / days_diff
+            if daily_gain is not None:
                 total_gain += daily_gain  # Add to total gain for average calculation
                 valid_animals_count += 1
 
             # Append individual animal's daily gain info
             daily_gains.append({
-                "animal_id": animal.id,
-                "eartag": animal.eartag,
-                "latest_weight": latest_weight.weight,
-                "latest_date": latest_weight.recorded_at,
-                "previous_weight": previous_weight.weight,
-                "previous_date": previous_weight.recorded_at,
+                "animal_id": pair['animal_id'],
+                "eartag": pair['animal__eartag'],
+                "latest_weight": pair['weight'],
+                "latest_date": pair['recorded_at'],
+                "previous_weight": pair['previous_weight'],
+                "previous_date": pair['previous_date'],
                 "weight_diff": weight_diff,
                 "days_diff": days_diff,
                 "daily_gain": daily_gain
@@ -208,7 +228,7 @@ class GroupDailyGainView(APIView):
         return Response({
             "group_id": group_id,
             "group_name": group.name,
-            "animals_count": animals_in_group.count(),
+            "animals_count": Animal.objects.filter(animal_groups__group=group).distinct().count(),
             "gains_count": len(daily_gains),  # how many animals had 2+ records
             "group_average_daily_gain": group_average_gain,  # Average daily gain for the group
             "results": daily_gains
@@ -226,53 +246,48 @@ class GroupAllWeightGainView(APIView):
         group = get_object_or_404(Group, pk=group_id)
 
         # 2) Get all animals in the group (unique, just in case)
-        animals_in_group = Animal.objects.filter(animal_groups__group=group).distinct()
+        animals_in_group = list(
+            Animal.objects.filter(animal_groups__group=group).distinct().order_by('pk').values_list('id', 'eartag')
+        )
+
+        # 3) Every consecutive pair of readings, paired in SQL and streamed per
+        #    animal in id order, merged in as it is read rather than kept aside
+        histories = gain_histories(group.pk)
+        history = next(histories, None)
 
         group_gains = []
         total_gain = 0
         total_days = 0
 
-        for animal in animals_in_group:
-            # 3) Fetch *all* weight records for this animal, sorted ascending
-            weights = Weight.objects.filter(animal=animal).order_by('recorded_at')
-
-            if len(weights) < 2:
-                group_gains.append({
-                    "animal_id": animal.id,
-                    "eartag": animal.eartag,
-                    "records_count": len(weights),
-                    "gain_history": []
-                })
-                continue
+        for animal_id, eartag in animals_in_group:
+            while history is not None and history[0] < animal_id:
+                history = next(histories, None)
+            records_count, pairs = 0, []
+            if history is not None and history[0] == animal_id:
+                _, records_count, pairs = history
+                history = next(histories, None)
 
             gain_history = []
-            for i in range(len(weights) - 1):
-                current_weight = weights[i]
-                next_weight = weights[i + 1]
-
-                weight_diff = next_weight.weight - current_weight.weight
-                days_diff = (next_weight.recorded_at - current_weight.recorded_at).days
-
-                daily_gain = None
-                if days_diff != 0:
-                    daily_gain = weight_diff / days_diff
+            for start_weight, start_date, end_weight, end_date in pairs:
+                weight_diff, days_diff, daily_gain = gain_entry(start_weight, start_date, end_weight, end_date)
+                if daily_gain is not None:
                     total_gain += daily_gain
                     total_days += days_diff
 
                 gain_history.append({
-                    "start_date": current_weight.recorded_at,
-                    "start_weight": current_weight.weight,
-                    "end_date": next_weight.recorded_at,
-                    "end_weight": next_weight.weight,
+                    "start_date": start_date,
+                    "start_weight": start_weight,
+                    "end_date": end_date,
+                    "end_weight": end_weight,
                     "weight_diff": weight_diff,
                     "days_diff": days_diff,
                     "daily_gain": daily_gain
                 })
 
             group_gains.append({
-                "animal_id": animal.id,
-                "eartag": animal.eartag,
-                "records_count": len(weights),
+                "animal_id": animal_id,
+                "eartag": eartag,
+                "records_count": records_count,
                 "gain_history": gain_history
             })
 
@@ -283,7 +298,117 @@ class GroupAllWeightGainView(APIView):
         return Response({
             "group_id": group_id,
             "group_name": group.name,
-            "animals_count": animals_in_group.count(),
+            "animals_count": len(animals_in_group),
             "group_average_daily_gain": group_average_gain,  # Average daily gain for the group
             "results": group_gains
         })
+
+
+class GrowthForecastMixin:
+    """
+    Forecasts from fitted growth curves. ``?at=YYYY-MM-DD`` is the date of
+    the predicted weight (default now); ``?target=<kg>`` adds the days until
+    each animal is predicted to reach that weight, and the date it does.
+    """
+
+    def get_forecast_params(self, request):
+        at = now()
+        if request.query_params.get('at'):
+            try:
+                day = parse_date(request.query_params['at'])
+            except ValueError:  # Well formed but not a real date, e.g. 2026-02-30
+                day = None
+            if day is None:
+                raise ValidationError({"at": "Must be a date in YYYY-MM-DD format."})
+            at = start_of(day)
+
+        target = request.query_params.get('target')
+        if target is not None:
+            try:
+                target = float(target)
+            except ValueError:
+                target = None
+            if target is None or not 0 < target < math.inf:
+                raise ValidationError({"target": "Must be a positive weight in kg."})
+        return at, target
+
+    @staticmethod
+    def target_date(at, days_to_target):
+        """
+        Local date ``days_to_target`` days after ``at``, or None when there is
+        none: the target is never reached, or only after the last
+        representable date (a near-flat curve can take millions of years).
+        """
+        if not math.isfinite(days_to_target):
+            return None
+        try:
+            return (localtime(at) + timedelta(days=float(days_to_target))).date()
+        except OverflowError:
+            return None
+
+    def forecast(self, curves, at, target):
+        """One forecast row per curve, every prediction computed as arrays."""
+        curve_set = CurveSet(curves)
+        weights = curve_set.weights_at(at)
+        days = curve_set.days_to_weight(target, at) if target is not None else [math.nan] * len(curves)
+
+        rows = []
+        for curve, weight, days_to_target in zip(curves, weights, days):
+            target_date = self.target_date(at, days_to_target)
+            reachable = target_date is not None
+            rows.append({
+                "animal_id": curve.animal_id,
+                "model": curve.model,
+                "parameters": {"a": curve.a, "b": curve.b, "c": curve.c},
+                "origin": curve.origin,
+                "readings": curve.readings,
+                "rmse": curve.rmse,
+                "predicted_weight": float(weight),
+                "days_to_target": float(days_to_target) if reachable else None,
+                "target_date": target_date,
+            })
+        return rows
+
+
+class AnimalGrowthView(GrowthForecastMixin, APIView):
+    """Growth curve of one animal, its predicted weight and days to a target weight."""
+
+    def get(self, request, animal_id):
+        at, target = self.get_forecast_params(request)
+        curve = growth_curves(Animal.objects.filter(pk=animal_id)).get(animal_id)
+        if curve is None:
+            raise NotFound("Not enough weight records to fit a growth curve.")
+        return Response({"at": at, "target_weight": target, **self.forecast([curve], at, target)[0]})
+
+
+class GroupGrowthView(GrowthForecastMixin, APIView):
+    """
+    Growth curves of every animal in a group, fitted in one batch, with
+    their predicted weights and days to a target weight. Animals reaching
+    the target soonest come first when a target is given.
+    """
+
+    def get(self, request, group_id):
+        group = get_object_or_404(Group, pk=group_id)
+        at, target = self.get_forecast_params(request)
+
+        animals = Animal.objects.filter(animal_groups__group=group)
+        eartags = dict(animals.values_list('id', 'eartag'))
+        curves = growth_curves(animals)
+        rows = self.forecast([curves[pk] for pk in sorted(curves)], at, target)
+        for row in rows:
+            row["eartag"] = eartags[row["animal_id"]]
+        if target is not None:
+            rows.sort(key=lambda row: (row["days_to_target"] is None, row["days_to_target"] or 0))
+
+        predicted = [row["predicted_weight"] for row in rows]
+        return Response({
+            "group_id": group.pk,
+            "group_name": group.name,
+            "at": at,
+            "target_weight": target,
+            "animals_count": len(eartags),
+            "fitted_count": len(rows),
+            "average_predicted_weight": sum(predicted) / len(predicted) if predicted else None,
+            "results": rows,
+        })
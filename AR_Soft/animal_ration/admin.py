@@ -1,4 +1,11 @@
 from django.contrib import admin
-from .models import AnimalRationLog
+from .models import AnimalRationLog, FeedCostEntry, FeedCostRun
 
 admin.site.register(AnimalRationLog)
+admin.site.register(FeedCostEntry)
+
+
+@admin.register(FeedCostRun)
+class FeedCostRunAdmin(admin.ModelAdmin):
+    list_display = ('date', 'status', 'attempts', 'animals', 'started_at', 'finished_at')
+    list_filter = ('status',)
@@ -0,0 +1,316 @@
+"""
+Historical feed cost backfill.
+
+Recomputes the ``FeedCostEntry`` ledger for a past date range by replaying
+each animal's ``AnimalRationLog`` intervals against the ration tables as
+they were on each day (``ration_logs.as_of``: the components on the table,
+their quantities, prices and dry matter, including components removed
+since) and the animal's weight as of each day. The animals' inputs are
+loaded per batch in a constant number of queries and the days are computed
+in memory; each ration table is reconstructed once per day it is used on,
+so a range of months costs a few queries per table and day plus a handful
+of set-based reads and one bulk insert per batch.
+
+The herd is split into animal-id shards whose batches can be computed by a
+process pool; each shard checkpoints its progress as batches are written,
+so an interrupted run resumes where it stopped.
+"""
+import logging
+import multiprocessing
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import connections, transaction
+from django.utils.timezone import now, timedelta
+
+from Animal.models import Animal, AnimalGroup
+from ration_components.models import RationTable
+from ration_logs.as_of import end_of, ration_table_as_of
+from Weight.models import Weight
+from .feed_cost import FIVE_PLACES, WHOLE_HERD, daily_feed_cost, in_animal_range, refresh_feed_costs
+from .models import AnimalRationLog, FeedCostBackfill, FeedCostBackfillShard, FeedCostEntry, as_date
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+
+class ValueTimeline:
+    """
+    The values a quantity took over time. ``at(day)`` returns the value in
+    effect at the end of ``day``; when several changes fall on the same day
+    the last one wins.
+    """
+
+    def __init__(self, initial, changes=()):
+        self.initial = initial
+        self.days = [day for day, _ in changes]
+        self.values = [value for _, value in changes]
+
+    def at(self, day):
+        index = bisect_right(self.days, day)
+        return self.values[index - 1] if index else self.initial
+
+
+class RationCostTimeline:
+    """
+    Daily cost and dry matter of every ration table, from the table as it
+    was at the end of each day (``ration_table_as_of``), so components
+    removed since still count on the days they were on it. Totals are
+    memoized per table and day.
+    """
+
+    def __init__(self):
+        self.tables = RationTable.all_objects.in_bulk()
+        self._totals = {}
+
+    def totals(self, ration_table_id, day):
+        key = (ration_table_id, day)
+        if key not in self._totals:
+            table = self.tables.get(ration_table_id)
+            if table is None:
+                self._totals[key] = (Decimal(0), Decimal(0))  # Hard deleted along with its history
+            else:
+                state = ration_table_as_of(table, end_of(day))
+                self._totals[key] = (state['cost'], state['dry_matter'])
+        return self._totals[key]
+
+
+def days_between(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def ration_days(animal_ids, start_date, end_date):
+    """
+    Return ``{animal_id: {day: ration_table_id}}``. A log covers every day from
+    its start date to its end date; on a changeover day the newer log wins.
+    """
+    logs = (AnimalRationLog.objects
+            .filter(animal_id__in=animal_ids, start_date__date__lte=end_date)
+            .exclude(end_date__date__lt=start_date)
+            .order_by('animal_id', 'start_date', 'id')
+            .values_list('animal_id', 'ration_table_id', 'start_date', 'end_date'))
+
+    schedule = {}
+    for animal_id, ration_table_id, log_start, log_end in logs:
+        first = max(as_date(log_start), start_date)
+        last = min(as_date(log_end), end_date) if log_end else end_date
+        days = schedule.setdefault(animal_id, {})
+        for day in days_between(first, last):
+            days[day] = ration_table_id
+    return schedule
+
+
+def weight_timelines(animal_ids, end_date):
+    """Return ``{animal_id: ValueTimeline}`` of every reading up to ``end_date``."""
+    readings = (Weight.objects
+                .filter(animal_id__in=animal_ids, recorded_at__date__lte=end_date)
+                .order_by('animal_id', 'recorded_at')
+                .values_list('animal_id', 'weight', 'recorded_at'))
+    return {
+        animal_id: ValueTimeline(None, [(as_date(recorded_at), weight) for _, weight, recorded_at in rows])
+        for animal_id, rows in groupby(readings, key=lambda row: row[0])
+    }
+
+
+def group_dry_matters(animal_ids):
+    """Dry matter of each animal's first group, as used by the nightly run."""
+    dry_matters = {}
+    rows = (AnimalGroup.objects
+            .filter(animal_id__in=animal_ids)
+            .order_by('animal_id', 'pk')
+            .values_list('animal_id', 'group__dry_matter'))
+    for animal_id, dry_matter in rows:
+        dry_matters.setdefault(animal_id, dry_matter)
+    return dry_matters
+
+
+def compute_backfill_entries(animal_ids, start_date, end_date, costs):
+    """Ledger entries of the given animals for every day of the range on which they accrue."""
+    schedule = ration_days(animal_ids, start_date, end_date)
+    weights = weight_timelines(animal_ids, end_date)
+    dry_matters = group_dry_matters(animal_ids)
+
+    entries = []
+    for animal_id in animal_ids:
+        group_dm = dry_matters.get(animal_id)
+        if not group_dm or animal_id not in weights:
+            continue
+        for day, ration_table_id in sorted(schedule.get(animal_id, {}).items()):
+            weight = weights[animal_id].at(day)
+            table_cost, table_dm = costs.totals(ration_table_id, day)
+            if weight is None or not table_dm:
+                continue
+            dm, cost = daily_feed_cost(table_cost, table_dm, group_dm, weight)
+            entries.append(FeedCostEntry(
+                animal_id=animal_id, date=day, ration_table_id=ration_table_id,
+                dry_matter_intake=dm.quantize(FIVE_PLACES), cost=cost.quantize(FIVE_PLACES),
+                source=FeedCostEntry.BACKFILL,
+            ))
+    return entries
+
+
+def replace_ledger(animal_ids, entries, **dates):
+    """
+    Replace the ledger of the given animals on ``dates`` (a date lookup such
+    as ``date__range=(start, end)``) with ``entries`` and re-derive their
+    ``feed_cost``. Opening balances hold all the feed cost up to their date,
+    so they are kept, and the entries of the days they cover are dropped.
+    """
+    opening = FeedCostEntry.objects.filter(animal_id__in=animal_ids).opening_dates()
+    (FeedCostEntry.objects.filter(animal_id__in=animal_ids, **dates)
+     .exclude(source=FeedCostEntry.OPENING).delete())
+    FeedCostEntry.objects.bulk_create(
+        [entry for entry in entries if entry.animal_id not in opening or entry.date > opening[entry.animal_id]],
+        batch_size=1000,
+    )
+    refresh_feed_costs(animal_ids)
+
+
+def write_backfill_batch(shard, animal_ids, entries):
+    """
+    Replace the ledger of the given animals over the shard's range with the
+    recomputed entries, re-derive their ``feed_cost`` and advance the shard's
+    checkpoint, all in one transaction.
+    """
+    backfill = shard.backfill
+    with transaction.atomic():
+        replace_ledger(animal_ids, entries, date__range=(backfill.start_date, backfill.end_date))
+        shard.checkpoint_animal_id = animal_ids[-1]
+        shard.save(update_fields=['checkpoint_animal_id'])
+
+
+_cost_timelines = {}
+
+
+def compute_backfill_batch(backfill_id, start_date, end_date, animal_ids):
+    """
+    Compute the entries of one batch. Read-only, so it can run in a worker
+    process; the price timeline is built once per process and backfill.
+    """
+    if backfill_id not in _cost_timelines:
+        _cost_timelines.clear()
+        _cost_timelines[backfill_id] = RationCostTimeline()
+    return compute_backfill_entries(animal_ids, start_date, end_date, _cost_timelines[backfill_id])
+
+
+def catch_up_feed_costs(key, dates, animal_range=WHOLE_HERD, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Record the missed ``dates`` of feed cost for the animals in the inclusive
+    ``animal_range`` of ids as a backfill would: from the ration logs, prices
+    and weights in effect on each day, not today's. ``key`` identifies the
+    run, whose price timeline is built once per process. Every batch is
+    written in its own transaction; returns the number of animals that
+    accrued feed cost on any of the dates.
+    """
+    dates = set(dates)
+    animal_ids = list(Animal.objects.filter(in_animal_range(animal_range, 'pk'))
+                      .order_by('pk')
+                      .values_list('pk', flat=True))
+    accrued = set()
+    for i in range(0, len(animal_ids), batch_size):
+        batch = animal_ids[i:i + batch_size]
+        entries = [entry for entry in compute_backfill_batch(key, min(dates), max(dates), batch)
+                   if entry.date in dates]
+        with transaction.atomic():
+            replace_ledger(batch, entries, date__in=dates)
+        accrued.update(entry.animal_id for entry in entries)
+    logger.info("Caught up feed cost for %d animals on %s (animals %s).",
+                len(accrued), ", ".join(str(day) for day in sorted(dates)), animal_range)
+    return len(accrued)
+
+
+def compute_backfill_batch_in_worker(args):
+    """Pool entry point; every worker process uses and closes its own connections."""
+    try:
+        return compute_backfill_batch(*args)
+    finally:
+        connections.close_all()
+
+
+def pending_batches(backfill, batch_size):
+    """
+    ``(shard, animal_ids, last_of_shard)`` for every batch not yet written,
+    in checkpoint order.
+    """
+    batches = []
+    for shard in backfill.shards.filter(completed_at__isnull=True).select_related('backfill'):
+        resume_after = shard.checkpoint_animal_id or shard.first_animal_id - 1
+        animal_ids = list(Animal.objects
+                          .filter(pk__gt=resume_after, pk__lte=shard.last_animal_id)
+                          .order_by('pk')
+                          .values_list('pk', flat=True))
+        chunks = [animal_ids[i:i + batch_size] for i in range(0, len(animal_ids), batch_size)] or [[]]
+        batches.extend((shard, chunk, index == len(chunks) - 1) for index, chunk in enumerate(chunks))
+    return batches
+
+
+def start_backfill(start_date, end_date, shards=1, restart=False):
+    """
+    Return the unfinished backfill of the range, or create a new one with the
+    herd split into ``shards`` contiguous animal-id ranges.
+    """
+    if start_date > end_date:
+        raise ValueError("The backfill start date must not be after its end date.")
+
+    backfill = (FeedCostBackfill.objects
+                .filter(start_date=start_date, end_date=end_date, finished_at__isnull=True)
+                .order_by('-pk')
+                .first())
+    if backfill and not restart:
+        return backfill
+
+    backfill = FeedCostBackfill.objects.create(start_date=start_date, end_date=end_date)
+    animal_ids = list(Animal.objects.order_by('pk').values_list('pk', flat=True))
+    shard_size = max(-(-len(animal_ids) // max(shards, 1)), 1)
+    FeedCostBackfillShard.objects.bulk_create([
+        FeedCostBackfillShard(backfill=backfill, first_animal_id=chunk[0], last_animal_id=chunk[-1])
+        for chunk in (animal_ids[i:i + shard_size] for i in range(0, len(animal_ids), shard_size))
+    ])
+    return backfill
+
+
+def run_backfill(start_date, end_date, workers=1, shards=None, batch_size=DEFAULT_BATCH_SIZE, restart=False):
+    """
+    Backfill the ledger over ``start_date``..``end_date``, resuming an
+    interrupted run of the same range unless ``restart`` is set.
+
+    With ``workers > 1`` the batches are computed by a pool of forked
+    processes while this process writes their results in order, so each
+    checkpoint only ever covers written animals and the database sees a
+    single writer. Returns ``(backfill, entries_written)``.
+    """
+    backfill = start_backfill(start_date, end_date, shards or workers * 4, restart)
+    batches = pending_batches(backfill, batch_size)
+    _cost_timelines.clear()  # Price history may have changed since an earlier run
+    work = [(backfill.pk, start_date, end_date, animal_ids) for _, animal_ids, _ in batches]
+
+    pool = None
+    if workers > 1 and len(work) > 1:
+        # Forked children must not share this process's database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        results = pool.map(compute_backfill_batch_in_worker, work)
+    else:
+        results = (compute_backfill_batch(*args) for args in work)
+
+    written = 0
+    try:
+        for (shard, animal_ids, last_of_shard), entries in zip(batches, results):
+            if animal_ids:
+                write_backfill_batch(shard, animal_ids, entries)
+                written += len(entries)
+            if last_of_shard:
+                shard.completed_at = now()
+                shard.save(update_fields=['completed_at'])
+                logger.info("Backfilled %s.", shard)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    backfill.finished_at = now()
+    backfill.save(update_fields=['finished_at'])
+    logger.info("Finished %s: %d entries written.", backfill, written)
+    return backfill, written
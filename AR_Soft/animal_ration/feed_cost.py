@@ -0,0 +1,227 @@
+"""
+Set-based feed cost engine.
+
+Loads everything the nightly feed cost run needs (active ration logs, the
+animal's first group dry matter, its latest weight and the materialized
+per-ration-table totals, the reference data through the read-through
+cache) in a constant number of queries, computes every
+animal's daily cost in one pass and upserts it into the ``FeedCostEntry``
+ledger. ``Animal.feed_cost`` is then re-derived from the ledger with a single
+UPDATE, so re-running a day never double-counts it.
+
+A run can be limited to an animal-id range; ``feed_cost_chunks`` splits the
+herd into such ranges so the nightly task can fan them out to workers
+(``animal_ration.tasks``).
+"""
+import logging
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import localdate, now
+
+from Animal.cache import group_dry_matters
+from Animal.models import Animal, AnimalGroup
+from dashboard.summary import queue_summary_refresh
+from ration_components.cache import ration_table_totals
+from .models import AnimalRationLog, FeedCostEntry
+
+logger = logging.getLogger(__name__)
+
+FIVE_PLACES = Decimal('0.00000')
+BULK_UPDATE_BATCH_SIZE = 1000
+FEED_COST_CHUNK_SIZE = 5000
+WHOLE_HERD = (None, None)
+
+FeedCostAccrual = namedtuple('FeedCostAccrual', ['animal', 'ration_table_id', 'dry_matter_intake', 'cost'])
+
+
+def active_ration_logs():
+    """
+    Active ration logs annotated with the inputs of the feed cost formula.
+
+    ``group_id`` is the animal's first group, resolved as a correlated
+    subquery, and ``current_weight`` its most recent weight, read from the
+    denormalized ``Animal.latest_weight`` column, so the whole herd is read
+    with a single SELECT. The group dry matter comes from the group cache.
+    """
+    first_group = (AnimalGroup.objects
+                   .filter(animal=OuterRef('animal_id'))
+                   .order_by('pk')
+                   .values('group_id')[:1])
+    return (AnimalRationLog.objects
+            .filter(is_active=True)
+            .select_related('animal')
+            .annotate(group_id=Subquery(first_group),
+                      current_weight=F('animal__latest_weight')))
+
+
+def in_animal_range(animal_range, field='animal_id'):
+    """Filter on an inclusive ``(first, last)`` animal-id range; None leaves that end open."""
+    first, last = animal_range
+    condition = Q()
+    if first is not None:
+        condition &= Q(**{f'{field}__gte': first})
+    if last is not None:
+        condition &= Q(**{f'{field}__lte': last})
+    return condition
+
+
+def feed_cost_chunks(chunk_size=FEED_COST_CHUNK_SIZE):
+    """
+    Split the animals on an active ration into contiguous animal-id ranges
+    of ``chunk_size`` animals each. The outer ranges are open-ended, so the
+    chunks cover every id: a rerun still drops the entries of animals that
+    stopped accruing, whatever chunk they fall in.
+    """
+    animal_ids = list(AnimalRationLog.objects
+                      .filter(is_active=True)
+                      .order_by('animal_id')
+                      .values_list('animal_id', flat=True)
+                      .distinct())
+    boundaries = animal_ids[chunk_size::chunk_size]
+    return [(first, None if following is None else following - 1)
+            for first, following in zip([None] + boundaries, boundaries + [None])]
+
+
+def attach_group_dry_matters(logs):
+    """Set ``group_dry_matter`` on every log from the cached group dry matters."""
+    dry_matters = group_dry_matters({log.group_id for log in logs if log.group_id is not None})
+    for log in logs:
+        log.group_dry_matter = dry_matters.get(log.group_id)
+    return logs
+
+
+def daily_feed_cost(daily_cost, table_dm, group_dry_matter, weight):
+    """
+    Dry matter intake and cost of one animal for one day:
+    ``cost = table cost * (group DM * weight) / table DM``.
+    """
+    current_weight = Decimal(weight).quantize(FIVE_PLACES, rounding=ROUND_HALF_UP)
+    dm = Decimal(group_dry_matter).quantize(FIVE_PLACES, rounding=ROUND_HALF_UP) * current_weight
+    return dm, daily_cost * (dm / table_dm)
+
+
+def compute_feed_cost_accruals(logs, totals):
+    """
+    Compute the daily feed cost of every animal with an active ration log.
+
+    Returns ``{animal_id: FeedCostAccrual}``; animals without a group dry
+    matter, a weight record or a ration table with dry matter are skipped.
+    An animal with several active logs accrues their sum and is recorded
+    without a ration table.
+    """
+    accruals = {}
+    for log in logs:
+        animal = log.animal
+
+        if not log.group_dry_matter:
+            logger.debug("Animal %s has no group dry matter value. Skipping.", animal.eartag)
+            continue
+
+        if log.current_weight is None:
+            logger.debug("No weight record found for Animal %s. Skipping.", animal.eartag)
+            continue
+
+        daily_cost, table_dm = totals.get(log.ration_table_id, (Decimal(0), Decimal(0)))
+        if not table_dm:
+            logger.debug("Ration table %s has no valid dry matter value. Skipping animal %s.",
+                         log.ration_table_id, animal.eartag)
+            continue
+
+        dm, animal_feed_cost = daily_feed_cost(daily_cost, table_dm, log.group_dry_matter, log.current_weight)
+
+        previous = accruals.get(animal.pk)
+        if previous is None:
+            accruals[animal.pk] = FeedCostAccrual(animal, log.ration_table_id, dm, animal_feed_cost)
+        else:
+            accruals[animal.pk] = FeedCostAccrual(animal, None,
+                                                  previous.dry_matter_intake + dm,
+                                                  previous.cost + animal_feed_cost)
+    return accruals
+
+
+def refresh_feed_costs(animal_ids):
+    """Re-derive ``Animal.feed_cost`` from the ledger for the given animals in one UPDATE."""
+    ledger_total = (FeedCostEntry.objects
+                    .filter(animal=OuterRef('pk'))
+                    .values('animal')
+                    .annotate(total=Sum('cost'))
+                    .values('total'))
+    updated = Animal.objects.filter(pk__in=animal_ids).update(
+        feed_cost=Coalesce(Subquery(ledger_total), Value(Decimal(0)),
+                           output_field=DecimalField(max_digits=10, decimal_places=2)),
+        updated_at=now(),
+    )
+    # The UPDATE sends no signals; the dashboard's feed cost totals follow explicitly
+    queue_summary_refresh(companies=Animal.objects
+                          .filter(pk__in=animal_ids)
+                          .order_by()
+                          .values_list('company_id', flat=True)
+                          .distinct())
+    return updated
+
+
+def record_feed_costs(dates, accruals, batch_size=BULK_UPDATE_BATCH_SIZE, animal_range=WHOLE_HERD):
+    """
+    Make ``accruals`` the ledger of each of ``dates`` within ``animal_range``:
+    upsert one entry per animal and date, and drop the entries of animals in
+    the range that no longer accrue. Days covered by an animal's opening
+    balance are left alone. Returns the ids of every animal whose ledger
+    changed.
+    """
+    ledger = FeedCostEntry.objects.filter(in_animal_range(animal_range))
+    opening = ledger.filter(date__gte=min(dates)).opening_dates()
+    FeedCostEntry.objects.bulk_create(
+        [FeedCostEntry(animal_id=animal_id, date=date, ration_table_id=accrual.ration_table_id,
+                       dry_matter_intake=accrual.dry_matter_intake.quantize(FIVE_PLACES, rounding=ROUND_HALF_UP),
+                       cost=accrual.cost.quantize(FIVE_PLACES, rounding=ROUND_HALF_UP),
+                       source=FeedCostEntry.DAILY)
+         for date in dates for animal_id, accrual in accruals.items()
+         if animal_id not in opening or date > opening[animal_id]],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['animal', 'date'],
+        update_fields=['ration_table', 'dry_matter_intake', 'cost', 'source', 'updated_at'],
+    )
+
+    recorded = set(ledger.filter(date__in=dates).values_list('animal_id', flat=True))
+    stale = recorded - accruals.keys()
+    if stale:
+        (FeedCostEntry.objects.filter(date__in=dates, animal_id__in=stale)
+         .exclude(source=FeedCostEntry.OPENING).delete())
+    return recorded | stale
+
+
+def run_feed_cost_days(dates, batch_size=BULK_UPDATE_BATCH_SIZE, animal_range=WHOLE_HERD):
+    """
+    Record ``dates`` of feed cost for every animal on an active ration, or
+    for those in the inclusive ``animal_range`` of ids, in one pass: the
+    herd is read and priced once, from its current rations, prices and
+    weights, and every date gets the same accruals. Days of the past are
+    priced from history instead (``backfill.catch_up_feed_costs``).
+
+    Idempotent per date and range: running it twice leaves the ledger and
+    ``Animal.feed_cost`` unchanged. Runs inside a single transaction and
+    returns the number of animals that accrued feed cost.
+    """
+    with transaction.atomic():
+        logs = attach_group_dry_matters(list(active_ration_logs()
+                                             .filter(in_animal_range(animal_range))
+                                             .select_for_update(of=('animal',))))
+        totals = ration_table_totals({log.ration_table_id for log in logs})
+        accruals = compute_feed_cost_accruals(logs, totals)
+
+        changed = record_feed_costs(dates, accruals, batch_size=batch_size, animal_range=animal_range)
+        refresh_feed_costs(changed)
+
+    logger.info("Processed %d active ration logs, recorded feed cost for %d animals on %s (animals %s).",
+                len(logs), len(accruals), ", ".join(str(date) for date in dates), animal_range)
+    return len(accruals)
+
+
+def run_feed_cost_update(date=None, batch_size=BULK_UPDATE_BATCH_SIZE, animal_range=WHOLE_HERD):
+    """Record one day (today by default) of feed cost; see ``run_feed_cost_days``."""
+    return run_feed_cost_days([date or localdate()], batch_size=batch_size, animal_range=animal_range)
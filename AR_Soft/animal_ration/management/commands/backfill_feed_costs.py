@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils.dateparse import parse_date
+from django.utils.timezone import localdate, timedelta
+from animal_ration.backfill import DEFAULT_BATCH_SIZE, run_backfill
+from animal_ration.models import AnimalRationLog, as_date
+
+
+class Command(BaseCommand):
+    help = ("Recompute the daily feed cost ledger for a past date range from the ration log "
+            "intervals and the ration tables as they were on each day (components, quantities and "
+            "price history). Interrupted runs resume from their checkpoints.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help="First day (YYYY-MM-DD). Defaults to the earliest ration log.")
+        parser.add_argument('--end', type=str, help="Last day (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--workers', type=int, default=1, help="Number of worker processes.")
+        parser.add_argument('--shards', type=int, help="Number of animal-id shards (default: 4 per worker).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Animals written per transaction and checkpoint.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Start over instead of resuming an unfinished run of the same range.")
+
+    def parse_day(self, value, name):
+        try:
+            day = parse_date(value)
+        except ValueError:  # Well formed but not a real date, e.g. 2026-02-30
+            day = None
+        if day is None:
+            raise CommandError(f"--{name} must be a date in YYYY-MM-DD format.")
+        return day
+
+    def handle(self, *args, **kwargs):
+        if kwargs['start']:
+            start_date = self.parse_day(kwargs['start'], 'start')
+        else:
+            first_log = AnimalRationLog.objects.aggregate(first=Min('start_date'))['first']
+            if first_log is None:
+                self.stdout.write("No ration logs found; nothing to backfill.")
+                return
+            start_date = as_date(first_log)
+        end_date = self.parse_day(kwargs['end'], 'end') if kwargs['end'] else localdate() - timedelta(days=1)
+
+        try:
+            backfill, written = run_backfill(
+                start_date, end_date,
+                workers=kwargs['workers'],
+                shards=kwargs['shards'],
+                batch_size=kwargs['batch_size'],
+                restart=kwargs['restart'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"{backfill}: wrote {written} feed cost entries."))
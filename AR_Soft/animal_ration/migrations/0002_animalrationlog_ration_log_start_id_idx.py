@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animal_ration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animalrationlog',
+            index=models.Index(fields=['-start_date', 'id'], name='ration_log_start_id_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.timezone import localdate, timedelta
+
+
+def seed_opening_balances(apps, schema_editor):
+    """
+    Carry the feed cost accumulated so far into the ledger as one opening
+    balance entry per animal, dated the day before the ledger starts.
+    """
+    Animal = apps.get_model('Animal', 'Animal')
+    FeedCostEntry = apps.get_model('animal_ration', 'FeedCostEntry')
+
+    opening_date = localdate() - timedelta(days=1)
+    FeedCostEntry.objects.bulk_create(
+        [FeedCostEntry(animal_id=animal_id, date=opening_date, cost=feed_cost, source='opening')
+         for animal_id, feed_cost in Animal.objects.exclude(feed_cost=0).values_list('id', 'feed_cost')],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_components', '0017_rationtableaggregate'),
+        ('Animal', '0006_animal_latest_weight'),
+        ('animal_ration', '0002_animalrationlog_ration_log_start_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCostEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dry_matter_intake', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('source', models.CharField(choices=[('daily', 'Daily accrual'), ('opening', 'Opening balance')], default='daily', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('animal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_cost_entries', to='Animal.animal')),
+                ('ration_table', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feed_cost_entries', to='ration_components.rationtable')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='feed_cost_entry_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedcostentry',
+            constraint=models.UniqueConstraint(fields=('animal', 'date'), name='unique_feed_cost_per_day'),
+        ),
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animal_ration', '0003_feedcostentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCostBackfill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='feedcostentry',
+            name='source',
+            field=models.CharField(choices=[('daily', 'Daily accrual'), ('opening', 'Opening balance'), ('backfill', 'Historical backfill')], default='daily', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='FeedCostBackfillShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_animal_id', models.BigIntegerField()),
+                ('last_animal_id', models.BigIntegerField()),
+                ('checkpoint_animal_id', models.BigIntegerField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('backfill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='animal_ration.feedcostbackfill')),
+            ],
+            options={
+                'ordering': ['first_animal_id'],
+            },
+        ),
+    ]
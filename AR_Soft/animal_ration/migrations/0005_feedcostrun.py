@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animal_ration', '0004_feedcostbackfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCostRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('claim', models.UUIDField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('animals', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'date'], name='feed_cost_run_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Animal', '0007_alter_animal_company_and_more'),
+        ('animal_ration', '0005_feedcostrun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='animalrationlog',
+            name='animal',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ration_logs', to='Animal.animal'),
+        ),
+        migrations.AddIndex(
+            model_name='animalrationlog',
+            index=models.Index(fields=['animal', 'is_active', '-start_date'], name='ration_log_animal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animalrationlog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['animal'], name='ration_log_active_idx'),
+        ),
+    ]
@@ -1,11 +1,15 @@
+from datetime import datetime
+
 from django.db import models
-from django.utils.timezone import now
+from django.db.models import Max, Q, Sum
+from django.utils.timezone import is_aware, localtime, now
 
 class AnimalRationLog(models.Model):
     animal = models.ForeignKey(
         'Animal.Animal',  # Use string reference to the Animal model
         on_delete=models.CASCADE,
-        related_name="ration_logs"
+        related_name="ration_logs",
+        db_index=False,  # Indexed by ration_log_animal_idx, which leads with the animal
     )
     ration_table = models.ForeignKey(
         'ration_components.RationTable',  # Use string reference to the RationTable model
@@ -16,6 +20,15 @@ class AnimalRationLog(models.Model):
     end_date = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)  # Whether this ration is currently active for the animal
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-start_date', 'id'], name='ration_log_start_id_idx'),  # Keyset pagination
+            # Latest active/inactive log of an animal (save, delete, slaughter)
+            models.Index(fields=['animal', 'is_active', '-start_date'], name='ration_log_animal_idx'),
+            # The herd's active logs, one row per animal (nightly feed cost run)
+            models.Index(fields=['animal'], condition=Q(is_active=True), name='ration_log_active_idx'),
+        ]
+
     def __str__(self):
         return f"{self.animal.eartag} on {self.ration_table.name}"
 
@@ -61,4 +74,155 @@ class AnimalRationLog(models.Model):
                 previous_log.end_date = None
                 previous_log.save()
 
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        super().delete(*args, **kwargs)
+
+
+def as_date(value):
+    """Dates pass through; datetimes are reduced to their local calendar date."""
+    if isinstance(value, datetime):
+        return (localtime(value) if is_aware(value) else value).date()
+    return value
+
+
+class FeedCostEntryQuerySet(models.QuerySet):
+    def between(self, start=None, end=None):
+        """Entries dated within ``start``..``end`` (inclusive, either end open)."""
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(date__gte=as_date(start))
+        if end is not None:
+            queryset = queryset.filter(date__lte=as_date(end))
+        return queryset
+
+    def total(self):
+        return self.aggregate(total=Sum('cost'))['total'] or 0
+
+    def opening_dates(self):
+        """
+        ``{animal_id: date}`` of the opening balances among these entries. An
+        opening balance holds all of an animal's feed cost up to its date.
+        """
+        return dict(self.filter(source=FeedCostEntry.OPENING)
+                    .values('animal_id').annotate(last=Max('date')).values_list('animal_id', 'last'))
+
+    def totals_by(self, *fields):
+        return self.values(*fields).annotate(cost=Sum('cost'), dry_matter_intake=Sum('dry_matter_intake')).order_by(*fields)
+
+
+class FeedCostEntry(models.Model):
+    """
+    One day of feed cost for one animal.
+
+    Written idempotently by the daily feed cost run (one row per animal and
+    date), so re-running a day overwrites it instead of adding to it.
+    ``Animal.feed_cost`` is the sum of an animal's entries.
+
+    An ``OPENING`` entry carries the feed cost accrued before the ledger
+    existed. It covers every day up to its date, so accruals are never
+    recorded on or before it and it is never overwritten or dropped.
+    """
+    DAILY = 'daily'
+    OPENING = 'opening'
+    BACKFILL = 'backfill'
+    SOURCE_CHOICES = [
+        (DAILY, 'Daily accrual'),
+        (OPENING, 'Opening balance'),
+        (BACKFILL, 'Historical backfill'),
+    ]
+
+    animal = models.ForeignKey('Animal.Animal', on_delete=models.CASCADE, related_name='feed_cost_entries')
+    date = models.DateField()
+    ration_table = models.ForeignKey(
+        'ration_components.RationTable',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='feed_cost_entries'
+    )
+    dry_matter_intake = models.DecimalField(max_digits=14, decimal_places=5, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=5, default=0)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=DAILY)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FeedCostEntryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['animal', 'date'], name='unique_feed_cost_per_day')
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='feed_cost_entry_date_idx'),  # Herd-wide range sums
+        ]
+
+    def __str__(self):
+        return f"{self.animal_id} on {self.date}: {self.cost}"
+
+
+class FeedCostBackfill(models.Model):
+    """
+    A historical feed cost recomputation over ``start_date``..``end_date``.
+
+    The herd is split into animal-id shards when the run is created; each
+    shard checkpoints the last animal it has written, so an interrupted run
+    picks up where it stopped when it is started again for the same range.
+    """
+    start_date = models.DateField()
+    end_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Feed cost backfill {self.start_date} - {self.end_date}"
+
+
+class FeedCostBackfillShard(models.Model):
+    backfill = models.ForeignKey(FeedCostBackfill, on_delete=models.CASCADE, related_name='shards')
+    first_animal_id = models.BigIntegerField()
+    last_animal_id = models.BigIntegerField()
+    checkpoint_animal_id = models.BigIntegerField(null=True, blank=True)  # Last animal fully written
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['first_animal_id']
+
+    def __str__(self):
+        return f"Animals {self.first_animal_id}-{self.last_animal_id} of {self.backfill}"
+
+
+class FeedCostRun(models.Model):
+    """
+    Ledger of the nightly feed cost run, one row per accrual date.
+
+    A run claims its dates by moving their rows to ``RUNNING`` under a row
+    lock, with a fresh ``claim`` token, and completes them when every chunk
+    has been written. A date that is completed, or claimed by a run that is
+    still in progress, is not claimed again, so a duplicate beat tick or a
+    retried task applies each day exactly once.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    date = models.DateField(unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    claim = models.UUIDField(null=True, blank=True)  # Token of the run that holds the date
+    attempts = models.PositiveIntegerField(default=0)
+    animals = models.PositiveIntegerField(default=0)  # Animals that accrued on the date
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date'], name='feed_cost_run_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Feed cost run {self.date} ({self.status})"
@@ -0,0 +1,100 @@
+"""
+Exactly-once scheduling of the nightly feed cost run.
+
+Every accrual date has a ``FeedCostRun`` row. A run claims its dates with a
+single conditional UPDATE (pending or failed dates, and dates whose run has
+been running for longer than ``STALE_AFTER``), whose row locks make
+concurrent claims of the same date exclusive: a duplicate beat tick or a
+retried coordinator finds the date already taken and does nothing. The
+claim token is checked again on completion, so a run that was given up on
+and reclaimed cannot complete the dates of its successor.
+
+A run also claims the days missed since the last completed run (at most
+``MAX_CATCH_UP_DAYS``). Only its own date is recorded from the current
+rations, prices and weights (``feed_cost.run_feed_cost_days``); the missed
+days are priced from their history, as a backfill would
+(``backfill.catch_up_feed_costs``).
+"""
+import logging
+import uuid
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now, timedelta
+
+from .backfill import catch_up_feed_costs, days_between
+from .feed_cost import WHOLE_HERD, run_feed_cost_days
+from .models import FeedCostRun
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(hours=6)
+MAX_CATCH_UP_DAYS = 31
+
+
+def missed_dates(date, max_days=MAX_CATCH_UP_DAYS):
+    """
+    ``date`` and the days since the last completed run before it, oldest
+    first. Without any completed run before it only ``date`` itself.
+    """
+    last = (FeedCostRun.objects
+            .filter(status=FeedCostRun.COMPLETED, date__lt=date)
+            .order_by('-date')
+            .values_list('date', flat=True)
+            .first())
+    if last is None:
+        return [date]
+    return days_between(max(last + timedelta(days=1), date - timedelta(days=max_days - 1)), date)
+
+
+def claim_feed_cost_run(date, rerun=False):
+    """
+    Claim ``date`` and its missed days for one run. Returns ``(claim, dates)``
+    with the dates this run now holds, oldest first; none when every date is
+    completed or held by another run in progress. ``rerun`` claims ``date``
+    alone, even if it is completed.
+    """
+    dates = [date] if rerun else missed_dates(date)
+    claim = uuid.uuid4()
+    claimable = (Q(status__in=[FeedCostRun.PENDING, FeedCostRun.FAILED])
+                 | Q(status=FeedCostRun.RUNNING, started_at__lt=now() - STALE_AFTER))
+    if rerun:
+        claimable |= Q(status=FeedCostRun.COMPLETED)
+
+    with transaction.atomic():
+        FeedCostRun.objects.bulk_create([FeedCostRun(date=day) for day in dates], ignore_conflicts=True)
+        FeedCostRun.objects.filter(claimable, date__in=dates).update(
+            status=FeedCostRun.RUNNING, claim=claim, attempts=F('attempts') + 1,
+            started_at=now(), finished_at=None,
+        )
+    claimed = list(FeedCostRun.objects.filter(claim=claim).order_by('date').values_list('date', flat=True))
+    if not claimed:
+        logger.info("Feed costs of %s are already recorded or being recorded.", date)
+    return claim, claimed
+
+
+def record_run_days(claim, date, dates, animal_range=WHOLE_HERD):
+    """
+    Record the ``dates`` claimed by a run of ``date`` for the animals in
+    ``animal_range``: the missed days from history, then ``date`` itself if
+    the run holds it. Returns the most animals that accrued on any of them.
+    """
+    missed = [day for day in dates if day != date]
+    animals = catch_up_feed_costs(claim, missed, animal_range=animal_range) if missed else 0
+    if date in dates:
+        animals = max(animals, run_feed_cost_days([date], animal_range=animal_range))
+    return animals
+
+
+def complete_feed_cost_run(claim, animals):
+    """Mark the dates held by ``claim`` completed; a no-op once they have been reclaimed."""
+    return FeedCostRun.objects.filter(claim=claim, status=FeedCostRun.RUNNING).update(
+        status=FeedCostRun.COMPLETED, animals=animals, finished_at=now(),
+    )
+
+
+def fail_feed_cost_run(claim):
+    """Release the dates held by ``claim`` so the next run claims them again."""
+    return FeedCostRun.objects.filter(claim=claim, status=FeedCostRun.RUNNING).update(
+        status=FeedCostRun.FAILED, finished_at=now(),
+    )
@@ -1,10 +1,11 @@
 # animal_ration/serializers.py
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import AnimalRationLog
 from Animal.models import Animal
 from ration_components.models import RationTable
 
-class AnimalRationLogSerializer(serializers.ModelSerializer):
+class AnimalRationLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     animal_eartag = serializers.CharField(source="animal.eartag", read_only=True)
     ration_table_name = serializers.CharField(source="ration_table.name", read_only=True)
 
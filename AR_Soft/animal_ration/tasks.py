@@ -1,72 +1,106 @@
-from celery import shared_task
-from animal_ration.models import AnimalRationLog
-from Animal.models import Animal, AnimalGroup
-from ration_components.models import RationTableComponent
-from django.db.models import Sum
+import datetime
+
+from celery import chord, shared_task
 import logging
-from decimal import Decimal, ROUND_HALF_UP
-from Weight.models import Weight
+from django.db import DatabaseError
+from django.utils.timezone import localdate
+from animal_ration.backfill import run_backfill
+from animal_ration.feed_cost import FEED_COST_CHUNK_SIZE, feed_cost_chunks
+from animal_ration.runs import claim_feed_cost_run, complete_feed_cost_run, fail_feed_cost_run, record_run_days
 
 logger = logging.getLogger(__name__)
 
-from decimal import Decimal
+FEED_COST_CHUNK_RETRIES = 3
+
+
+@shared_task
+def update_feed_costs(date=None, chunk_size=FEED_COST_CHUNK_SIZE, rerun=False):
+    """
+    Record one day (today by default, or an ISO ``date``) of feed cost for
+    every animal on an active ration.
+
+    The date, and any day missed since the last completed run, is claimed in
+    the ``FeedCostRun`` ledger first (``animal_ration.runs``), so a
+    duplicate tick or a retry applies each day exactly once; ``rerun``
+    recomputes a completed date. The date is recorded from the current
+    rations and the missed days from their history (``record_run_days``):
+    the animals on an active ration are split into animal-id chunks
+    of ``chunk_size`` and dispatched as a chord of ``update_feed_cost_chunk``
+    tasks, each computing its slice set-based (``animal_ration.feed_cost``)
+    in its own transaction, with ``finish_feed_cost_run`` completing the
+    run. A herd that fits in one chunk is computed right here.
+    """
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    date = date or localdate()
+
+    claim, dates = claim_feed_cost_run(date, rerun=rerun)
+    if not dates:
+        return f"Feed costs for {date} are already recorded or being recorded."
+    iso_dates = [day.isoformat() for day in dates]
+
+    chunks = feed_cost_chunks(chunk_size)
+    if len(chunks) == 1:
+        try:
+            updated = record_run_days(claim, date, dates)
+        except Exception:
+            fail_feed_cost_run(claim)
+            raise
+        complete_feed_cost_run(claim, updated)
+        return f"Updated feed costs for {updated} animals on {', '.join(iso_dates)}."
+
+    chord(update_feed_cost_chunk.s(iso_dates, first, last, date.isoformat(), str(claim)) for first, last in chunks)(
+        finish_feed_cost_run.s(str(claim), iso_dates).on_error(release_feed_cost_run.si(str(claim)))
+    )
+    return f"Dispatched {len(chunks)} feed cost chunks for {', '.join(iso_dates)}."
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=FEED_COST_CHUNK_RETRIES)
+def update_feed_cost_chunk(dates, first_animal_id, last_animal_id, run_date, claim):
+    """
+    Record the feed cost of the ISO ``dates`` held by ``claim``, the run of
+    the ISO ``run_date``, for the animals with ids between
+    ``first_animal_id`` and ``last_animal_id`` (inclusive, None is open).
+    Idempotent, so a chunk that hits a database error is simply retried.
+    """
+    updated = record_run_days(claim, datetime.date.fromisoformat(run_date),
+                              [datetime.date.fromisoformat(day) for day in dates],
+                              animal_range=(first_animal_id, last_animal_id))
+    return {"first_animal_id": first_animal_id, "last_animal_id": last_animal_id, "updated": updated}
+
+
+@shared_task
+def finish_feed_cost_run(results, claim, dates):
+    """Chord callback of ``update_feed_costs``: totals the chunks and completes the run."""
+    updated = sum(result["updated"] for result in results)
+    complete_feed_cost_run(claim, updated)
+    logger.info("Feed cost run of %s finished: %d animals in %d chunks.", ", ".join(dates), updated, len(results))
+    return f"Updated feed costs for {updated} animals in {len(results)} chunks."
+
+
+@shared_task
+def release_feed_cost_run(claim):
+    """Chord error callback: a chunk gave up, so the next run claims the dates again."""
+    fail_feed_cost_run(claim)
+
 
 @shared_task
-def update_feed_costs():
-    logs = AnimalRationLog.objects.filter(is_active=True).select_related('animal', 'ration_table')
-    print(f"Processing {logs.count()} active ration logs.")
-    
-    for log in logs:
-        animal = log.animal
-
-        # Fetch the first active AnimalGroup for the animal
-        animal_group = AnimalGroup.objects.filter(animal=animal).select_related('group').first()
-        if not animal_group:
-            print(f"Animal {animal.eartag} is not assigned to any group. Skipping.")
-            continue
-
-        group = animal_group.group  # Access the associated Group
-        if not group.dry_matter:
-            print(f"Group {group.name} for Animal {animal.eartag} has no dry matter value. Skipping.")
-            continue
-
-        # Get the most recent weight of the animal
-        weight_record = Weight.objects.filter(animal=animal).order_by('-recorded_at').first()
-        if not weight_record:
-            print(f"No weight record found for Animal {animal.eartag}. Skipping.")
-            continue
-
-        current_weight = Decimal(weight_record.weight).quantize(Decimal('0.00000'), rounding=ROUND_HALF_UP)
-        print(f"Animal {animal.eartag} Current Weight: {current_weight} kg, Type: {type(current_weight)}")
-
-        # Convert `dry_matter` to Decimal to match other calculations
-        dm = Decimal(group.dry_matter).quantize(Decimal('0.00000'), rounding=ROUND_HALF_UP) * current_weight
-        print(f"Group DM: {dm}, Type: {type(dm)}")
-
-        # Get the ration table and calculate daily cost
-        ration_table = log.ration_table
-        daily_cost = Decimal(ration_table.compute_cost())
-        print(f"Daily Cost: {daily_cost}, Type: {type(daily_cost)}")
-
-        # Use the compute_total_dry_matter method from the RationTable model
-        table_dm = Decimal(ration_table.compute_total_dry_matter())
-        print(f"Table DM (with quantity): {table_dm}, Type: {type(table_dm)}")
-
-        if not table_dm or table_dm == 0:
-            print(f"Ration table {ration_table.name} has no valid dry matter value. Skipping animal {animal.eartag}.")
-            continue
-
-        # Calculate the feed cost for the animal
-        animal_feed_cost = daily_cost * (dm / table_dm)
-        print(f"Animal Feed Cost: {animal_feed_cost}")
-
-        # Update and save the animal's feed cost
-        animal.feed_cost += animal_feed_cost
-        animal.save()
-
-        print(f"Updated feed cost for {animal.eartag}: {animal.feed_cost}")
-
-    return f"Updated feed costs for {logs.count()} animals."
+def backfill_feed_costs(start_date, end_date, shards=None):
+    """
+    Recompute the feed cost ledger between two ISO dates from the ration log
+    intervals and the component price history.
+
+    Runs the shards one after the other: prefork Celery workers are daemonic
+    and cannot start a process pool of their own. Resumes an unfinished run
+    of the same range.
+    """
+    backfill, written = run_backfill(
+        datetime.date.fromisoformat(start_date),
+        datetime.date.fromisoformat(end_date),
+        shards=shards,
+    )
+    return f"{backfill}: wrote {written} feed cost entries."
+
 
 @shared_task
 def test_task():
@@ -1,3 +1,369 @@
+import io
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, now, timedelta
+
+from Animal.models import Animal, Group, AnimalGroup
+from Farmer.models import Company
+from Weight.models import Weight
+from ration_components.models import RationComponent, RationTable, RationTableComponent
+from ration_logs.models import ComponentChangeLog, RationTableComponentLog
+from animal_ration.backfill import run_backfill, start_backfill
+from animal_ration.models import AnimalRationLog, FeedCostBackfill, FeedCostEntry, FeedCostRun
+from rest_framework.test import APITestCase
+from animal_ration.feed_cost import feed_cost_chunks
+from animal_ration.tasks import update_feed_costs
+from AR_Soft.celery import app as celery_app
+
+
+class FeedCostFixtureMixin:
+    def setUp(self):
+        self.company = Company.objects.create(name="FarmCo")
+        self.group = Group.objects.create(name="Fattening", dry_matter=0.025)
+
+        self.ration_table = RationTable.objects.create(name="kis tablosu")
+        arpa = RationComponent.objects.create(
+            name="arpa", price=35.00, dry_matter=10.10, calori=213.00, nisasta=31.00
+        )
+        atk = RationComponent.objects.create(
+            name="ATK", price=20.00, dry_matter=12.00, calori=180.00, nisasta=15.00
+        )
+        RationTableComponent.objects.create(ration_table=self.ration_table, component=arpa, quantity=2.0)
+        RationTableComponent.objects.create(ration_table=self.ration_table, component=atk, quantity=2.15)
+
+    def create_herd(self, size, start=0):
+        animals = []
+        for i in range(start, start + size):
+            animal = Animal.objects.create(
+                eartag=f"TR{i:05d}", company=self.company, race="Holstein", gender=True, room="Barn 1"
+            )
+            AnimalGroup.objects.create(animal=animal, group=self.group)
+            Weight.objects.create(animal=animal, weight=350.0, recorded_at=now() - timedelta(days=10))
+            Weight.objects.create(animal=animal, weight=400.0, recorded_at=now() - timedelta(days=1))
+            AnimalRationLog.objects.create(animal=animal, ration_table=self.ration_table, is_active=True)
+            animals.append(animal)
+        return animals
+
+
+class FeedCostEngineTestCase(FeedCostFixtureMixin, TestCase):
+    def test_feed_cost_matches_ration_formula(self):
+        """
+        Cost = table cost * (group DM * latest weight) / table DM.
+        """
+        animal = self.create_herd(1)[0]
+
+        update_feed_costs()
+
+        # table cost 113.00, table DM 46.00, animal DM 0.025 * 400 = 10.00
+        expected = (Decimal("113.00") * Decimal("10.00") / Decimal("46.00")).quantize(Decimal("0.01"))
+        animal.refresh_from_db()
+        self.assertEqual(animal.feed_cost, expected)
+
+    def test_animals_without_group_or_weight_are_skipped(self):
+        grouped, ungrouped, unweighed = self.create_herd(3)
+        AnimalGroup.objects.filter(animal=ungrouped).delete()
+        Weight.objects.filter(animal=unweighed).delete()
+
+        update_feed_costs()
+
+        for animal in (ungrouped, unweighed):
+            animal.refresh_from_db()
+            self.assertEqual(animal.feed_cost, Decimal("0.00"))
+        grouped.refresh_from_db()
+        self.assertGreater(grouped.feed_cost, 0)
+
+    def test_query_count_is_independent_of_herd_size(self):
+        """
+        Benchmark: the run issues the same number of queries for 3 or 30 head.
+        """
+        self.create_herd(3)
+        with CaptureQueriesContext(connection) as small_herd:
+            update_feed_costs(rerun=True)
+
+        self.create_herd(27, start=3)
+        with CaptureQueriesContext(connection) as large_herd:
+            update_feed_costs(rerun=True)
+
+        self.assertEqual(len(small_herd), len(large_herd))
+        self.assertEqual(Animal.objects.filter(feed_cost__gt=0).count(), 30)
+
+
+class FeedCostLedgerTestCase(FeedCostFixtureMixin, APITestCase):
+    # table cost 113.00, table DM 46.00, animal DM 0.025 * 400 = 10.00
+    DAILY_COST = (Decimal("113.00") * Decimal("10.00") / Decimal("46.00")).quantize(Decimal("0.00001"))
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.create_herd(1)[0]
+        self.today = localdate()
+
+    def test_rerunning_a_day_does_not_double_count(self):
+        update_feed_costs()
+        update_feed_costs()
+
+        self.animal.refresh_from_db()
+        self.assertEqual(FeedCostEntry.objects.count(), 1)
+        self.assertEqual(self.animal.feed_cost, self.DAILY_COST.quantize(Decimal("0.01")))
+
+    def test_missed_day_can_be_recorded_later(self):
+        update_feed_costs()
+        update_feed_costs((self.today - timedelta(days=1)).isoformat())
+
+        self.animal.refresh_from_db()
+        self.assertEqual(self.animal.feed_cost, (2 * self.DAILY_COST).quantize(Decimal("0.01")))
+        entry = FeedCostEntry.objects.get(date=self.today)
+        self.assertEqual(entry.ration_table, self.ration_table)
+        self.assertEqual(entry.dry_matter_intake, Decimal("10.00000"))
+
+    def test_rerun_drops_animals_that_no_longer_accrue(self):
+        update_feed_costs()
+        AnimalGroup.objects.filter(animal=self.animal).delete()
+        update_feed_costs(rerun=True)
+
+        self.animal.refresh_from_db()
+        self.assertFalse(FeedCostEntry.objects.exists())
+        self.assertEqual(self.animal.feed_cost, Decimal("0.00"))
+
+    def test_opening_balance_is_never_overwritten_or_dropped(self):
+        yesterday = self.today - timedelta(days=1)
+        FeedCostEntry.objects.create(animal=self.animal, date=yesterday, cost=Decimal("500"),
+                                     source=FeedCostEntry.OPENING)
+
+        update_feed_costs(yesterday.isoformat())
+        AnimalGroup.objects.filter(animal=self.animal).delete()
+        update_feed_costs(yesterday.isoformat(), rerun=True)
+
+        entry = FeedCostEntry.objects.get()
+        self.assertEqual((entry.date, entry.source, entry.cost), (yesterday, FeedCostEntry.OPENING, Decimal("500")))
+
+    def test_range_sum(self):
+        for days_ago in range(5):
+            update_feed_costs((self.today - timedelta(days=days_ago)).isoformat())
+
+        start, end = self.today - timedelta(days=3), self.today - timedelta(days=1)
+        self.assertEqual(self.animal.calculate_feed_cost(start, end), 3 * self.DAILY_COST)
+        self.assertEqual(self.animal.calculate_feed_cost(now() - timedelta(days=1), now()), 2 * self.DAILY_COST)
+
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        response = self.client.get("/api/feed-costs/", {"start": start.isoformat(), "end": end.isoformat(), "by": "date"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 3 * self.DAILY_COST)
+        self.assertEqual([row["date"] for row in response.data["results"]],
+                         [start, start + timedelta(days=1), end])
+
+        for params in ({"start": "yesterday"}, {"end": "2026-02-30"}, {"animal": "abc"}, {"group": "1;"}):
+            response = self.client.get("/api/feed-costs/", params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_calculate_feed_cost_command(self):
+        update_feed_costs()
+        for options in ({}, {"eartag": self.animal.eartag}):
+            out = io.StringIO()
+            call_command("calculate_feed_cost", stdout=out, **options)
+            self.assertIn(str(self.DAILY_COST), out.getvalue())
+
+
+class FeedCostFanOutTestCase(FeedCostFixtureMixin, TestCase):
+    """The nightly run fans animal-id chunks out as a chord of Celery tasks."""
+
+    def setUp(self):
+        super().setUp()
+        previous = celery_app.conf.task_always_eager, celery_app.conf.task_eager_propagates
+        celery_app.conf.task_always_eager = celery_app.conf.task_eager_propagates = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', previous[0])
+        self.addCleanup(setattr, celery_app.conf, 'task_eager_propagates', previous[1])
+        self.animals = self.create_herd(5)
+
+    def test_chunks_cover_every_animal_id(self):
+        ids = [animal.pk for animal in self.animals]
+        self.assertEqual(feed_cost_chunks(2), [(None, ids[2] - 1), (ids[2], ids[4] - 1), (ids[4], None)])
+        self.assertEqual(feed_cost_chunks(5), [(None, None)])
+
+    def test_chunked_run_matches_a_single_run(self):
+        update_feed_costs()
+        expected = list(FeedCostEntry.objects.order_by('animal_id').values_list('animal_id', 'cost'))
+
+        FeedCostEntry.objects.all().delete()
+        self.assertEqual(update_feed_costs(chunk_size=2, rerun=True), f"Dispatched 3 feed cost chunks for {localdate()}.")
+        self.assertEqual(list(FeedCostEntry.objects.order_by('animal_id').values_list('animal_id', 'cost')), expected)
+        self.assertEqual(FeedCostRun.objects.get(date=localdate()).status, FeedCostRun.COMPLETED)
+
+        # A rerun still drops an animal that stopped accruing, whichever chunk it is in
+        AnimalGroup.objects.filter(animal=self.animals[3]).delete()
+        update_feed_costs(chunk_size=2, rerun=True)
+        self.assertFalse(FeedCostEntry.objects.filter(animal=self.animals[3]).exists())
+        self.assertEqual(FeedCostEntry.objects.count(), 4)
+
+
+class FeedCostRunLedgerTestCase(FeedCostFixtureMixin, TestCase):
+    """Each accrual date is applied exactly once, and missed days are caught up."""
+
+    def setUp(self):
+        super().setUp()
+        self.animal = self.create_herd(1)[0]
+        self.today = localdate()
+
+    def test_duplicate_tick_is_a_no_op(self):
+        update_feed_costs()
+        with CaptureQueriesContext(connection) as duplicate:
+            message = update_feed_costs()
+        self.assertEqual(message, f"Feed costs for {self.today} are already recorded or being recorded.")
+        self.assertFalse(any("feed_cost_entry" in query["sql"].lower() for query in duplicate))
+        run = FeedCostRun.objects.get(date=self.today)
+        self.assertEqual((run.status, run.attempts, run.animals), (FeedCostRun.COMPLETED, 1, 1))
+
+    def test_a_date_held_by_a_running_run_is_skipped_until_stale(self):
+        FeedCostRun.objects.create(date=self.today, status=FeedCostRun.RUNNING, started_at=now())
+        update_feed_costs()
+        self.assertFalse(FeedCostEntry.objects.exists())
+
+        FeedCostRun.objects.update(started_at=now() - timedelta(days=1))
+        update_feed_costs()
+        self.assertEqual(FeedCostEntry.objects.count(), 1)
+        self.assertEqual(FeedCostRun.objects.get().attempts, 1)
+
+    def cost(self, weight):
+        # table cost 113.00, table DM 46.00, animal DM 0.025 * weight
+        return (Decimal("113.00") * Decimal("0.025") * Decimal(weight) / Decimal("46.00")).quantize(Decimal("0.00001"))
+
+    def test_missed_days_are_caught_up_from_history(self):
+        AnimalRationLog.objects.update(start_date=now() - timedelta(days=30))
+        Weight.objects.filter(weight=400.0).update(recorded_at=now() - timedelta(days=1))
+        FeedCostRun.objects.create(date=self.today - timedelta(days=3), status=FeedCostRun.COMPLETED)
+
+        self.assertEqual(update_feed_costs(), "Updated feed costs for 1 animals on {}.".format(
+            ", ".join(str(self.today - timedelta(days=days_ago)) for days_ago in (2, 1, 0))))
+        # Two days ago the animal still weighed 350 kg
+        costs = dict(FeedCostEntry.objects.values_list("date", "cost"))
+        self.assertEqual(costs, {
+            self.today - timedelta(days=2): self.cost(350),
+            self.today - timedelta(days=1): self.cost(400),
+            self.today: self.cost(400),
+        })
+        self.assertEqual(FeedCostRun.objects.filter(status=FeedCostRun.COMPLETED).count(), 4)
+        self.animal.refresh_from_db()
+        self.assertEqual(self.animal.feed_cost, sum(costs.values()).quantize(Decimal("0.01")))
+
+    def test_no_catch_up_before_a_ration_starts(self):
+        AnimalRationLog.objects.update(start_date=now() - timedelta(days=2))
+        FeedCostRun.objects.create(date=self.today - timedelta(days=4), status=FeedCostRun.COMPLETED)
+
+        update_feed_costs()
+
+        self.assertEqual(sorted(FeedCostEntry.objects.values_list("date", flat=True)),
+                         [self.today - timedelta(days=days_ago) for days_ago in (2, 1, 0)])
+        self.assertEqual(FeedCostRun.objects.filter(status=FeedCostRun.COMPLETED).count(), 5)
+
+    def test_failed_run_is_released_and_claimed_again(self):
+        with patch("animal_ration.runs.run_feed_cost_days", side_effect=RuntimeError("database gone")):
+            with self.assertRaises(RuntimeError):
+                update_feed_costs()
+        self.assertEqual(FeedCostRun.objects.get().status, FeedCostRun.FAILED)
+
+        update_feed_costs()
+        run = FeedCostRun.objects.get()
+        self.assertEqual((run.status, run.attempts), (FeedCostRun.COMPLETED, 2))
+
+
+class FeedCostBackfillTestCase(FeedCostFixtureMixin, TestCase):
+    def setUp(self):
+        # The price history is written when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.today = localdate()
+        self.first, self.second = self.create_herd(2)
+        past = now() - timedelta(days=30)
+        AnimalRationLog.objects.filter(ration_table=self.ration_table).update(start_date=past)
+        Weight.objects.filter(weight=350.0).update(recorded_at=past)
+        ComponentChangeLog.objects.update(changed_at=past)
+        RationTableComponentLog.objects.update(changed_at=past)
+
+        # arpa goes from 35.00 to 45.00 four days ago
+        arpa = RationComponent.objects.get(name="arpa")
+        arpa.price = Decimal("45.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            arpa.save()
+        ComponentChangeLog.objects.filter(component=arpa, new_value="45.00").update(
+            changed_at=now() - timedelta(days=4)
+        )
+
+    def expected_cost(self, table_cost):
+        # animal DM 0.025 * 350 = 8.75, table DM 46.00
+        return (Decimal(table_cost) * Decimal("8.75") / Decimal("46.00")).quantize(Decimal("0.00001"))
+
+    def test_replays_price_history(self):
+        start, end = self.today - timedelta(days=5), self.today - timedelta(days=3)
+        backfill, written = run_backfill(start, end)
+
+        self.assertEqual(written, 6)
+        self.assertIsNotNone(backfill.finished_at)
+        costs = dict(FeedCostEntry.objects.filter(animal=self.first).values_list("date", "cost"))
+        self.assertEqual(costs, {
+            start: self.expected_cost("113.00"),
+            start + timedelta(days=1): self.expected_cost("133.00"),
+            end: self.expected_cost("133.00"),
+        })
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.feed_cost, sum(costs.values()).quantize(Decimal("0.01")))
+
+    def test_prices_components_removed_since(self):
+        day = self.today - timedelta(days=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            RationTableComponent.objects.get(component__name="ATK").delete()
+            RationComponent.objects.get(name="arpa").delete()
+
+        run_backfill(day, day)
+
+        self.assertEqual(FeedCostEntry.objects.get(animal=self.first).cost, self.expected_cost("113.00"))
+
+    def test_rerun_replaces_range(self):
+        day = self.today - timedelta(days=5)
+        FeedCostEntry.objects.create(animal=self.first, date=day, cost=Decimal("999"))
+
+        run_backfill(day, day)
+        run_backfill(day, day)
+
+        self.assertEqual(FeedCostEntry.objects.filter(animal=self.first).get().cost, self.expected_cost("113.00"))
+
+    def test_opening_balance_and_the_days_it_covers_are_kept(self):
+        start, end = self.today - timedelta(days=5), self.today - timedelta(days=3)
+        opening = start + timedelta(days=1)
+        FeedCostEntry.objects.create(animal=self.first, date=opening, cost=Decimal("999"),
+                                     source=FeedCostEntry.OPENING)
+
+        run_backfill(start, end)
+
+        entries = FeedCostEntry.objects.filter(animal=self.first).order_by("date")
+        self.assertEqual([(entry.date, entry.source, entry.cost) for entry in entries], [
+            (opening, FeedCostEntry.OPENING, Decimal("999")),
+            (end, FeedCostEntry.BACKFILL, self.expected_cost("133.00")),
+        ])
+        self.assertEqual(FeedCostEntry.objects.filter(animal=self.second).count(), 3)
+
+    def test_resumes_from_checkpoints(self):
+        day = self.today - timedelta(days=5)
+        backfill = start_backfill(day, day, shards=2)
+        first_shard, second_shard = backfill.shards.all()
+        first_shard.completed_at = now()
+        first_shard.save()
+
+        resumed, written = run_backfill(day, day)
+
+        self.assertEqual(resumed, backfill)
+        self.assertEqual(written, 1)
+        self.assertEqual(list(FeedCostEntry.objects.values_list("animal", flat=True)), [self.second.pk])
+        self.assertEqual(FeedCostBackfill.objects.count(), 1)
+
+    def test_command_rejects_inverted_range_and_impossible_dates(self):
+        from django.core.management.base import CommandError
 
-# Create your tests here.
+        for start, end in (("2024-02-01", "2024-01-01"), ("2026-02-30", "2026-03-01"), ("2026-01-01", "2026-13-01")):
+            with self.assertRaises(CommandError):
+                call_command("backfill_feed_costs", start=start, end=end, stdout=io.StringIO())
@@ -1,7 +1,7 @@
 # animal_ration/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AnimalRationLogViewSet
+from .views import AnimalRationLogViewSet, FeedCostLedgerView
 
 # Create a router and register the AnimalRationLogViewSet
 router = DefaultRouter()
@@ -9,5 +9,6 @@ router.register(r'animal-ration-logs', AnimalRationLogViewSet, basename='animal-
 
 # Define the app-specific URL patterns
 urlpatterns = [
+    path('feed-costs/', FeedCostLedgerView.as_view(), name='feed-cost-ledger'),
     path('', include(router.urls)),
 ]
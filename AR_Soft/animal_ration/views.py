@@ -5,16 +5,21 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import AnimalRationLog
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+from django.utils.dateparse import parse_date
+from AR_Soft.optimizer import OptimizedQuerysetMixin
+from .models import AnimalRationLog, FeedCostEntry
 from .serializers import AnimalRationLogSerializer
 from rest_framework.permissions import IsAuthenticated
 
-class AnimalRationLogViewSet(viewsets.ModelViewSet):
+class AnimalRationLogViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing AnimalRationLog entries.
     """
     queryset = AnimalRationLog.objects.all()
     serializer_class = AnimalRationLogSerializer
+    cursor_ordering = ('-start_date', 'id')
    
     @action(detail=True, methods=['post'])
     def deactivate(self, request, pk=None):
@@ -49,6 +54,52 @@ class AnimalRationLogViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='active')
     def get_active_rations(self, request):
         queryset = self.get_queryset().filter(is_active=True)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+
+class FeedCostLedgerView(APIView):
+    """
+    Feed cost accrued over a date range, summed in SQL from the daily ledger.
+
+    ``start`` and ``end`` are inclusive ISO dates (either may be omitted),
+    ``animal`` and ``group`` narrow the herd and ``by=animal`` or ``by=date``
+    adds a per-animal or per-day breakdown.
+    """
+    BREAKDOWNS = {'animal': ('animal', 'animal__eartag'), 'date': ('date',)}
+    FILTERS = {
+        'animal': ('animal_id', "Must be an animal id."),
+        'group': ('animal__animal_groups__group_id', "Must be a group id."),
+    }
+
+    def get(self, request):
+        params = request.query_params
+        dates = {}
+        for name in ('start', 'end'):
+            value = params.get(name)
+            try:
+                dates[name] = parse_date(value) if value else None
+            except ValueError:  # Well formed but not a real date, e.g. 2026-02-30
+                dates[name] = None
+            if value and dates[name] is None:
+                raise ValidationError({name: "Must be a date in YYYY-MM-DD format."})
+
+        by = params.get('by')
+        if by and by not in self.BREAKDOWNS:
+            raise ValidationError({"by": "Must be 'animal' or 'date'."})
+
+        entries = FeedCostEntry.objects.between(dates['start'], dates['end'])
+        for name, (lookup, error) in self.FILTERS.items():
+            value = params.get(name)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({name: error})
+                entries = entries.filter(**{lookup: value})
+
+        data = {"start": dates['start'], "end": dates['end'], "total": entries.total()}
+        if by:
+            data["results"] = list(entries.totals_by(*self.BREAKDOWNS[by]))
+        return Response(data)
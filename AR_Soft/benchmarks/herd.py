@@ -0,0 +1,154 @@
+"""
+Synthetic herd generator for the benchmarks.
+
+Writes companies, groups, animals with their group memberships and active
+ration logs, weight readings, slaughters, ration components and tables and
+the three audit logs with ``bulk_create`` in batches, so millions of rows
+are written in a few minutes without holding them all in memory. Bulk
+inserts send no signals: the denormalized columns and summary tables the
+signals would maintain (ration table totals, latest weights, dashboard) are
+rebuilt once at the end.
+
+The data is random but seeded, so the same scale gives the same dataset.
+"""
+import random
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Max
+from django.utils.timezone import now, timedelta
+
+from animal_ration.models import AnimalRationLog
+from Animal.models import Animal, AnimalGroup, Group
+from dashboard.summary import rebuild_dashboard
+from Farmer.models import Company
+from ration_components.models import RationComponent, RationTable, RationTableAggregate, RationTableComponent
+from ration_logs.models import ComponentChangeLog, RationTableComponentLog, RationTableLog
+from Slaughter.models import Slaughter
+from Weight.latest import rebuild_latest_weights
+from Weight.models import Weight
+
+BATCH_SIZE = 5000
+RACES = ('Angus', 'Holstein', 'Simmental', 'Limousin', 'Charolais', 'Hereford')
+
+
+@dataclass
+class HerdScale:
+    companies: int = 10
+    groups: int = 50
+    animals: int = 10000
+    weights_per_animal: int = 20
+    slaughtered_fraction: float = 0.2
+    components: int = 40
+    ration_tables: int = 20
+    components_per_table: int = 6
+    logs_per_table: int = 50
+
+    def as_dict(self):
+        return asdict(self)
+
+
+SCALES = {
+    'tiny': HerdScale(companies=2, groups=3, animals=30, weights_per_animal=3, components=5,
+                      ration_tables=2, components_per_table=3, logs_per_table=2),
+    'small': HerdScale(companies=5, groups=20, animals=1000, weights_per_animal=10),
+    'medium': HerdScale(),
+    'large': HerdScale(companies=50, groups=500, animals=100000, weights_per_animal=20, logs_per_table=200),
+}
+
+
+def insert(model, objects, batch_size=BATCH_SIZE):
+    """``bulk_create`` an iterable in batches; returns the number of rows."""
+    objects = iter(objects)
+    count = 0
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        count += len(batch)
+    return count
+
+
+def generate_herd(scale, seed=0, batch_size=BATCH_SIZE):
+    """Write a synthetic dataset of ``scale`` (a ``HerdScale``); returns the row counts."""
+    rng = random.Random(seed)
+    today = now()
+    counts = {}
+
+    companies = Company.objects.bulk_create([Company(name=f"Company {i}") for i in range(scale.companies)])
+    groups = Group.objects.bulk_create([
+        Group(name=f"Group {i}", dry_matter=round(rng.uniform(8, 14), 2)) for i in range(scale.groups)
+    ])
+    counts.update(companies=len(companies), groups=len(groups))
+
+    last_pk = Animal.objects.aggregate(last=Max('pk'))['last'] or 0
+    counts['animals'] = insert(Animal, (
+        Animal(eartag=f"BM{last_pk + i:08d}", company=companies[i % len(companies)],
+               race=rng.choice(RACES), gender=rng.random() < 0.5, room=f"Room {i % 40}",
+               cost=round(rng.uniform(800, 1500), 2),
+               is_slaughtered=rng.random() < scale.slaughtered_fraction)
+        for i in range(scale.animals)
+    ), batch_size)
+    animals = list(Animal.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'is_slaughtered'))
+
+    counts['animal_groups'] = insert(AnimalGroup, (
+        AnimalGroup(animal_id=animal_id, group=groups[i % len(groups)]) for i, (animal_id, _) in enumerate(animals)
+    ), batch_size)
+
+    components = RationComponent.objects.bulk_create([
+        RationComponent(name=f"Component {i}", dry_matter=Decimal(rng.randint(20, 95)),
+                        calori=Decimal(rng.randint(1, 30)), nisasta=Decimal(rng.randint(1, 40)),
+                        price=Decimal(rng.randint(1, 200)) / 10)
+        for i in range(scale.components)
+    ])
+    tables = RationTable.objects.bulk_create([RationTable(name=f"Ration {i}") for i in range(scale.ration_tables)])
+    table_components = RationTableComponent.objects.bulk_create([
+        RationTableComponent(ration_table=table, component=component, quantity=Decimal(rng.randint(1, 20)))
+        for table in tables
+        for component in rng.sample(components, min(scale.components_per_table, len(components)))
+    ])
+    RationTableAggregate.refresh([table.pk for table in tables])
+    counts.update(components=len(components), ration_tables=len(tables), table_components=len(table_components))
+
+    started = today - timedelta(days=90)
+    counts['ration_logs'] = insert(AnimalRationLog, (
+        AnimalRationLog(animal_id=animal_id, ration_table=tables[i % len(tables)], is_active=not slaughtered)
+        for i, (animal_id, slaughtered) in enumerate(animals)
+    ), batch_size)
+    # start_date is auto_now_add, so it is backdated after the insert
+    AnimalRationLog.objects.filter(animal_id__gt=last_pk).update(start_date=started)
+
+    counts['weights'] = insert(Weight, (
+        Weight(animal_id=animal_id,
+               weight=round(250 + 1.2 * 14 * reading + rng.gauss(0, 5), 1),
+               recorded_at=today - timedelta(days=14 * (scale.weights_per_animal - reading), minutes=rng.randint(0, 600)))
+        for animal_id, _ in animals
+        for reading in range(scale.weights_per_animal)
+    ), batch_size)
+
+    counts['slaughters'] = insert(Slaughter, (
+        Slaughter(animal_id=animal_id, carcas_weight=round(rng.uniform(250, 400), 1),
+                  sale_price=round(rng.uniform(8, 14), 2), date=today - timedelta(days=rng.randint(0, 365)))
+        for animal_id, slaughtered in animals if slaughtered
+    ), batch_size)
+
+    counts['component_change_logs'] = insert(ComponentChangeLog, (
+        ComponentChangeLog(component=rng.choice(components), field_name='price',
+                           old_value=str(rng.randint(1, 200) / 10), new_value=str(rng.randint(1, 200) / 10),
+                           changed_at=today - timedelta(minutes=rng.randint(0, 525600)))
+        for _ in range(scale.logs_per_table * len(tables))
+    ), batch_size)
+    counts['ration_table_logs'] = insert(RationTableLog, (
+        RationTableLog(ration_table=rng.choice(tables), action='Updated',
+                       changed_at=today - timedelta(minutes=rng.randint(0, 525600)))
+        for _ in range(scale.logs_per_table * len(tables))
+    ), batch_size)
+    counts['ration_table_component_logs'] = insert(RationTableComponentLog, (
+        RationTableComponentLog(table_component=rng.choice(table_components), action='Updated',
+                                old_quantity=Decimal(rng.randint(1, 20)), new_quantity=Decimal(rng.randint(1, 20)),
+                                changed_at=today - timedelta(minutes=rng.randint(0, 525600)))
+        for _ in range(scale.logs_per_table * len(tables))
+    ), batch_size)
+
+    rebuild_latest_weights()
+    rebuild_dashboard()
+    return counts
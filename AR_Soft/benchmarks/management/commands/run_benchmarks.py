@@ -0,0 +1,111 @@
+import json
+import subprocess
+import time
+from dataclasses import replace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from benchmarks.herd import BATCH_SIZE, SCALES, generate_herd
+from benchmarks.suite import compare, hot_benchmarks, run_suite
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Generate a synthetic herd in a throwaway database, time the hot endpoints and tasks on it "
+            "and write p50/p95 latency, query counts and peak memory to a JSON report.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help="Dataset size preset (default: small).")
+        parser.add_argument('--animals', type=int, help="Override the number of animals of the preset.")
+        parser.add_argument('--weights-per-animal', type=int, help="Override the weight readings per animal.")
+        parser.add_argument('--companies', type=int, help="Override the number of companies.")
+        parser.add_argument('--groups', type=int, help="Override the number of groups.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the generated data.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per bulk insert.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark.")
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks.")
+        parser.add_argument('--output', default='benchmark.json', help="Path of the JSON report.")
+        parser.add_argument('--compare', metavar='REPORT', help="Earlier JSON report to compare against.")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Keep the benchmark database, and reuse it without generating data if it exists.")
+        parser.add_argument('--in-place', action='store_true',
+                            help="Use the configured database instead of a throwaway one. Only for a database "
+                                 "dedicated to benchmarking: data is added to it and feed costs are rerun.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as report:
+                previous = json.load(report)
+
+        overrides = {name: options[name] for name in ('animals', 'weights_per_animal', 'companies', 'groups')
+                     if options[name] is not None}
+        scale = replace(SCALES[options['scale']], **overrides)
+
+        # The test client's host, and no query logging, as in production
+        environment = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False)
+        environment.enable()
+        old_name = None
+        try:
+            if not options['in_place']:
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                   keepdb=options['keepdb'])
+            report = self.benchmark(scale, options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            environment.disable()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} benchmarks to {options['output']}."))
+
+        if previous:
+            self.stdout.write(f"Compared with {previous.get('commit') or options['compare']}:")
+            for name, p50, p95, queries in compare(previous, report):
+                self.stdout.write(f"  {name:<34} p50 {self.change(p50)}  p95 {self.change(p95)}  queries {queries:+d}")
+
+    def benchmark(self, scale, options):
+        from Animal.models import Animal
+
+        counts, generation_seconds = None, None
+        if not (options['keepdb'] and Animal.objects.exists()):
+            self.stdout.write(f"Generating {scale.animals} animals with {scale.weights_per_animal} weights each...")
+            started = time.perf_counter()
+            counts = generate_herd(scale, seed=options['seed'], batch_size=options['batch_size'])
+            generation_seconds = round(time.perf_counter() - started, 2)
+
+        def log(result):
+            self.stdout.write(f"  {result['name']:<34} p50 {result['p50_ms']:>10.2f} ms  "
+                              f"p95 {result['p95_ms']:>10.2f} ms  {result['queries']:>5} queries  "
+                              f"{result['peak_memory_kib']:>10.1f} KiB")
+
+        results = run_suite(hot_benchmarks(), repeat=options['repeat'], only=options['only'], log=log)
+        return {
+            'commit': current_commit(),
+            'created_at': now().isoformat(),
+            'database': connection.vendor,
+            'scale': scale.as_dict(),
+            'rows': counts,
+            'generation_seconds': generation_seconds,
+            'results': results,
+        }
+
+    @staticmethod
+    def change(ratio):
+        return '   n/a' if ratio is None else f"{ratio:+6.1%}"
@@ -0,0 +1,159 @@
+"""
+The benchmark cases and their runner.
+
+Each case is one call of a hot path: the nightly feed cost run, the group
+gain and growth views, the list endpoints (first page of 100, as the
+paginated clients fetch them), slaughter listing and the ration log
+endpoints. Requests go through the full middleware stack with Django's test
+client, so serialization, rendering and the instrumentation middleware are
+part of the timing.
+
+A case is run once to warm up, then ``repeat`` times for the latency
+percentiles and the query count (through the same ``execute_wrapper`` hook
+as ``AR_Soft.instrumentation``), then once more under ``tracemalloc`` for
+the peak Python memory, which would otherwise slow the timed runs down.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from animal_ration.tasks import update_feed_costs
+from Animal.models import Animal, Group
+from AR_Soft.instrumentation import RequestMetrics
+
+PAGE = {'page_size': 100}
+LIST_ENDPOINTS = (
+    ('animal_list', '/api/animals/'),
+    ('weight_list', '/api/weights/'),
+    ('group_list', '/api/groups/'),
+    ('animal_group_list', '/api/animal_groups/'),
+    ('ration_component_list', '/api/ration-components/'),
+    ('ration_table_list', '/api/ration-tables/'),
+    ('ration_table_component_list', '/api/ration-table-components/'),
+    ('slaughter_list', '/api/slaughters/'),
+    ('animal_ration_log_list', '/api/animal-ration-logs/'),
+    ('component_change_log_list', '/api/component-change-logs/'),
+    ('ration_table_log_list', '/api/ration-table-logs/'),
+    ('ration_table_component_log_list', '/api/ration-table-component-logs/'),
+)
+
+
+class BenchmarkError(Exception):
+    """A benchmarked request did not succeed, so its timing means nothing."""
+
+
+@dataclass
+class Benchmark:
+    name: str
+    run: Callable[[], object]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def request(client, path, params=None):
+    def run():
+        response = client.get(path, params or {})
+        if response.status_code != 200:
+            raise BenchmarkError(f"GET {path} answered {response.status_code}")
+        return response
+    return run
+
+
+def hot_benchmarks(client=None):
+    """The benchmark cases over the dataset in the database."""
+    if client is None:
+        client = APIClient()
+        client.force_authenticate(User.objects.get_or_create(username='benchmark')[0])
+    group_id = (Group.objects.annotate(animals=Count('animal_groups')).order_by('-animals', 'pk')
+                .values_list('pk', flat=True).first())
+    herd_size = Animal.objects.count()
+
+    benchmarks = [
+        # One chunk, run inline: the fan-out only adds broker round trips
+        Benchmark('update_feed_costs', lambda: update_feed_costs(chunk_size=herd_size + 1, rerun=True)),
+        Benchmark('group_daily_gain', request(client, f'/api/weights/group-daily-gain/{group_id}/')),
+        Benchmark('group_all_gain', request(client, f'/api/weights/group-all-gain/{group_id}/')),
+        Benchmark('group_growth', request(client, f'/api/weights/group-growth/{group_id}/')),
+        Benchmark('dashboard', request(client, '/api/dashboard/')),
+        Benchmark('slaughter_report', request(client, '/api/slaughters/report/')),
+    ]
+    benchmarks += [Benchmark(name, request(client, path, PAGE)) for name, path in LIST_ENDPOINTS]
+    return benchmarks
+
+
+def measure(benchmark, repeat=5, warmup=1):
+    """Latency percentiles (ms), queries and peak memory (KiB) of one case."""
+    for _ in range(warmup):
+        benchmark.run()
+
+    durations, queries, db_times = [], [], []
+    for _ in range(repeat):
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            started = time.perf_counter()
+            benchmark.run()
+            durations.append(time.perf_counter() - started)
+        queries.append(metrics.queries)
+        db_times.append(metrics.db_time)
+
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'name': benchmark.name,
+        'iterations': repeat,
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'db_ms': round(statistics.fmean(db_times) * 1000, 3),
+        'queries': max(queries),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_suite(benchmarks, repeat=5, only=None, log=None):
+    """Measure every case, or those named in ``only``; returns their results in order."""
+    results = []
+    for benchmark in benchmarks:
+        if only and benchmark.name not in only:
+            continue
+        results.append(measure(benchmark, repeat=repeat))
+        if log:
+            log(results[-1])
+    return results
+
+
+def compare(previous, current):
+    """
+    ``[(name, p50 change, p95 change, query change)]`` of the cases in both
+    reports; the changes are ratios (``0.1`` is 10% slower) and a query delta.
+    """
+    before = {result['name']: result for result in previous['results']}
+    changes = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        changes.append((
+            result['name'],
+            result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else None,
+            result['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else None,
+            result['queries'] - old['queries'],
+        ))
+    return changes
@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from Animal.models import Animal
+from animal_ration.models import AnimalRationLog
+from benchmarks.herd import SCALES, generate_herd
+from benchmarks.suite import Benchmark, compare, measure, percentile
+from dashboard.models import CompanySummary
+from Slaughter.models import Slaughter
+from Weight.models import Weight
+
+
+class HerdGeneratorTestCase(TestCase):
+    """The synthetic herd is consistent with what the signals would have maintained."""
+
+    def test_tiny_herd(self):
+        scale = SCALES['tiny']
+        counts = generate_herd(scale, seed=1)
+        self.assertEqual(counts['animals'], scale.animals)
+        self.assertEqual(Weight.objects.count(), scale.animals * scale.weights_per_animal)
+        self.assertEqual(Slaughter.objects.count(), Animal.objects.filter(is_slaughtered=True).count())
+        self.assertEqual(AnimalRationLog.objects.filter(is_active=True).count(),
+                         Animal.objects.filter(is_slaughtered=False).count())
+        self.assertFalse(Animal.objects.filter(latest_weight__isnull=True).exists())
+        self.assertEqual(sum(CompanySummary.objects.values_list('active_animals', flat=True)),
+                         Animal.objects.filter(is_slaughtered=False).count())
+
+        # A second herd adds to the first
+        self.assertEqual(generate_herd(scale, seed=2)['animals'], scale.animals)
+        self.assertEqual(Animal.objects.count(), 2 * scale.animals)
+
+
+class BenchmarkSuiteTestCase(TestCase):
+
+    def test_percentiles_use_the_nearest_rank(self):
+        samples = list(range(1, 21))
+        self.assertEqual((percentile(samples, 50), percentile(samples, 95), percentile([7], 95)), (10, 19, 7))
+
+    def test_measure_counts_queries_per_run(self):
+        result = measure(Benchmark('count', lambda: (Animal.objects.count(), Weight.objects.count())), repeat=3)
+        self.assertEqual((result['name'], result['iterations'], result['queries']), ('count', 3, 2))
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertGreater(result['peak_memory_kib'], 0)
+
+    def test_command_writes_a_comparable_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('run_benchmarks', scale='tiny', repeat=2, in_place=True, output=output,
+                         only=['update_feed_costs', 'animal_group_list', 'dashboard'], stdout=io.StringIO())
+            with open(output) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(report['rows']['animals'], SCALES['tiny'].animals)
+        self.assertEqual([result['name'] for result in report['results']],
+                         ['update_feed_costs', 'dashboard', 'animal_group_list'])
+        self.assertEqual(report['results'][1]['queries'], 3)
+        changes = compare(report, report)
+        self.assertEqual([(name, p50, queries) for name, p50, _, queries in changes],
+                         [(result['name'], 0.0, 0) for result in report['results']])
@@ -0,0 +1,6 @@
+from django.contrib import admin
+from .models import CompanySummary, GroupGainSummary, MonthlySlaughterSummary
+
+admin.site.register(CompanySummary)
+admin.site.register(GroupGainSummary)
+admin.site.register(MonthlySlaughterSummary)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from dashboard.summary import rebuild_dashboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard summary tables from the animal, weight and slaughter tables."
+
+    def handle(self, *args, **kwargs):
+        counts = rebuild_dashboard()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {counts['companies']} company, {counts['groups']} group "
+            f"and {counts['slaughter_months']} monthly slaughter summaries."
+        ))
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('Animal', '0006_animal_latest_weight'),
+        ('Farmer', '0002_alter_farmer_email_alter_farmer_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanySummary',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='Farmer.company')),
+                ('active_animals', models.PositiveIntegerField(default=0)),
+                ('slaughtered_animals', models.PositiveIntegerField(default=0)),
+                ('total_feed_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('average_feed_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupGainSummary',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='gain_summary', serialize=False, to='Animal.group')),
+                ('animals', models.PositiveIntegerField(default=0)),
+                ('average_daily_gain', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlySlaughterSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('slaughters', models.PositiveIntegerField(default=0)),
+                ('revenue', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_slaughters', to='Farmer.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='slaughter_summary_month_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyslaughtersummary',
+            constraint=models.UniqueConstraint(fields=('company', 'month'), name='unique_slaughter_month'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DateField, F, FloatField, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_summaries(apps, schema_editor):
+    Animal = apps.get_model('Animal', 'Animal')
+    AnimalGroup = apps.get_model('Animal', 'AnimalGroup')
+    Company = apps.get_model('Farmer', 'Company')
+    Group = apps.get_model('Animal', 'Group')
+    Slaughter = apps.get_model('Slaughter', 'Slaughter')
+    CompanySummary = apps.get_model('dashboard', 'CompanySummary')
+    GroupGainSummary = apps.get_model('dashboard', 'GroupGainSummary')
+    MonthlySlaughterSummary = apps.get_model('dashboard', 'MonthlySlaughterSummary')
+
+    totals = {
+        row['company_id']: row
+        for row in (Animal.objects
+                    .values('company_id')
+                    .annotate(active=Count('pk', filter=Q(is_slaughtered=False)),
+                              slaughtered=Count('pk', filter=Q(is_slaughtered=True)),
+                              feed_cost=Sum('feed_cost'))
+                    .order_by())
+    }
+    summaries = []
+    for company_id in Company.objects.values_list('pk', flat=True):
+        row = totals.get(company_id, {})
+        active, slaughtered = row.get('active', 0), row.get('slaughtered', 0)
+        feed_cost = row.get('feed_cost') or Decimal(0)
+        summaries.append(CompanySummary(
+            company_id=company_id, active_animals=active, slaughtered_animals=slaughtered,
+            total_feed_cost=feed_cost.quantize(Decimal('0.01')),
+            average_feed_cost=(feed_cost / (active + slaughtered)).quantize(Decimal('0.01')) if active + slaughtered else 0,
+        ))
+    CompanySummary.objects.bulk_create(summaries, batch_size=1000)
+
+    gains = defaultdict(list)
+    for group_id, previous, previous_at, latest, latest_at in (
+            AnimalGroup.objects
+            .filter(animal__previous_weight_at__isnull=False)
+            .values_list('group_id', 'animal__previous_weight', 'animal__previous_weight_at',
+                         'animal__latest_weight', 'animal__latest_weight_at')):
+        days = (latest_at - previous_at).days
+        if days:
+            gains[group_id].append((latest - previous) / days)
+    GroupGainSummary.objects.bulk_create([
+        GroupGainSummary(group_id=group_id, animals=len(gains[group_id]),
+                         average_daily_gain=sum(gains[group_id]) / len(gains[group_id]) if gains[group_id] else None)
+        for group_id in Group.objects.values_list('pk', flat=True)
+    ], batch_size=1000)
+
+    MonthlySlaughterSummary.objects.bulk_create([
+        MonthlySlaughterSummary(company_id=row['company_id'], month=row['month'],
+                                slaughters=row['slaughters'], revenue=row['revenue'] or 0.0)
+        for row in (Slaughter.objects
+                    .values(month=TruncMonth('date', output_field=DateField()), company_id=F('animal__company_id'))
+                    .annotate(slaughters=Count('pk'),
+                              revenue=Sum(F('sale_price') * F('carcas_weight'), output_field=FloatField()))
+                    .order_by())
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('Slaughter', '0009_slaughter_slaughter_date_id_idx'),
+        ('Weight', '0005_populate_animal_latest_weight'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
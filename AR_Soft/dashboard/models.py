@@ -0,0 +1,47 @@
+from django.db import models
+from Animal.models import Group
+from Farmer.models import Company
+
+
+class CompanySummary(models.Model):
+    """Head counts and feed cost of a company's animals, maintained by dashboard.signals."""
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    active_animals = models.PositiveIntegerField(default=0)
+    slaughtered_animals = models.PositiveIntegerField(default=0)
+    total_feed_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    average_feed_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.company_id}"
+
+
+class GroupGainSummary(models.Model):
+    """Average latest daily gain of the animals in a group with at least two readings."""
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, primary_key=True, related_name='gain_summary')
+    animals = models.PositiveIntegerField(default=0)
+    average_daily_gain = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Gain summary of {self.group_id}"
+
+
+class MonthlySlaughterSummary(models.Model):
+    """Slaughters and their revenue (sale price x carcass weight) per company and month."""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='monthly_slaughters')
+    month = models.DateField()  # First day of the month, local time
+    slaughters = models.PositiveIntegerField(default=0)
+    revenue = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'month'], name='unique_slaughter_month'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='slaughter_summary_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id} - {self.month:%Y-%m}"
@@ -0,0 +1,58 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from Animal.models import Animal, AnimalGroup
+from Slaughter.models import Slaughter
+from .summary import month_of, queue_summary_refresh
+
+
+@receiver(post_init, sender=Animal)
+def remember_animal_company(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred field is never fetched just to be remembered
+    instance._dashboard_company_id = instance.__dict__.get('company_id')
+
+
+@receiver(post_save, sender=Animal)
+def queue_animal_summary(sender, instance, **kwargs):
+    companies = {instance.company_id}
+    months = ()
+    if instance._dashboard_company_id not in (None, instance.company_id):
+        # Its slaughters now count towards the other company
+        companies.add(instance._dashboard_company_id)
+        months = {month_of(date) for date in instance.slaughters.values_list('date', flat=True)}
+    queue_summary_refresh(companies=companies, months=months)
+    instance._dashboard_company_id = instance.company_id
+
+
+@receiver(post_delete, sender=Animal)
+def queue_deleted_animal_summary(sender, instance, **kwargs):
+    # Its group memberships and slaughters are deleted with it and queue the rest
+    queue_summary_refresh(companies=[instance.company_id])
+
+
+# Weight readings queue their groups from Weight.signals, with the rest of their follow-ups
+
+
+@receiver(post_init, sender=AnimalGroup)
+def remember_membership_group(sender, instance, **kwargs):
+    instance._dashboard_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=AnimalGroup)
+@receiver(post_delete, sender=AnimalGroup)
+def queue_membership_summary(sender, instance, **kwargs):
+    queue_summary_refresh(groups={instance.group_id, instance._dashboard_group_id} - {None})
+    instance._dashboard_group_id = instance.group_id
+
+
+@receiver(post_init, sender=Slaughter)
+def remember_slaughter_month(sender, instance, **kwargs):
+    date = instance.__dict__.get('date')
+    instance._dashboard_month = month_of(date) if date else None
+
+
+@receiver(post_save, sender=Slaughter)
+@receiver(post_delete, sender=Slaughter)
+def queue_slaughter_summary(sender, instance, **kwargs):
+    queue_summary_refresh(months={month_of(instance.date), instance._dashboard_month} - {None})
+    instance._dashboard_month = month_of(instance.date)
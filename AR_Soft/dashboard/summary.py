@@ -0,0 +1,185 @@
+"""
+Maintenance of the dashboard summary tables.
+
+Writes to animals, weights, group memberships and slaughters queue the
+companies, groups and slaughter months they touch (``dashboard.signals``);
+when the transaction commits those summary rows, and only those, are
+recomputed with one aggregate query per table. Recomputing a touched row
+from the source tables (rather than shifting its counters) keeps it right
+for edits, moves and deletes, and the dashboard itself reads a handful of
+small rows whatever the size of the herd. ``rebuild_dashboard`` recomputes
+every row, for data written by paths that send no signals.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, FloatField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import make_aware, timedelta
+
+from Animal.models import Animal, AnimalGroup, Group
+from AR_Soft.transactions import OnCommitBatch
+from animal_ration.models import as_date
+from Farmer.models import Company
+from Slaughter.models import Slaughter
+from Slaughter.report import revenue
+from Weight.gains import gain_entry
+from .models import CompanySummary, GroupGainSummary, MonthlySlaughterSummary
+
+logger = logging.getLogger(__name__)
+
+TWO_PLACES = Decimal('0.01')
+
+
+def month_of(value):
+    """First day of the local calendar month of a date or datetime."""
+    return as_date(value).replace(day=1)
+
+
+def month_bounds(first, last):
+    """Aware datetimes from the start of month ``first`` to the end of month ``last``."""
+    after_last = (last + timedelta(days=32)).replace(day=1)
+    return make_aware(datetime.combine(first, time.min)), make_aware(datetime.combine(after_last, time.min))
+
+
+def refresh_company_summaries(company_ids):
+    """Recompute the head counts and feed cost totals of the given companies."""
+    company_ids = set(company_ids) - {None}
+    if not company_ids:
+        return 0
+
+    totals = {
+        row['company_id']: row
+        for row in (Animal.objects
+                    .filter(company_id__in=company_ids)
+                    .values('company_id')
+                    .annotate(active=Count('pk', filter=Q(is_slaughtered=False)),
+                              slaughtered=Count('pk', filter=Q(is_slaughtered=True)),
+                              feed_cost=Sum('feed_cost'))
+                    .order_by())
+    }
+
+    summaries = []
+    for company_id in Company.objects.filter(pk__in=company_ids).values_list('pk', flat=True):
+        row = totals.get(company_id, {})
+        active, slaughtered = row.get('active', 0), row.get('slaughtered', 0)
+        feed_cost = row.get('feed_cost') or Decimal(0)
+        heads = active + slaughtered
+        summaries.append(CompanySummary(
+            company_id=company_id, active_animals=active, slaughtered_animals=slaughtered,
+            total_feed_cost=feed_cost.quantize(TWO_PLACES),
+            average_feed_cost=(feed_cost / heads).quantize(TWO_PLACES) if heads else Decimal(0),
+        ))
+    CompanySummary.objects.bulk_create(
+        summaries, update_conflicts=True, unique_fields=['company'],
+        update_fields=['active_animals', 'slaughtered_animals', 'total_feed_cost', 'average_feed_cost', 'updated_at'],
+    )
+    return len(summaries)
+
+
+def refresh_group_summaries(group_ids):
+    """
+    Recompute the average daily gain of the given groups from each member's
+    latest and previous reading, as the latest gain endpoint reports it.
+    """
+    group_ids = set(group_ids) - {None}
+    if not group_ids:
+        return 0
+
+    gains = defaultdict(list)
+    for group_id, *readings in (AnimalGroup.objects
+                                .filter(group_id__in=group_ids, animal__previous_weight_at__isnull=False)
+                                .values_list('group_id', 'animal__previous_weight', 'animal__previous_weight_at',
+                                             'animal__latest_weight', 'animal__latest_weight_at')):
+        daily_gain = gain_entry(*readings)[2]
+        if daily_gain is not None:
+            gains[group_id].append(daily_gain)
+
+    summaries = [
+        GroupGainSummary(group_id=group_id, animals=len(gains[group_id]),
+                         average_daily_gain=sum(gains[group_id]) / len(gains[group_id]) if gains[group_id] else None)
+        for group_id in Group.objects.filter(pk__in=group_ids).values_list('pk', flat=True)
+    ]
+    GroupGainSummary.objects.bulk_create(
+        summaries, update_conflicts=True, unique_fields=['group'],
+        update_fields=['animals', 'average_daily_gain', 'updated_at'],
+    )
+    return len(summaries)
+
+
+def refresh_slaughter_months(months):
+    """Replace the monthly slaughter rows of every company for the given months."""
+    months = sorted(set(months) - {None})
+    if not months:
+        return 0
+
+    start, end = month_bounds(months[0], months[-1])
+    rows = (Slaughter.objects
+            .filter(date__gte=start, date__lt=end)
+            .annotate(month=TruncMonth('date', output_field=DateField()))
+            .filter(month__in=months)
+            .values('month', company_id=F('animal__company_id'))
+            .annotate(slaughters=Count('pk'), revenue=Sum(revenue(), output_field=FloatField()))
+            .order_by())
+    with transaction.atomic():
+        MonthlySlaughterSummary.objects.filter(month__in=months).delete()
+        summaries = MonthlySlaughterSummary.objects.bulk_create(
+            [MonthlySlaughterSummary(company_id=row['company_id'], month=row['month'],
+                                     slaughters=row['slaughters'], revenue=row['revenue'] or 0.0)
+             for row in rows]
+        )
+    return len(summaries)
+
+
+class SummaryRefresh(OnCommitBatch):
+    """
+    Summary rows touched by the current transaction, recomputed when it
+    commits. Recomputing is idempotent, so nested savepoints share one.
+    """
+
+    def __init__(self, using=None, key=None):
+        super().__init__(using, key)
+        self.companies = set()
+        self.groups = set()
+        self.months = set()
+
+    def add(self, companies=(), groups=(), months=()):
+        self.companies.update(companies)
+        self.groups.update(groups)
+        self.months.update(months)
+
+    def run(self):
+        with transaction.atomic():
+            refresh_company_summaries(self.companies)
+            refresh_group_summaries(self.groups)
+            refresh_slaughter_months(self.months)
+
+
+def queue_summary_refresh(companies=(), groups=(), months=()):
+    """Recompute the given summary rows on commit, or right away outside a transaction."""
+    if not transaction.get_connection().in_atomic_block:
+        refresh = SummaryRefresh()
+        refresh.add(companies, groups, months)
+        refresh()
+        return
+
+    SummaryRefresh.current().add(companies, groups, months)
+
+
+def rebuild_dashboard():
+    """Recompute every summary row. Returns the number of rows written per table."""
+    with transaction.atomic():
+        CompanySummary.objects.all().delete()
+        GroupGainSummary.objects.all().delete()
+        months = {month_of(moment) for moment in Slaughter.objects.datetimes('date', 'month')}
+        counts = {
+            'companies': refresh_company_summaries(Company.objects.values_list('pk', flat=True)),
+            'groups': refresh_group_summaries(Group.objects.values_list('pk', flat=True)),
+            'slaughter_months': refresh_slaughter_months(months),
+        }
+        MonthlySlaughterSummary.objects.exclude(month__in=months).delete()
+    logger.info("Rebuilt the dashboard summaries: %s.", counts)
+    return counts
@@ -0,0 +1,125 @@
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils.timezone import make_aware, now, timedelta
+from rest_framework import status
+from rest_framework.test import APITestCase
+from Animal.models import Animal, AnimalGroup, Group
+from animal_ration.feed_cost import refresh_feed_costs
+from animal_ration.models import FeedCostEntry
+from dashboard.models import CompanySummary, GroupGainSummary, MonthlySlaughterSummary
+from Farmer.models import Company
+from Slaughter.models import Slaughter
+from Weight.ingest import ingest_weights
+from Weight.models import Weight
+
+
+class DashboardTestCase(APITestCase):
+    """The summary tables follow animal, weight and slaughter writes as they commit."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        self.base = now() - timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company = Company.objects.create(name="Test Company")
+            self.group = Group.objects.create(name="Finishers")
+            self.animals = [
+                Animal.objects.create(eartag=f"TR{i:04d}", company=self.company, room="Room A")
+                for i in range(3)
+            ]
+            for i, animal in enumerate(self.animals):
+                AnimalGroup.objects.create(animal=animal, group=self.group)
+                Weight.objects.create(animal=animal, weight=300.0, recorded_at=self.base)
+                Weight.objects.create(animal=animal, weight=310.0 + 10 * i, recorded_at=self.base + timedelta(days=10))
+
+    def slaughter(self, animal, day, sale_price=10.0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Slaughter.objects.create(animal=animal, carcas_weight=200.0, sale_price=sale_price,
+                                            date=make_aware(datetime.combine(day, datetime.min.time())))
+
+    def test_summaries_follow_writes(self):
+        summary = CompanySummary.objects.get(company=self.company)
+        self.assertEqual((summary.active_animals, summary.slaughtered_animals), (3, 0))
+        gains = GroupGainSummary.objects.get(group=self.group)
+        self.assertEqual(gains.animals, 3)
+        self.assertAlmostEqual(gains.average_daily_gain, 2.0)  # 1, 2 and 3 kg a day
+
+        slaughter = self.slaughter(self.animals[0], date(2025, 3, 10))
+        self.slaughter(self.animals[1], date(2025, 3, 20), sale_price=12.0)
+        summary.refresh_from_db()
+        self.assertEqual((summary.active_animals, summary.slaughtered_animals), (1, 2))
+        march = MonthlySlaughterSummary.objects.get(company=self.company, month=date(2025, 3, 1))
+        self.assertEqual(march.slaughters, 2)
+        self.assertAlmostEqual(march.revenue, 200.0 * 10.0 + 200.0 * 12.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slaughter.date = make_aware(datetime(2025, 4, 2))
+            slaughter.save()
+        self.assertEqual(
+            list(MonthlySlaughterSummary.objects.order_by('month').values_list('month', 'slaughters')),
+            [(date(2025, 3, 1), 1), (date(2025, 4, 1), 1)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.animals[2].delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.active_animals, 0)
+        gains.refresh_from_db()
+        self.assertAlmostEqual(gains.average_daily_gain, 1.5)
+
+    def test_bulk_ingested_weights_refresh_group_gains(self):
+        recorded_at = (self.base + timedelta(days=20)).isoformat()
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_weights([{"eartag": animal.eartag, "weight": 320.0 + 10 * i, "recorded_at": recorded_at}
+                            for i, animal in enumerate(self.animals)])
+        self.assertAlmostEqual(GroupGainSummary.objects.get(group=self.group).average_daily_gain, 1.0)
+
+    def test_feed_cost_totals_follow_the_ledger(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            FeedCostEntry.objects.bulk_create([
+                FeedCostEntry(animal=animal, date=date(2025, 1, 1), cost=Decimal("10.00"), dry_matter_intake=Decimal(1))
+                for animal in self.animals[:2]
+            ])
+            refresh_feed_costs([animal.pk for animal in self.animals])
+        summary = CompanySummary.objects.get(company=self.company)
+        self.assertEqual(summary.total_feed_cost, Decimal("20.00"))
+        self.assertEqual(summary.average_feed_cost, Decimal("6.67"))
+
+    def test_dashboard_reads_only_the_summary_tables(self):
+        self.slaughter(self.animals[0], date(2025, 3, 10))
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/dashboard/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["companies"][0]["company_name"], "Test Company")
+        self.assertEqual(response.data["companies"][0]["active_animals"], 2)
+        self.assertEqual(response.data["groups"][0]["group_name"], "Finishers")
+        self.assertEqual(response.data["monthly_slaughters"][0]["month"], date(2025, 3, 1))
+
+        response = self.client.get("/api/dashboard/", {"company": self.company.pk + 1})
+        self.assertEqual(response.data["companies"], [])
+        response = self.client.get("/api/dashboard/", {"company": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_matches_the_incremental_summaries(self):
+        self.slaughter(self.animals[0], date(2025, 3, 10))
+        expected = (list(CompanySummary.objects.values_list('company', 'active_animals', 'slaughtered_animals')),
+                    list(GroupGainSummary.objects.values_list('group', 'animals', 'average_daily_gain')),
+                    list(MonthlySlaughterSummary.objects.values_list('company', 'month', 'slaughters', 'revenue')))
+
+        # Writes that send no signals leave the summaries behind until a rebuild
+        Animal.objects.filter(pk=self.animals[1].pk).update(is_slaughtered=True)
+        call_command("rebuild_dashboard", stdout=io.StringIO())
+        summary = CompanySummary.objects.get(company=self.company)
+        self.assertEqual((summary.active_animals, summary.slaughtered_animals), (1, 2))
+
+        Animal.objects.filter(pk=self.animals[1].pk).update(is_slaughtered=False)
+        call_command("rebuild_dashboard", stdout=io.StringIO())
+        self.assertEqual(
+            (list(CompanySummary.objects.values_list('company', 'active_animals', 'slaughtered_animals')),
+             list(GroupGainSummary.objects.values_list('group', 'animals', 'average_daily_gain')),
+             list(MonthlySlaughterSummary.objects.values_list('company', 'month', 'slaughters', 'revenue'))),
+            expected,
+        )
@@ -0,0 +1,37 @@
+# dashboard/views.py
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import CompanySummary, GroupGainSummary, MonthlySlaughterSummary
+
+
+class DashboardView(APIView):
+    """
+    Herd summary for the landing page: head counts and feed cost per
+    company, average daily gain per group and slaughter revenue per company
+    and month. Read from the summary tables maintained by dashboard.signals,
+    so the cost does not grow with the herd. ``?company=<id>`` limits the
+    company and slaughter rows to one company.
+    """
+
+    def get(self, request):
+        companies = CompanySummary.objects.order_by('company_id')
+        slaughters = MonthlySlaughterSummary.objects.order_by('company_id', 'month')
+        company = request.query_params.get('company')
+        if company:
+            if not company.isdigit():
+                raise ValidationError({"company": "Must be a company id."})
+            companies = companies.filter(company_id=company)
+            slaughters = slaughters.filter(company_id=company)
+
+        return Response({
+            "companies": list(companies.values(
+                'company_id', 'active_animals', 'slaughtered_animals', 'total_feed_cost', 'average_feed_cost',
+                company_name=F('company__name'),
+            )),
+            "groups": list(GroupGainSummary.objects.order_by('group_id').values(
+                'group_id', 'animals', 'average_daily_gain', group_name=F('group__name'),
+            )),
+            "monthly_slaughters": list(slaughters.values('company_id', 'month', 'slaughters', 'revenue')),
+        })
@@ -14,13 +14,16 @@ class SoftDeleteAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'is_deleted', 'updated_at', 'deleted_at')
     list_filter = ('deleted_at',)  # Add a filter for soft-deleted records
 
-    actions = ['restore_selected']
+    actions = ['soft_delete_selected', 'restore_selected']
+
+    def soft_delete_selected(self, request, queryset):
+        deleted = queryset.soft_delete()
+        self.message_user(request, f"{deleted} objects have been soft deleted.")
+    soft_delete_selected.short_description = "Soft delete selected records"
 
     def restore_selected(self, request, queryset):
-        for obj in queryset:
-            if obj.is_deleted():
-                obj.restore()
-        self.message_user(request, "Selected objects have been restored.")
+        restored = queryset.restore()
+        self.message_user(request, f"{restored} objects have been restored.")
     restore_selected.short_description = "Restore selected soft-deleted records"
 
 # Register the models with the customized admin class
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RationComponentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ration_components'
+
+    def ready(self):
+        import ration_components.cache  # Cache invalidation receivers
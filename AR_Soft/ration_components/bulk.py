@@ -0,0 +1,141 @@
+"""
+Bulk price/nutrient updates for ration components.
+
+The rows are validated in memory, then matched against the current
+component values with one ``SELECT ... FOR UPDATE`` in the transaction that
+writes them, so a concurrent edit can neither be overwritten nor logged
+with a wrong old value. Only real changes are written: one
+``bulk_update`` for the components, the ``ComponentChangeLog`` rows through
+the buffered audit pipeline (one insert on commit), a single refresh of
+every ration table aggregate that uses a changed component and one
+invalidation of the reference caches.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from ration_logs.audit import record
+from ration_logs.models import ComponentChangeLog
+from .cache import component_cache, ration_table_cache
+from .models import RationComponent, RationTableAggregate, RationTableComponent
+from .serializers import RationComponentBulkUpdateRowSerializer
+
+UPDATABLE_FIELDS = RationComponentBulkUpdateRowSerializer.UPDATABLE_FIELDS
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def match_components(rows):
+    """
+    Map each validated row to its active component, by id or by name, and
+    lock the components until the transaction ends; must be called inside
+    one. Returns ``{index: component}`` and ``{index: error}``.
+    """
+    ids = {data['id'] for _, data in rows if data.get('id') is not None}
+    names = {data['name'] for _, data in rows if data.get('id') is None}
+    components = list(RationComponent.objects
+                      .filter(Q(pk__in=ids) | Q(name__in=names))
+                      .order_by('pk')
+                      .select_for_update())
+    by_id = {component.pk: component for component in components}
+    by_name = {}
+    for component in components:
+        by_name.setdefault(component.name, []).append(component)
+
+    matched, errors = {}, {}
+    for index, data in rows:
+        if data.get('id') is not None:
+            component = by_id.get(data['id'])
+            if component is None:
+                errors[index] = f"Unknown component {data['id']}."
+            elif data.get('name') and data['name'] != component.name:
+                errors[index] = f"Component {component.pk} is named '{component.name}', not '{data['name']}'."
+            else:
+                matched[index] = component
+        else:
+            candidates = by_name.get(data['name'], [])
+            if len(candidates) != 1:
+                errors[index] = (f"No component named '{data['name']}'." if not candidates
+                                 else f"Several components are named '{data['name']}'; use 'id'.")
+            else:
+                matched[index] = candidates[0]
+    return matched, errors
+
+
+def bulk_update_components(rows, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """
+    Apply a list of price/nutrient updates and return the per-row report.
+    The components are read, diffed and written in one transaction.
+    """
+    results = [None] * len(rows)
+
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = RationComponentBulkUpdateRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "status": "rejected", "errors": serializer.errors}
+
+    with transaction.atomic():
+        changed = apply_updates(valid, results, batch_size)
+
+    return {
+        "received": len(rows),
+        "updated": len(changed),
+        "unchanged": sum(1 for result in results if result["status"] == "unchanged"),
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "results": results,
+    }
+
+
+def apply_updates(valid, results, batch_size):
+    """
+    Diff the validated rows against their locked components, write the
+    changes and fill in ``results``. Returns the changed components by id.
+    """
+    matched, errors = match_components(valid)
+    for index, error in errors.items():
+        results[index] = {"index": index, "status": "rejected", "errors": {"component": [error]}}
+
+    changed_at = now()
+    changed, logs, updated_fields, seen = {}, [], set(), set()
+    for index, data in valid:
+        component = matched.get(index)
+        if component is None:
+            continue
+        if component.pk in seen:
+            results[index] = {"index": index, "status": "rejected",
+                              "errors": {"component": ["Component updated twice in this upload."]}}
+            continue
+        seen.add(component.pk)
+
+        changes = {}
+        for field in UPDATABLE_FIELDS:
+            if field in data and data[field] != getattr(component, field):
+                changes[field] = [getattr(component, field), data[field]]
+                logs.append(ComponentChangeLog(component=component, field_name=field,
+                                               old_value=getattr(component, field), new_value=data[field],
+                                               changed_at=changed_at))
+                setattr(component, field, data[field])
+
+        if changes:
+            component.updated_at = changed_at
+            changed[component.pk] = component
+            updated_fields.update(changes)
+        results[index] = {"index": index, "id": component.pk,
+                          "status": "updated" if changes else "unchanged", "changes": changes}
+
+    if changed:
+        RationComponent.objects.bulk_update(
+            changed.values(), [*sorted(updated_fields), 'updated_at'], batch_size=batch_size
+        )
+        record(*logs)
+        RationTableAggregate.refresh(
+            RationTableComponent.all_objects
+            .filter(component_id__in=list(changed))
+            .values_list('ration_table_id', flat=True)
+        )
+        # bulk_update sends no post_save, so the caches are invalidated here
+        component_cache.invalidate()
+        ration_table_cache.invalidate()
+    return changed
@@ -0,0 +1,61 @@
+"""
+Reference caches of the ration models.
+
+Any save, delete, soft delete or restore of a component, table or table
+component invalidates the namespaces it can affect; table lists and totals
+embed component prices, so component changes invalidate both.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from AR_Soft.cache import ReferenceCache
+from .models import RationComponent, RationTable, RationTableAggregate, RationTableComponent
+from .signals import restored, soft_deleted
+
+component_cache = ReferenceCache('ration_components')
+ration_table_cache = ReferenceCache('ration_tables')
+
+
+def load_ration_table_totals(keys):
+    ration_table_ids = {int(key.split(':')[1]) for key in keys}
+    totals = {
+        aggregate.ration_table_id: (aggregate.cost, aggregate.dry_matter)
+        for aggregate in RationTableAggregate.objects.filter(ration_table_id__in=ration_table_ids)
+    }
+
+    # Tables without an aggregate yet are built on the fly
+    missing = ration_table_ids - totals.keys()
+    if missing:
+        for aggregate in RationTableAggregate.refresh(missing):
+            totals[aggregate.ration_table_id] = (aggregate.cost, aggregate.dry_matter)
+    return {f'totals:{pk}': totals.get(pk) for pk in ration_table_ids}
+
+
+def ration_table_totals(ration_table_ids):
+    """Return ``{ration_table_id: (daily_cost, total_dry_matter)}`` through the cache."""
+    cached = ration_table_cache.get_many([f'totals:{pk}' for pk in ration_table_ids], load_ration_table_totals)
+    return {int(key.split(':')[1]): value for key, value in cached.items() if value is not None}
+
+
+@receiver(post_save, sender=RationComponent)
+@receiver(post_delete, sender=RationComponent)
+def invalidate_component_caches(sender, **kwargs):
+    component_cache.invalidate()
+    ration_table_cache.invalidate()
+
+
+@receiver(post_save, sender=RationTable)
+@receiver(post_delete, sender=RationTable)
+@receiver(post_save, sender=RationTableComponent)
+@receiver(post_delete, sender=RationTableComponent)
+def invalidate_ration_table_cache(sender, **kwargs):
+    ration_table_cache.invalidate()
+
+
+@receiver(soft_deleted)
+@receiver(restored)
+def invalidate_on_soft_delete(sender, **kwargs):
+    if sender is RationComponent:
+        invalidate_component_caches(sender)
+    elif sender in (RationTable, RationTableComponent):
+        invalidate_ration_table_cache(sender)
@@ -1,6 +1,98 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils.timezone import now
 
-class ActiveManager(models.Manager):
+from .signals import restored, soft_deleted
+
+
+def touch_fields(model, value):
+    """Bump ``updated_at`` too, as a save would have."""
+    return {'updated_at': value} if any(f.name == 'updated_at' for f in model._meta.concrete_fields) else {}
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """
+    Set-based soft delete and restore.
+
+    Each operation takes a handful of UPDATEs inside one transaction: one for
+    the selected rows and one per child relation listed in the model's
+    ``soft_delete_children``, followed by one ``soft_deleted``/``restored``
+    signal per model and one refresh of the affected aggregates.
+    """
+
+    def soft_delete(self, deleted_at=None):
+        """Soft delete the active rows and their active children. Returns the number of rows deleted."""
+        deleted_at = deleted_at or now()
+        model = self.model
+        with transaction.atomic(using=self.db):
+            pks = list(self.filter(deleted_at__isnull=True).values_list('pk', flat=True))
+            if not pks:
+                return 0
+            model.all_objects.using(self.db).filter(pk__in=pks).update(
+                deleted_at=deleted_at, **touch_fields(model, deleted_at)
+            )
+
+            for child, field in model.soft_delete_children():
+                children = child.all_objects.using(self.db).filter(**{f'{field}__in': pks, 'deleted_at__isnull': True})
+                child_pks = list(children.values_list('pk', flat=True))
+                if child_pks:
+                    child.all_objects.using(self.db).filter(pk__in=child_pks).update(
+                        deleted_at=deleted_at, **touch_fields(child, deleted_at)
+                    )
+                    soft_deleted.send(sender=child, pks=child_pks, deleted_at=deleted_at, using=self.db)
+
+            soft_deleted.send(sender=model, pks=pks, deleted_at=deleted_at, using=self.db)
+            model.refresh_soft_delete_aggregates(pks)
+        return len(pks)
+
+    def restore(self):
+        """
+        Restore the soft-deleted rows, with the children that were deleted
+        along with them (at or after the parent). A child whose other parent
+        is still deleted stays deleted until that parent is restored. Returns
+        the number of rows restored.
+        """
+        model = self.model
+        restored_at = now()
+        with transaction.atomic(using=self.db):
+            deleted_at_by_pk = dict(self.filter(deleted_at__isnull=False).values_list('pk', 'deleted_at'))
+            if not deleted_at_by_pk:
+                return 0
+
+            for child, field in model.soft_delete_children():
+                children = child.all_objects.using(self.db).filter(
+                    **{f'{field}__in': list(deleted_at_by_pk), 'deleted_at__gte': F(f'{field}__deleted_at')}
+                )
+                for other, other_field in child.soft_delete_parents():
+                    if other is model:
+                        continue
+                    # Still hidden by another deleted parent: hand the child over to that
+                    # parent's deletion so restoring it brings the child back
+                    hidden = {f'{other_field}__deleted_at__isnull': False}
+                    children.filter(**hidden).update(deleted_at=Subquery(
+                        other.all_objects.filter(pk=OuterRef(other_field)).values('deleted_at')[:1]
+                    ))
+                    children = children.exclude(**hidden)
+                child_rows = dict(children.values_list('pk', 'deleted_at'))
+                if child_rows:
+                    child.all_objects.using(self.db).filter(pk__in=list(child_rows)).update(
+                        deleted_at=None, **touch_fields(child, restored_at)
+                    )
+                    restored.send(sender=child, deleted_at_by_pk=child_rows, using=self.db)
+
+            model.all_objects.using(self.db).filter(pk__in=list(deleted_at_by_pk)).update(
+                deleted_at=None, **touch_fields(model, restored_at)
+            )
+            restored.send(sender=model, deleted_at_by_pk=deleted_at_by_pk, using=self.db)
+            model.refresh_soft_delete_aggregates(list(deleted_at_by_pk))
+        return len(deleted_at_by_pk)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """Manager over every row, soft-deleted or not."""
+
+
+class ActiveManager(SoftDeleteManager):
     """Manager to filter out soft-deleted records."""
     def get_queryset(self):
         return super().get_queryset().filter(deleted_at__isnull=True)
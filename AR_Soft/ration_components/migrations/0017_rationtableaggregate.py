@@ -0,0 +1,54 @@
+# Generated by Django 4.2.21 on 2026-10-18 07:57
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_aggregates(apps, schema_editor):
+    RationTable = apps.get_model('ration_components', 'RationTable')
+    RationTableComponent = apps.get_model('ration_components', 'RationTableComponent')
+    RationTableAggregate = apps.get_model('ration_components', 'RationTableAggregate')
+
+    totals = {
+        pk: {'cost': Decimal(0), 'dry_matter': Decimal(0), 'calori': Decimal(0), 'nisasta': Decimal(0)}
+        for pk in RationTable.objects.values_list('pk', flat=True)
+    }
+    rows = (RationTableComponent.objects
+            .filter(deleted_at__isnull=True)
+            .values_list('ration_table_id', 'quantity', 'component__price',
+                         'component__dry_matter', 'component__calori', 'component__nisasta'))
+    for ration_table_id, quantity, price, dry_matter, calori, nisasta in rows:
+        table = totals[ration_table_id]
+        table['cost'] += quantity * price
+        table['dry_matter'] += dry_matter * quantity
+        table['calori'] += calori * quantity
+        table['nisasta'] += nisasta * quantity
+
+    RationTableAggregate.objects.bulk_create(
+        RationTableAggregate(ration_table_id=pk, **values) for pk, values in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_components', '0016_rationtable_deleted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RationTableAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('dry_matter', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('calori', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('nisasta', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ration_table', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='aggregate', to='ration_components.rationtable')),
+            ],
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
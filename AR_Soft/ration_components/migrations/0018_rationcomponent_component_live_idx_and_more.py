@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_components', '0017_rationtableaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rationcomponent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['id'], name='component_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtable',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['id'], name='ration_table_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablecomponent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['ration_table'], name='table_component_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablecomponent',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['component'], name='component_usage_live_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Q
 from django.utils.timezone import now
-from .manager import ActiveManager
+from .manager import ActiveManager, SoftDeleteManager
+from .signals import refreshed
 from decimal import Decimal
 
 class SoftDeleteModel(models.Model):
@@ -11,20 +13,40 @@ class SoftDeleteModel(models.Model):
 
     def delete(self, *args, hard_delete=False, **kwargs):
         if hard_delete:
-            super().delete(*args, **kwargs)  # This should remove the record from the database
-        else:
-            self.deleted_at = now()
-            self.save()
-
+            return super().delete(*args, **kwargs)  # This should remove the record from the database
+        # Soft delete through the queryset so children cascade the same way as in bulk
+        deleted_at = now()
+        if type(self).all_objects.filter(pk=self.pk).soft_delete(deleted_at):
+            self.deleted_at = deleted_at
+            refreshed.send(sender=type(self), instance=self, fields=['deleted_at'])
 
     def restore(self, *args, **kwargs):
-        # Restore soft-deleted object
-        self.deleted_at = None
-        self.save()
+        # Restore soft-deleted object, and the children deleted along with it
+        if type(self).all_objects.filter(pk=self.pk).restore():
+            self.deleted_at = None
+            refreshed.send(sender=type(self), instance=self, fields=['deleted_at'])
 
     def is_deleted(self):
         return self.deleted_at is not None
 
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        refreshed.send(sender=type(self), instance=self, fields=fields)
+
+    @classmethod
+    def soft_delete_children(cls):
+        """``(child model, foreign key)`` pairs soft deleted and restored along with this model."""
+        return ()
+
+    @classmethod
+    def soft_delete_parents(cls):
+        """``(parent model, foreign key)`` pairs whose soft delete cascades to this model."""
+        return ()
+
+    @classmethod
+    def refresh_soft_delete_aggregates(cls, pks):
+        """Called once after ``pks`` were soft deleted or restored."""
+
 class RationComponent(SoftDeleteModel):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -35,22 +57,22 @@ class RationComponent(SoftDeleteModel):
     updated_at = models.DateTimeField(auto_now=True)
 
     objects = ActiveManager()  # Default manager excludes soft-deleted records
-    all_objects = models.Manager()  # Includes all records
-
-    def delete(self, *args, hard_delete=False, **kwargs):
-        # Call parent delete for core functionality
-        super().delete(*args, hard_delete=hard_delete, **kwargs)
+    all_objects = SoftDeleteManager()  # Includes all records
 
-        # Additional logic for soft delete
-        if not hard_delete:
-            self.rationtablecomponent_set.update(deleted_at=now())
-
-    def restore(self, *args, **kwargs):
-        # Call parent restore for core functionality
-        super().restore(*args, **kwargs)
-
-        # Additional logic for restore
-        self.rationtablecomponent_set.update(deleted_at=None)
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=Q(deleted_at__isnull=True), name='component_live_idx'),
+        ]
+
+    @classmethod
+    def soft_delete_children(cls):
+        return ((RationTableComponent, 'component'),)
+
+    @classmethod
+    def refresh_soft_delete_aggregates(cls, pks):
+        RationTableAggregate.refresh(
+            RationTableComponent.all_objects.filter(component_id__in=pks).values_list('ration_table_id', flat=True)
+        )
 
     def __str__(self):
         return self.name
@@ -63,51 +85,56 @@ class RationTable(SoftDeleteModel):
     
     # Managers
     objects = ActiveManager()  # Default manager for active records
-    all_objects = models.Manager()  # Includes soft-deleted records
+    all_objects = SoftDeleteManager()  # Includes soft-deleted records
 
-    def delete(self, *args, hard_delete=False, **kwargs):
-        # Call parent delete for core functionality
-        super().delete(*args, hard_delete=hard_delete, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=Q(deleted_at__isnull=True), name='ration_table_live_idx'),
+        ]
 
-        # Additional logic for soft delete
-        if not hard_delete:
-            self.rationtablecomponent_set.update(deleted_at=now())
+    @classmethod
+    def soft_delete_children(cls):
+        return ((RationTableComponent, 'ration_table'),)
 
-    def restore(self, *args, **kwargs):
-        # Call parent restore for core functionality
-        super().restore(*args, **kwargs)
-
-        # Additional logic for restore
-        self.rationtablecomponent_set.update(deleted_at=None)
+    @classmethod
+    def refresh_soft_delete_aggregates(cls, pks):
+        RationTableAggregate.refresh(pks)
 
     def compute_cost(self):
         return sum(
             component.quantity * component.component.price
-            for component in self.rationtablecomponent_set.all()
+            for component in self.rationtablecomponent_set.select_related('component')
         )
     def compute_total_dry_matter(self):
         """Compute the total dry matter of the ration table."""
         return sum(
             Decimal(component.component.dry_matter) * Decimal(component.quantity)
-            for component in self.rationtablecomponent_set.all()
+            for component in self.rationtablecomponent_set.select_related('component')
         )
     def compute_total_calori(self):
         """Compute the total calori of the ration table."""
         return sum(
             Decimal(component.component.calori) * Decimal(component.quantity)
-            for component in self.rationtablecomponent_set.all()
+            for component in self.rationtablecomponent_set.select_related('component')
         )
 
     def compute_total_nisasta(self):
         """Compute the total nisasta of the ration table."""
         return sum(
             Decimal(component.component.nisasta) * Decimal(component.quantity)
-            for component in self.rationtablecomponent_set.all()
+            for component in self.rationtablecomponent_set.select_related('component')
         )
+
+    def get_aggregate(self):
+        """Return the materialized totals of the table, building them on first access."""
+        try:
+            return self.aggregate
+        except RationTableAggregate.DoesNotExist:
+            return RationTableAggregate.refresh([self.pk])[0]
     def __str__(self):
         return self.name
 
-class RationTableComponent(models.Model):
+class RationTableComponent(SoftDeleteModel):
     ration_table = models.ForeignKey('RationTable', on_delete=models.CASCADE)
     component = models.ForeignKey('RationComponent', on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
@@ -116,24 +143,88 @@ class RationTableComponent(models.Model):
     
     # Managers
     objects = ActiveManager()  # Default manager for active records
-    all_objects = models.Manager()  # Includes soft-deleted records
+    all_objects = SoftDeleteManager()  # Includes soft-deleted records
 
     class Meta:
         unique_together = ('ration_table', 'component')
+        indexes = [
+            # Live rows of a table or component (soft delete cascades, aggregates)
+            models.Index(fields=['ration_table'], condition=Q(deleted_at__isnull=True), name='table_component_live_idx'),
+            models.Index(fields=['component'], condition=Q(deleted_at__isnull=True), name='component_usage_live_idx'),
+        ]
+
+    @classmethod
+    def soft_delete_parents(cls):
+        return ((RationComponent, 'component'), (RationTable, 'ration_table'))
+
+    @classmethod
+    def refresh_soft_delete_aggregates(cls, pks):
+        RationTableAggregate.refresh(
+            cls.all_objects.filter(pk__in=pks).values_list('ration_table_id', flat=True)
+        )
 
-    def delete(self, hard_delete=False, *args, **kwargs):
-        if hard_delete:
-            super().delete(*args, **kwargs)
-        else:
-            self.deleted_at = now()
-            self.save()
+    def __str__(self):
+        return f"{self.ration_table.name} - {self.component.name}"
 
-    def restore(self):
-        self.deleted_at = None
-        self.save()
 
-    def is_deleted(self):
-        return self.deleted_at is not None
+class RationTableAggregate(models.Model):
+    """
+    Materialized cost and nutrient totals of a ration table.
+
+    Kept in sync by the ration_logs signal receivers whenever a component's
+    price/nutrients or a table component's quantity changes, so list and
+    feed cost paths read one row instead of joining every component.
+    """
+    ration_table = models.OneToOneField(RationTable, on_delete=models.CASCADE, related_name='aggregate')
+    cost = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    dry_matter = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    calori = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    nisasta = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    TOTAL_FIELDS = ('cost', 'dry_matter', 'calori', 'nisasta')
 
     def __str__(self):
-        return f"{self.ration_table.name} - {self.component.name}"
+        return f"Totals of {self.ration_table_id}"
+
+    @classmethod
+    def refresh(cls, ration_table_ids):
+        """
+        Recompute the totals of the given ration tables from their active
+        components in one query and upsert them in one statement.
+        """
+        table_ids = RationTable.all_objects.filter(pk__in=ration_table_ids).values_list('pk', flat=True)
+        totals = {pk: dict.fromkeys(cls.TOTAL_FIELDS, Decimal(0)) for pk in table_ids}
+        if not totals:
+            return []
+
+        rows = (RationTableComponent.objects
+                .filter(ration_table_id__in=list(totals))
+                .values_list('ration_table_id', 'quantity', 'component__price',
+                             'component__dry_matter', 'component__calori', 'component__nisasta'))
+        for ration_table_id, quantity, price, dry_matter, calori, nisasta in rows:
+            table = totals[ration_table_id]
+            table['cost'] += quantity * price
+            table['dry_matter'] += Decimal(dry_matter) * Decimal(quantity)
+            table['calori'] += Decimal(calori) * Decimal(quantity)
+            table['nisasta'] += Decimal(nisasta) * Decimal(quantity)
+
+        aggregates = [cls(ration_table_id=pk, **values) for pk, values in totals.items()]
+        cls.objects.bulk_create(
+            aggregates,
+            update_conflicts=True,
+            unique_fields=['ration_table'],
+            update_fields=[*cls.TOTAL_FIELDS, 'updated_at'],
+        )
+        return aggregates
+
+    @classmethod
+    def refresh_for(cls, instance):
+        """Refresh every table affected by a change to a component, table or table component."""
+        if isinstance(instance, RationTable):
+            table_ids = [instance.pk]
+        elif isinstance(instance, RationTableComponent):
+            table_ids = [instance.ration_table_id]
+        else:
+            table_ids = RationTableComponent.all_objects.filter(component=instance).values_list('ration_table_id', flat=True)
+        return cls.refresh(table_ids)
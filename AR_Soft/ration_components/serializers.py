@@ -1,15 +1,39 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import RationComponent, RationTable, RationTableComponent
 
 # Serializer for RationComponent
-class RationComponentSerializer(serializers.ModelSerializer):
+class RationComponentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = RationComponent
         fields = ['id', 'name', 'description', 'dry_matter', 'calori', 'nisasta', 'price']
 
 
+# One row of a bulk price/nutrient update
+class RationComponentBulkUpdateRowSerializer(serializers.Serializer):
+    UPDATABLE_FIELDS = ('price', 'dry_matter', 'calori', 'nisasta')
+
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0), required=False)
+    dry_matter = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal(0), required=False)
+    calori = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal(0), required=False)
+    nisasta = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal(0), required=False)
+
+    def validate(self, data):
+        if data.get('id') is None and not data.get('name'):
+            raise serializers.ValidationError("Either 'id' or 'name' is required.")
+        if not any(field in data for field in self.UPDATABLE_FIELDS):
+            raise serializers.ValidationError(
+                f"At least one of {', '.join(self.UPDATABLE_FIELDS)} is required."
+            )
+        return data
+
+
 # Serializer for RationTableComponent
-class RationTableComponentSerializer(serializers.ModelSerializer):
+class RationTableComponentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     ration_table_name = serializers.CharField(source='ration_table.name', read_only=True)
     component_name = serializers.CharField(source='component.name', read_only=True)
 
@@ -19,12 +43,14 @@ class RationTableComponentSerializer(serializers.ModelSerializer):
 
 
 # Serializer for RationTable
-class RationTableSerializer(serializers.ModelSerializer):
+class RationTableSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     cost = serializers.SerializerMethodField()
 
     class Meta:
         model = RationTable
         fields = ['id', 'name', 'description', 'cost']
+        method_field_sources = {'cost': 'aggregate'}
 
     def get_cost(self, obj):
-        return obj.compute_cost()
+        # Read the materialized totals instead of joining every component
+        return obj.get_aggregate().cost
@@ -0,0 +1,20 @@
+"""
+Signals sent by the set-based soft delete and restore of ``SoftDeleteQuerySet``.
+
+``QuerySet.update`` bypasses ``pre_save``/``post_save``, so these carry the
+affected primary keys instead, once per model and operation:
+
+* ``soft_deleted``: ``sender``, ``pks``, ``deleted_at``, ``using``
+* ``restored``: ``sender``, ``deleted_at_by_pk`` (the cleared timestamps), ``using``
+
+``refreshed`` (``sender``, ``instance``, ``fields``) is sent when an
+instance's values are brought in line with the database without a
+``post_init``: after ``refresh_from_db`` (``fields`` as passed to it, None
+for every field) and after the instance's own soft delete or restore
+(``['deleted_at']``).
+"""
+from django.dispatch import Signal
+
+soft_deleted = Signal()
+restored = Signal()
+refreshed = Signal()
@@ -1,7 +1,18 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import RationComponent, RationTable, RationTableComponent
+from AR_Soft.cache import reference_caches
+from ration_logs.models import ComponentChangeLog, RationTableComponentLog
+from .cache import component_cache, ration_table_cache, ration_table_totals
+from .models import RationComponent, RationTable, RationTableComponent, RationTableAggregate
 
 
 class RationComponentTestCase(TestCase):
@@ -153,3 +164,377 @@ class RationTableComponentTestCase(TestCase):
         with self.assertRaises(RationTableComponent.DoesNotExist):
             RationTableComponent.all_objects.get(id=self.table_component.id)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class RationTableAggregateTestCase(TestCase):
+    """Test cases for the materialized ration table totals."""
+
+    def setUp(self):
+        self.barley = RationComponent.objects.create(
+            name="Barley", dry_matter=88.0, calori=12.0, nisasta=55.0, price=10.00,
+        )
+        self.silage = RationComponent.objects.create(
+            name="Silage", dry_matter=35.0, calori=6.0, nisasta=25.0, price=2.00,
+        )
+        self.table = RationTable.objects.create(name="Finisher")
+        self.barley_row = RationTableComponent.objects.create(
+            ration_table=self.table, component=self.barley, quantity=4.0,
+        )
+        self.silage_row = RationTableComponent.objects.create(
+            ration_table=self.table, component=self.silage, quantity=10.0,
+        )
+
+    def assertTotalsMatchLiveComputation(self):
+        aggregate = RationTableAggregate.objects.get(ration_table=self.table)
+        self.assertEqual(aggregate.cost, self.table.compute_cost())
+        self.assertEqual(aggregate.dry_matter, self.table.compute_total_dry_matter())
+        self.assertEqual(aggregate.calori, self.table.compute_total_calori())
+        self.assertEqual(aggregate.nisasta, self.table.compute_total_nisasta())
+        return aggregate
+
+    def test_totals_built_from_components(self):
+        aggregate = self.assertTotalsMatchLiveComputation()
+        self.assertEqual(aggregate.cost, Decimal("60.00"))
+
+    def test_component_price_change_updates_totals(self):
+        self.barley.price = 12.50
+        self.barley.save()
+        aggregate = self.assertTotalsMatchLiveComputation()
+        self.assertEqual(aggregate.cost, Decimal("70.00"))
+
+    def test_quantity_change_updates_totals(self):
+        self.silage_row.quantity = 5.0
+        self.silage_row.save()
+        aggregate = self.assertTotalsMatchLiveComputation()
+        self.assertEqual(aggregate.cost, Decimal("50.00"))
+
+    def test_soft_delete_and_restore_update_totals(self):
+        self.silage_row.delete()
+        self.assertEqual(self.assertTotalsMatchLiveComputation().cost, Decimal("40.00"))
+
+        self.silage_row.restore()
+        self.assertEqual(self.assertTotalsMatchLiveComputation().cost, Decimal("60.00"))
+
+        self.barley.delete()
+        self.assertEqual(self.assertTotalsMatchLiveComputation().cost, Decimal("20.00"))
+
+    def test_hard_delete_updates_totals(self):
+        self.barley_row.delete(hard_delete=True)
+        self.assertEqual(self.assertTotalsMatchLiveComputation().cost, Decimal("20.00"))
+
+        self.table.delete(hard_delete=True)
+        self.assertFalse(RationTableAggregate.objects.filter(ration_table_id=self.table.pk).exists())
+
+    def test_list_reads_precomputed_totals(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("vet", password="secret"))
+
+        with CaptureQueriesContext(connection) as one_table:
+            client.get("/api/ration-tables/")
+
+        for i in range(3):
+            table = RationTable.objects.create(name=f"Table {i}")
+            RationTableComponent.objects.create(ration_table=table, component=self.barley, quantity=i + 1)
+
+        with CaptureQueriesContext(connection) as four_tables:
+            response = client.get("/api/ration-tables/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(one_table), len(four_tables))
+        costs = {row["name"]: row["cost"] for row in response.data}
+        self.assertEqual(costs["Finisher"], Decimal("60.00"))
+        self.assertEqual(costs["Table 2"], Decimal("30.00"))
+
+
+class RationComponentBulkUpdateTestCase(TestCase):
+    """Test cases for the bulk price/nutrient update endpoint."""
+
+    url = "/api/ration-components/bulk-update/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.barley = RationComponent.objects.create(
+                name="Barley", dry_matter=88.0, calori=12.0, nisasta=55.0, price=10.00,
+            )
+            self.silage = RationComponent.objects.create(
+                name="Silage", dry_matter=35.0, calori=6.0, nisasta=25.0, price=2.00,
+            )
+            self.table = RationTable.objects.create(name="Finisher")
+            RationTableComponent.objects.create(ration_table=self.table, component=self.barley, quantity=4.0)
+            RationTableComponent.objects.create(ration_table=self.table, component=self.silage, quantity=10.0)
+
+    def test_updates_components_logs_changes_and_refreshes_totals(self):
+        logged = ComponentChangeLog.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, [
+                {"id": self.barley.pk, "price": "12.50", "calori": "12.00"},
+                {"name": "Silage", "price": "3.00", "dry_matter": "36.00"},
+            ], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["updated"], response.data["rejected"]), (2, 0))
+        self.assertEqual(response.data["results"][0]["changes"], {"price": [Decimal("10.00"), Decimal("12.50")]})
+
+        self.barley.refresh_from_db()
+        self.assertEqual(self.barley.price, Decimal("12.50"))
+        changes = ComponentChangeLog.objects.order_by("id")[logged:]
+        self.assertEqual(
+            sorted((log.component_id, log.field_name, log.new_value) for log in changes),
+            sorted([(self.barley.pk, "price", "12.50"), (self.silage.pk, "dry_matter", "36.00"),
+                    (self.silage.pk, "price", "3.00")]),
+        )
+        aggregate = RationTableAggregate.objects.get(ration_table=self.table)
+        self.assertEqual(aggregate.cost, Decimal("80.00"))
+        self.assertEqual(aggregate.cost, self.table.compute_cost())
+
+    def test_invalid_rows_are_reported_per_row(self):
+        RationComponent.objects.create(name="Silage", dry_matter=30.0, calori=5.0, nisasta=20.0, price=1.00)
+        response = self.client.post(self.url, [
+            {"name": "Unknown", "price": "1.00"},
+            {"name": "Silage", "price": "1.00"},
+            {"id": self.barley.pk},
+            {"id": self.barley.pk, "price": "-1"},
+            {"id": self.barley.pk, "price": "10.00"},
+            {"id": self.barley.pk, "price": "11.00"},
+        ], format="json")
+
+        statuses = [row["status"] for row in response.data["results"]]
+        self.assertEqual(statuses, ["rejected", "rejected", "rejected", "rejected", "unchanged", "rejected"])
+        self.barley.refresh_from_db()
+        self.assertEqual(self.barley.price, Decimal("10.00"))
+
+    def test_components_are_locked_in_the_writing_transaction(self):
+        # Every component read for the diff is locked, inside the bulk's own atomic block
+        locks = []
+        select_for_update = QuerySet.select_for_update
+
+        def record_lock(queryset, *args, **kwargs):
+            locks.append((queryset.model, bool(connection.savepoint_ids)))
+            return select_for_update(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, "select_for_update", record_lock):
+            self.client.post(self.url, [{"id": self.barley.pk, "price": "12.00"}], format="json")
+        self.assertIn((RationComponent, True), locks)
+
+    def test_csv_upload_with_constant_queries(self):
+        for i in range(20):
+            RationComponent.objects.create(name=f"Mix {i}", dry_matter=80.0, calori=10.0, nisasta=40.0, price=5.00)
+
+        def upload(count, price):
+            body = "name,price,calori\n" + "".join(f"Mix {i},{price},\n" for i in range(count))
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, body, content_type="text/csv")
+            self.assertEqual(response.data["updated"], count)
+            return len(queries)
+
+        self.assertEqual(upload(2, "6.00"), upload(20, "7.00"))
+        self.assertEqual(RationComponent.objects.get(name="Mix 19").price, Decimal("7.00"))
+
+
+class SoftDeleteCascadeTestCase(TestCase):
+    """Test cases for the set-based soft delete and restore."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.components = [
+                RationComponent.objects.create(name=f"C{i}", dry_matter=80.0, calori=10.0, nisasta=40.0, price=2.00)
+                for i in range(6)
+            ]
+            self.table = RationTable.objects.create(name="Grower")
+            self.rows = [
+                RationTableComponent.objects.create(ration_table=self.table, component=component, quantity=1.0)
+                for component in self.components
+            ]
+
+    def soft_delete(self, components):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            deleted = RationComponent.all_objects.filter(pk__in=[c.pk for c in components]).soft_delete()
+        self.assertEqual(deleted, len(components))
+        return len(queries)
+
+    def test_soft_delete_cascades_with_constant_queries(self):
+        self.assertEqual(self.soft_delete(self.components[:1]), self.soft_delete(self.components[1:5]))
+
+        self.assertEqual(RationTableComponent.objects.filter(ration_table=self.table).count(), 1)
+        self.assertEqual(
+            ComponentChangeLog.objects.filter(field_name="deleted_at", new_value__isnull=False).count(), 5
+        )
+        self.assertEqual(RationTableComponentLog.objects.filter(action="Soft Deleted").count(), 5)
+        self.assertEqual(self.table.get_aggregate().cost, Decimal("2.00"))
+
+    def test_restore_brings_back_only_children_deleted_with_the_parent(self):
+        self.rows[0].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            RationComponent.all_objects.filter(pk__in=[c.pk for c in self.components[:2]]).soft_delete()
+            restored = RationComponent.all_objects.filter(pk__in=[c.pk for c in self.components[:3]]).restore()
+
+        self.assertEqual(restored, 2)
+        active = set(RationTableComponent.objects.values_list("component_id", flat=True))
+        self.assertEqual(active, {c.pk for c in self.components[1:]})
+        self.assertEqual(RationTableComponentLog.objects.filter(action="Restored", new_quantity=1).count(), 1)
+        self.table.aggregate.refresh_from_db()
+        self.assertEqual(self.table.aggregate.cost, Decimal("10.00"))
+
+    def test_children_of_a_deleted_table_stay_deleted(self):
+        self.components[0].delete()
+        self.table.delete()
+        self.components[0].restore()
+        self.assertFalse(RationTableComponent.objects.exists())
+
+        self.table.restore()
+        self.assertEqual(RationTableComponent.objects.count(), 6)
+
+    def test_bulk_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        ids = [row.pk for row in self.rows[:3]]
+
+        response = client.post("/api/ration-table-components/bulk-delete/", {"ids": ids}, format="json")
+        self.assertEqual(response.data, {"deleted": 3})
+        response = client.post("/api/ration-table-components/bulk-restore/", {"ids": ids + [0]}, format="json")
+        self.assertEqual(response.data, {"restored": 3})
+
+        response = client.post("/api/ration-tables/bulk-delete/", {"ids": "all"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reference': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reference-tests'},
+})
+class ReferenceCacheTestCase(TestCase):
+    """Test cases for the read-through reference cache."""
+
+    def setUp(self):
+        caches['reference'].clear()
+        for cache in reference_caches().values():
+            cache.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.barley = RationComponent.objects.create(
+                name="Barley", dry_matter=88.0, calori=12.0, nisasta=55.0, price=10.00,
+            )
+            self.table = RationTable.objects.create(name="Finisher")
+            RationTableComponent.objects.create(ration_table=self.table, component=self.barley, quantity=4.0)
+
+    def test_list_is_served_from_the_local_tier_until_invalidated(self):
+        self.client.get("/api/ration-components/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/ration-components/")
+        self.assertFalse(any("ration_components_rationcomponent" in query["sql"] for query in queries))
+        self.assertEqual(response.data[0]["price"], "10.00")
+        self.assertEqual(component_cache.stats()["local_hits"], 2)  # The list and its validators
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.barley.price = 12.00
+            self.barley.save()
+        response = self.client.get("/api/ration-components/")
+        self.assertEqual(response.data[0]["price"], "12.00")
+
+        # Another process only has the shared tier
+        component_cache.local.clear()
+        self.client.get("/api/ration-components/")
+        self.assertEqual(component_cache.stats()["shared_hits"], 2)
+
+    def test_feed_cost_totals_are_cached_and_invalidated(self):
+        self.assertEqual(ration_table_totals([self.table.pk])[self.table.pk][0], Decimal("40.00"))
+        with self.assertNumQueries(0):
+            ration_table_totals([self.table.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RationComponent.all_objects.filter(pk=self.barley.pk).soft_delete()
+        self.assertEqual(ration_table_totals([self.table.pk])[self.table.pk][0], Decimal("0"))
+
+    def test_uncommitted_changes_are_not_cached(self):
+        with self.captureOnCommitCallbacks():
+            self.barley.price = 15.00
+            self.barley.save()
+            self.assertEqual(ration_table_totals([self.table.pk])[self.table.pk][0], Decimal("60.00"))
+        self.assertEqual(ration_table_cache.stats()["bypasses"], 1)
+        self.assertEqual(len(caches['reference'].get_many(
+            [f"ration_tables:{ration_table_cache.version()}:totals:{self.table.pk}"]
+        )), 0)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'reference': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:1/0'},
+    })
+    def test_unreachable_shared_cache_falls_back_to_the_database(self):
+        with self.assertLogs("AR_Soft.cache", "WARNING"):
+            response = self.client.get("/api/ration-tables/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ration_table_cache.stats()["errors"], 1)
+        self.assertEqual(self.client.get("/api/cache/stats/").data["ration_tables"]["errors"], 1)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reference': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'conditional-tests'},
+})
+class ConditionalGetTestCase(TestCase):
+    """Test cases for ETag/Last-Modified validation of the polled endpoints."""
+
+    def setUp(self):
+        caches['reference'].clear()
+        for cache in reference_caches().values():
+            cache.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.barley = RationComponent.objects.create(
+                name="Barley", dry_matter=88.0, calori=12.0, nisasta=55.0, price=10.00,
+            )
+            self.table = RationTable.objects.create(name="Finisher")
+            RationTableComponent.objects.create(ration_table=self.table, component=self.barley, quantity=4.0)
+
+    def test_unchanged_list_returns_304_without_loading_rows(self):
+        response = self.client.get("/api/ration-components/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get("/api/ration-components/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+        # Lists with query parameters are validated with one aggregate query
+        filtered = self.client.get("/api/ration-components/?format=json")
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get("/api/ration-components/?format=json", HTTP_IF_NONE_MATCH=filtered["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+        not_modified = self.client.get("/api/ration-components/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changes_and_removals_change_the_etag(self):
+        components_etag = self.client.get("/api/ration-components/")["ETag"]
+        tables_etag = self.client.get("/api/ration-tables/")["ETag"]
+
+        self.barley.price = 11.00
+        self.barley.save()
+        response = self.client.get("/api/ration-tables/", HTTP_IF_NONE_MATCH=tables_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[-1]["cost"], Decimal("44.00"))
+
+        RationComponent.objects.create(name="Silage", dry_matter=35.0, calori=6.0, nisasta=25.0, price=2.00)
+        etag = self.client.get("/api/ration-components/")["ETag"]
+        self.assertNotEqual(etag, components_etag)
+
+        RationComponent.all_objects.filter(name="Silage").soft_delete()
+        response = self.client.get("/api/ration-components/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_compute_cost_carries_validators(self):
+        url = f"/api/ration-tables/{self.table.pk}/compute-cost/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.barley.price = 12.00
+        self.barley.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cost"], Decimal("48.00"))
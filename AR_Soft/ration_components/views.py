@@ -13,12 +13,53 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
+from rest_framework.parsers import JSONParser
+from django.utils.dateparse import parse_date, parse_datetime
+from AR_Soft.cache import CachedListMixin
+from AR_Soft.conditional import ConditionalListMixin, conditional_response, make_etag
+from AR_Soft.optimizer import OptimizedQuerysetMixin
+from AR_Soft.parsers import CSVParser
+from ration_logs.as_of import end_of, ration_table_as_of
+from .bulk import bulk_update_components
+from .cache import component_cache, ration_table_cache
 from .models import RationTableComponent
 from .serializers import RationTableComponentSerializer
 
-class RationComponentViewSet(viewsets.ModelViewSet):
+
+class BulkSoftDeleteMixin:
+    """
+    ``bulk-delete/`` and ``bulk-restore/`` actions taking ``{"ids": [...]}``.
+    Both run as a handful of set-based UPDATEs, cascading to the table
+    components, with the audit rows written in bulk.
+    """
+
+    def get_bulk_ids(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return None
+        return ids
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        ids = self.get_bulk_ids(request)
+        if ids is None:
+            return Response({"error": "'ids' must be a list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+        deleted = self.get_queryset().model.all_objects.filter(pk__in=ids).soft_delete()
+        return Response({"deleted": deleted}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-restore')
+    def bulk_restore(self, request):
+        ids = self.get_bulk_ids(request)
+        if ids is None:
+            return Response({"error": "'ids' must be a list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+        restored = self.get_queryset().model.all_objects.filter(pk__in=ids).restore()
+        return Response({"restored": restored}, status=status.HTTP_200_OK)
+
+
+class RationComponentViewSet(OptimizedQuerysetMixin, ConditionalListMixin, CachedListMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     queryset = RationComponent.objects.all()  # Default to ActiveManager
     serializer_class = RationComponentSerializer
+    list_cache = component_cache
 
     def get_queryset(self):
         # Return only active records
@@ -39,6 +80,22 @@ class RationComponentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(soft_deleted_components, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='bulk-update', parser_classes=[JSONParser, CSVParser])
+    def bulk_update(self, request):
+        """
+        Update the price/nutrients of many components at once, from a JSON
+        list or a CSV upload with an ``id`` or ``name`` column. Every change
+        is written to the component change log and the affected ration table
+        totals are refreshed once. Returns a per-row report.
+        """
+        rows = request.data.get('components') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a list of component updates."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report = bulk_update_components(rows)
+        return Response(report, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='restore')
     def restore(self, request, pk=None):
         """
@@ -62,9 +119,11 @@ class RationComponentViewSet(viewsets.ModelViewSet):
             return Response({'status': 'hard deleted'}, status=status.HTTP_204_NO_CONTENT)
         return Response({'status': 'not soft deleted'}, status=status.HTTP_400_BAD_REQUEST)
 
-class RationTableViewSet(viewsets.ModelViewSet):
+class RationTableViewSet(OptimizedQuerysetMixin, ConditionalListMixin, CachedListMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     queryset = RationTable.objects.all()
     serializer_class = RationTableSerializer
+    list_cache = ration_table_cache
+    last_modified_fields = ('updated_at', 'aggregate__updated_at')  # Totals change with component prices
 
     def get_queryset(self):
         # Return only active records
@@ -72,8 +131,8 @@ class RationTableViewSet(viewsets.ModelViewSet):
     
     def get_object(self):
         # Use all_objects for actions that require access to soft-deleted records
-        if self.action in ['restore', 'hard_delete']:
-            return RationTable.all_objects.get(pk=self.kwargs['pk'])
+        if self.action in ['restore', 'hard_delete', 'as_of']:
+            return get_object_or_404(RationTable.all_objects, pk=self.kwargs['pk'])
         return super().get_object()
 
     @action(detail=False, methods=['get'], url_path='soft-deleted')
@@ -81,10 +140,30 @@ class RationTableViewSet(viewsets.ModelViewSet):
         """
         Get a list of all soft-deleted RationTables.
         """
-        soft_deleted_tables = RationTable.all_objects.filter(deleted_at__isnull=False)
+        soft_deleted_tables = RationTable.all_objects.filter(deleted_at__isnull=False).select_related('aggregate')
         serializer = self.get_serializer(soft_deleted_tables, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='as-of')
+    def as_of(self, request, pk=None):
+        """
+        The table as it was at ``?at=`` (a datetime, or a date for the end of
+        that day): its components with their quantities and prices then, and
+        the totals they added up to.
+        """
+        value = request.query_params.get('at', '')
+        try:
+            day = parse_date(value)
+            at = end_of(day) if day else parse_datetime(value)
+        except ValueError:
+            at = None
+        if at is None:
+            return Response({"error": "'at' must be a date (YYYY-MM-DD) or an ISO 8601 datetime."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return Response(ration_table_as_of(self.get_object(), at))
+
     @action(detail=True, methods=['post'], url_path='restore')
     def restore(self, request, pk=None):
         """
@@ -111,12 +190,19 @@ class RationTableViewSet(viewsets.ModelViewSet):
     def compute_cost(self, request, pk=None):
         """
         Recalculate and return the cost of a specific RationTable.
+        The materialized totals are refreshed on every change to the table's
+        components, so their timestamp validates a conditional GET.
         """
         ration_table = self.get_object()
-        cost = ration_table.compute_cost()
-        return Response({'id': ration_table.id, 'name': ration_table.name, 'cost': cost})
+        last_modified = max(ration_table.updated_at, ration_table.get_aggregate().updated_at)
+        etag = make_etag('compute-cost', ration_table.pk, last_modified)
+
+        def build():
+            cost = ration_table.compute_cost()
+            return Response({'id': ration_table.id, 'name': ration_table.name, 'cost': cost})
+        return conditional_response(request, etag, last_modified, build)
 
-class RationTableComponentViewSet(viewsets.ModelViewSet):
+class RationTableComponentViewSet(OptimizedQuerysetMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing RationTableComponent instances.
     """
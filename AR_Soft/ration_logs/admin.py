@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ComponentChangeLog, RationTableLog, RationTableComponentLog
+from .models import ComponentChangeLog, RationTableLog, RationTableComponentLog, RationTableSnapshot
 
 @admin.register(ComponentChangeLog)
 class ComponentChangeLogAdmin(admin.ModelAdmin):
@@ -12,3 +12,7 @@ class RationTableLogAdmin(admin.ModelAdmin):
 @admin.register(RationTableComponentLog)
 class RationTableComponentLogAdmin(admin.ModelAdmin):
     list_display = ('table_component', 'action', 'old_quantity', 'new_quantity', 'changed_at')
+
+@admin.register(RationTableSnapshot)
+class RationTableSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('ration_table', 'taken_at', 'deleted')
@@ -0,0 +1,257 @@
+"""
+Point-in-time ("as of") reconstruction of ration tables from the change logs.
+
+The value a logged quantity had at ``at`` is the new value of the last log
+at or before ``at``, or else the old value of the first log after it, or
+else its current value. Each of those is a correlated subquery that the
+``(component, field_name, changed_at)`` and ``(table_component, changed_at)``
+indexes turn into a single index seek, so a lookup costs a constant number
+of queries whatever the length of the history.
+
+``RationTableSnapshot`` rows, written periodically by
+``take_snapshots``, bound the backward seeks: with a snapshot taken at or
+before ``at`` only the logs written since it are consulted, and it keeps
+the state of rows whose logs were removed by a hard delete.
+"""
+import logging
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import is_naive, make_aware, now
+
+from ration_components.models import RationComponent, RationTable, RationTableComponent
+from .models import ComponentChangeLog, RationTableComponentLog, RationTableLog, RationTableSnapshot
+
+logger = logging.getLogger(__name__)
+
+COMPONENT_FIELDS = ('price', 'dry_matter', 'calori', 'nisasta')
+MEMBERSHIP_ACTIONS = ('Created', 'Soft Deleted', 'Restored')
+TOTAL_FIELDS = ('cost', 'dry_matter', 'calori', 'nisasta')
+
+
+def end_of(day):
+    """The last instant of ``day``, so a date asks for the state at the end of it."""
+    moment = datetime.combine(day, time.max)
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def seek(logs, value, at, since=None, after=False):
+    """
+    Subquery of ``value`` on the last of ``logs`` at or before ``at`` (and
+    after ``since``), or on the first one after ``at``.
+    """
+    if after:
+        logs = logs.filter(changed_at__gt=at).order_by('changed_at', 'id')
+    else:
+        logs = logs.filter(changed_at__lte=at).order_by('-changed_at', '-id')
+        if since is not None:
+            logs = logs.filter(changed_at__gt=since)
+    return Subquery(logs.annotate(logged=value).values('logged')[:1])
+
+
+def logged_text(field):
+    """A logged NULL reads as '' so it can be told apart from "no log" (None)."""
+    return Coalesce(F(field), Value(''), output_field=TextField())
+
+
+def first_known(*values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def to_decimal(value):
+    return None if value in (None, '', 'None') else Decimal(str(value))
+
+
+def latest_snapshot(ration_table_id, at):
+    return (RationTableSnapshot.objects
+            .filter(ration_table_id=ration_table_id, taken_at__lte=at)
+            .order_by('-taken_at')
+            .first())
+
+
+def table_component_states(ration_table_id, at, snapshot=None):
+    """
+    ``{table_component_id: {"component": id, "quantity": Decimal, "active": bool}}``
+    of every row the table held at ``at``, active or not.
+    """
+    since = snapshot.taken_at if snapshot else None
+    baseline = {row['id']: row for row in snapshot.state['table_components']} if snapshot else {}
+
+    logs = RationTableComponentLog.objects.filter(table_component=OuterRef('pk'))
+    membership = logs.filter(action__in=MEMBERSHIP_ACTIONS)
+    rows = (RationTableComponent.all_objects
+            .filter(Q(ration_table_id=ration_table_id) | Q(pk__in=list(baseline)))
+            .values('id', 'component_id', 'quantity', 'deleted_at',
+                    quantity_before=seek(logs.filter(new_quantity__isnull=False), F('new_quantity'), at, since),
+                    quantity_after=seek(logs.filter(old_quantity__isnull=False), F('old_quantity'), at, after=True),
+                    action_before=seek(membership, F('action'), at, since),
+                    action_after=seek(membership, F('action'), at, after=True)))
+
+    states = {
+        pk: {"component": row['component'], "quantity": to_decimal(row['quantity']), "active": row['active']}
+        for pk, row in baseline.items()
+    }
+    for row in rows:
+        base = baseline.get(row['id'])
+        if row['action_before'] is not None:
+            active = row['action_before'] != 'Soft Deleted'
+        elif base is not None:
+            active = base['active']
+        elif row['action_after'] is not None:
+            # Created later, or Restored later: not on the table yet
+            active = row['action_after'] == 'Soft Deleted'
+        else:
+            active = row['deleted_at'] is None or row['deleted_at'] > at
+
+        quantity = first_known(row['quantity_before'], base and to_decimal(base['quantity']),
+                               row['quantity_after'], row['quantity'])
+        states[row['id']] = {"component": row['component_id'], "quantity": quantity, "active": active}
+    return states
+
+
+def component_states(component_ids, at, snapshot=None):
+    """
+    ``{component_id: {"name", "price", "dry_matter", "calori", "nisasta", "deleted"}}``
+    as of ``at``. Components created after ``at`` are left out.
+    """
+    since = snapshot.taken_at if snapshot else None
+    baseline = {row['id']: row for row in snapshot.state['components']} if snapshot else {}
+
+    annotations = {}
+    for field in COMPONENT_FIELDS + ('deleted_at',):
+        logs = ComponentChangeLog.objects.filter(component=OuterRef('pk'), field_name=field)
+        annotations[f'{field}_before'] = seek(logs, logged_text('new_value'), at, since)
+        annotations[f'{field}_after'] = seek(logs, logged_text('old_value'), at, after=True)
+    rows = (RationComponent.all_objects
+            .filter(pk__in=component_ids)
+            .values('id', 'name', *COMPONENT_FIELDS, 'deleted_at', **annotations))
+
+    # Components hard deleted since the snapshot are only known from it
+    states = {
+        pk: {**row, **{field: to_decimal(row[field]) for field in COMPONENT_FIELDS}}
+        for pk, row in baseline.items() if pk in component_ids
+    }
+    for row in rows:
+        base = baseline.get(row['id'], {})
+        state = {"id": row['id'], "name": row['name']}
+        for field in COMPONENT_FIELDS:
+            before, after = row[f'{field}_before'], row[f'{field}_after']
+            if before is not None:
+                state[field] = to_decimal(before)
+            elif field in base:
+                state[field] = to_decimal(base[field])
+            elif after is not None:
+                state[field] = to_decimal(after)  # '' on a creation log: the component did not exist yet
+            else:
+                state[field] = row[field]
+
+        before, after = row['deleted_at_before'], row['deleted_at_after']
+        if before is not None:
+            state['deleted'] = before != ''
+        elif 'deleted' in base:
+            state['deleted'] = base['deleted']
+        elif after is not None:
+            state['deleted'] = after != ''
+        else:
+            state['deleted'] = row['deleted_at'] is not None and row['deleted_at'] <= at
+
+        if state['price'] is not None:
+            states[row['id']] = state
+    return states
+
+
+def table_deleted(ration_table, at, snapshot=None):
+    """Whether the table itself was soft deleted at ``at``."""
+    logs = RationTableLog.objects.filter(ration_table=ration_table, action__in=('Soft Deleted', 'Restored'))
+    if snapshot is not None:
+        logs = logs.filter(changed_at__gt=snapshot.taken_at)
+    last = logs.filter(changed_at__lte=at).order_by('-changed_at', '-id').values_list('action', flat=True).first()
+    if last is not None:
+        return last == 'Soft Deleted'
+    if snapshot is not None:
+        return snapshot.deleted
+    return ration_table.deleted_at is not None and ration_table.deleted_at <= at
+
+
+def ration_table_as_of(ration_table, at):
+    """
+    Reconstruct ``ration_table`` as it was at ``at``: its active components
+    with their quantities, prices and nutrients, and the totals computed the
+    way ``RationTableAggregate`` computes them.
+    """
+    snapshot = latest_snapshot(ration_table.pk, at)
+    rows = table_component_states(ration_table.pk, at, snapshot)
+    components = component_states({row['component'] for row in rows.values() if row['active']}, at, snapshot)
+
+    totals = dict.fromkeys(TOTAL_FIELDS, Decimal(0))
+    lines = []
+    for table_component_id, row in sorted(rows.items()):
+        component = components.get(row['component'])
+        if not row['active'] or component is None or component['deleted'] or row['quantity'] is None:
+            continue
+        quantity = row['quantity']
+        line = {
+            "table_component": table_component_id,
+            "component": component['id'],
+            "name": component['name'],
+            "quantity": quantity,
+            **{field: component[field] for field in COMPONENT_FIELDS},
+            "cost": quantity * component['price'],
+        }
+        lines.append(line)
+        totals['cost'] += line['cost']
+        for field in ('dry_matter', 'calori', 'nisasta'):
+            totals[field] += (component[field] or Decimal(0)) * quantity
+
+    return {
+        "ration_table": ration_table.pk,
+        "name": ration_table.name,
+        "as_of": at,
+        "deleted": table_deleted(ration_table, at, snapshot),
+        "snapshot_taken_at": snapshot.taken_at if snapshot else None,
+        "components": lines,
+        **totals,
+    }
+
+
+def take_snapshots(taken_at=None):
+    """Write the current state of every ration table, in a constant number of queries."""
+    taken_at = taken_at or now()
+    components = {
+        row['id']: {
+            "id": row['id'], "name": row['name'], **{field: row[field] for field in COMPONENT_FIELDS},
+            "deleted": row['deleted_at'] is not None,
+        }
+        for row in RationComponent.all_objects.values('id', 'name', *COMPONENT_FIELDS, 'deleted_at')
+    }
+
+    rows = {}
+    for pk, ration_table_id, component_id, quantity, deleted_at in (
+            RationTableComponent.all_objects
+            .order_by('pk')
+            .values_list('id', 'ration_table_id', 'component_id', 'quantity', 'deleted_at')):
+        rows.setdefault(ration_table_id, []).append(
+            {"id": pk, "component": component_id, "quantity": quantity, "active": deleted_at is None}
+        )
+
+    snapshots = []
+    for ration_table_id, deleted_at in RationTable.all_objects.order_by('pk').values_list('id', 'deleted_at'):
+        table_rows = rows.get(ration_table_id, [])
+        used = {row['component'] for row in table_rows}
+        snapshots.append(RationTableSnapshot(
+            ration_table_id=ration_table_id,
+            taken_at=taken_at,
+            deleted=deleted_at is not None,
+            state={
+                "table_components": table_rows,
+                "components": [components[pk] for pk in sorted(used) if pk in components],
+            },
+        ))
+    RationTableSnapshot.objects.bulk_create(snapshots, batch_size=500)
+    logger.info("Took %d ration table snapshots.", len(snapshots))
+    return snapshots
@@ -0,0 +1,152 @@
+"""
+Buffered audit logging for the ration models.
+
+Receivers diff a saved instance against the snapshot taken when it was
+loaded (``post_init``), saved or refreshed from the database, so no SELECT
+is needed to find the old values, and
+hand the resulting log rows to ``record``. Rows are buffered per transaction
+and written when it commits: one ``bulk_create`` per log model, or a single
+Celery task when ``AUDIT_LOG_ASYNC`` is enabled. Rows recorded inside a
+savepoint that is rolled back are discarded with it.
+"""
+import json
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from AR_Soft.transactions import OnCommitBatch
+
+logger = logging.getLogger(__name__)
+
+
+def database_value(field, value):
+    """
+    ``value`` as the database hands it back for ``field``: through
+    ``to_python``, with decimals at the field's scale, so an instance built
+    in memory with ``price=100.0`` compares and formats as ``100.00``.
+    """
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        return value  # Left for the save to reject
+    if isinstance(value, Decimal) and getattr(field, 'decimal_places', None) is not None:
+        value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+    return value
+
+
+def value_of(instance, name):
+    """The normalized value of the field (or attname) ``name`` of ``instance``."""
+    return database_value(instance._meta.get_field(name), getattr(instance, name))
+
+
+def take_snapshot(instance, fields):
+    """Remember the loaded values of ``fields``; deferred fields are left out."""
+    instance._audit_snapshot = {
+        field: database_value(instance._meta.get_field(field), instance.__dict__[field])
+        for field in fields if field in instance.__dict__
+    }
+
+
+def update_snapshot(instance, fields, names):
+    """
+    Remember the current values of the ``fields`` among ``names`` (field
+    names or attnames), keeping the rest of the snapshot as it was: the
+    other fields may hold changes that are not saved yet.
+    """
+    snapshot = getattr(instance, '_audit_snapshot', {})
+    attnames = {instance._meta.get_field(name).attname for name in names}
+    snapshot.update({
+        field: value_of(instance, field)
+        for field in fields if field in attnames and field in instance.__dict__
+    })
+    instance._audit_snapshot = snapshot
+
+
+def previous_values(sender, instance, fields):
+    """
+    The values ``fields`` have in the database before this save, or None for
+    a new row. Read from the load-time snapshot; only an instance built by
+    hand for an existing pk, or one with deferred fields, costs a SELECT.
+    """
+    snapshot = getattr(instance, '_audit_snapshot', {})
+    if not instance._state.adding and all(field in snapshot for field in fields):
+        return snapshot
+    if instance.pk is None:
+        return None
+    return sender.all_objects.filter(pk=instance.pk).values(*fields).first()
+
+
+class AuditBuffer(OnCommitBatch):
+    """
+    Log rows waiting for their transaction to commit, grouped by log model.
+    One buffer per savepoint, so rolling a savepoint back discards its rows.
+    """
+    savepoint_scoped = True
+
+    def __init__(self, using=None, key=None):
+        super().__init__(using, key)
+        self.rows = defaultdict(list)
+
+    def add(self, entries):
+        for entry in entries:
+            self.rows[type(entry)].append(entry)
+
+    def run(self):
+        flush(self.rows, self.using)
+
+
+def record(*entries, using=DEFAULT_DB_ALIAS):
+    """
+    Queue unsaved log model instances. Outside a transaction they are
+    written right away, still with one insert per log model.
+    """
+    if not entries:
+        return
+    if transaction.get_connection(using).in_atomic_block:
+        AuditBuffer.current(using).add(entries)
+    else:
+        buffer = AuditBuffer(using)
+        buffer.add(entries)
+        buffer()
+
+
+def serialize_rows(rows):
+    """``{model label: [field values]}`` in plain JSON types, for the Celery payload."""
+    payload = {
+        model._meta.label: [
+            {field.attname: getattr(row, field.attname)
+             for field in model._meta.concrete_fields if not field.primary_key}
+            for row in model_rows
+        ]
+        for model, model_rows in rows.items()
+    }
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def write_rows(payload, using=DEFAULT_DB_ALIAS):
+    """Insert a serialized payload, one ``bulk_create`` per log model."""
+    written = 0
+    for label, model_rows in payload.items():
+        model = apps.get_model(label)
+        model.objects.using(using).bulk_create([model(**values) for values in model_rows])
+        written += len(model_rows)
+    return written
+
+
+def flush(rows, using=DEFAULT_DB_ALIAS):
+    if not rows:
+        return
+    if getattr(settings, 'AUDIT_LOG_ASYNC', False):
+        from .tasks import write_audit_logs
+        write_audit_logs.delay(serialize_rows(rows), using)
+        return
+
+    for model, model_rows in rows.items():
+        model.objects.using(using).bulk_create(model_rows)
+        logger.debug("Wrote %d %s rows.", len(model_rows), model.__name__)
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_logs', '0002_alter_componentchangelog_changed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='componentchangelog',
+            index=models.Index(fields=['-changed_at', 'id'], name='component_log_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablecomponentlog',
+            index=models.Index(fields=['-changed_at', 'id'], name='tc_log_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablelog',
+            index=models.Index(fields=['-changed_at', 'id'], name='table_log_changed_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_logs', '0003_componentchangelog_component_log_changed_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='componentchangelog',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
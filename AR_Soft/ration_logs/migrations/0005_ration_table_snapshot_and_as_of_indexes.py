@@ -0,0 +1,43 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:17
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ration_components', '0017_rationtableaggregate'),
+        ('ration_logs', '0004_alter_componentchangelog_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RationTableSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('deleted', models.BooleanField(default=False)),
+                ('state', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='componentchangelog',
+            index=models.Index(fields=['component', 'field_name', 'changed_at'], name='component_log_as_of_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablecomponentlog',
+            index=models.Index(fields=['table_component', 'changed_at'], name='tc_log_as_of_idx'),
+        ),
+        migrations.AddField(
+            model_name='rationtablesnapshot',
+            name='ration_table',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='ration_components.rationtable'),
+        ),
+        migrations.AddIndex(
+            model_name='rationtablesnapshot',
+            index=models.Index(fields=['ration_table', '-taken_at'], name='table_snapshot_taken_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.timezone import now
 
@@ -11,7 +12,13 @@ class ComponentChangeLog(models.Model):
     field_name = models.CharField(max_length=50)  # E.g., 'price', 'calorie', 'deleted_at'
     old_value = models.TextField(null=True, blank=True)  # Use TextField for mixed data types
     new_value = models.TextField(null=True, blank=True)
-    changed_at = models.DateTimeField(auto_now_add=True)
+    changed_at = models.DateTimeField(default=now)  # Set when the change is captured, not when the buffered row is written
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-changed_at', 'id'], name='component_log_changed_idx'),  # Keyset pagination
+            models.Index(fields=['component', 'field_name', 'changed_at'], name='component_log_as_of_idx'),  # As-of seeks
+        ]
 
     def __str__(self):
         return f"Change in {self.component.name} ({self.field_name})"
@@ -27,6 +34,11 @@ class RationTableLog(models.Model):
     description = models.TextField(null=True, blank=True)
     changed_at = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-changed_at', 'id'], name='table_log_changed_idx'),  # Keyset pagination
+        ]
+
     def __str__(self):
         return f"{self.action} - {self.ration_table.name}"
 
@@ -42,5 +54,32 @@ class RationTableComponentLog(models.Model):
     new_quantity = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     changed_at = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-changed_at', 'id'], name='tc_log_changed_idx'),  # Keyset pagination
+            models.Index(fields=['table_component', 'changed_at'], name='tc_log_as_of_idx'),  # As-of seeks
+        ]
+
     def __str__(self):
         return f"{self.action} - {self.table_component}"
+
+
+# Periodic full state of a RationTable, the baseline of as-of lookups
+class RationTableSnapshot(models.Model):
+    ration_table = models.ForeignKey(
+        'ration_components.RationTable',
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    taken_at = models.DateTimeField(default=now)
+    deleted = models.BooleanField(default=False)
+    # {"table_components": [{id, component, quantity, active}], "components": [{id, name, price, ..., deleted}]}
+    state = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ration_table', '-taken_at'], name='table_snapshot_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot of {self.ration_table_id} at {self.taken_at}"
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from AR_Soft.fieldsets import SparseFieldsetMixin
 from .models import ComponentChangeLog, RationTableLog, RationTableComponentLog
 
 # Serializer for ComponentChangeLog
-class ComponentChangeLogSerializer(serializers.ModelSerializer):
+class ComponentChangeLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     component_name = serializers.CharField(source='component.name', read_only=True)
 
     class Meta:
@@ -10,7 +11,7 @@ class ComponentChangeLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'component', 'component_name', 'field_name', 'old_value', 'new_value', 'changed_at']
 
 # Serializer for RationTableLog
-class RationTableLogSerializer(serializers.ModelSerializer):
+class RationTableLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     ration_table_name = serializers.CharField(source='ration_table.name', read_only=True)
 
     class Meta:
@@ -18,7 +19,7 @@ class RationTableLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'ration_table', 'ration_table_name', 'action', 'description', 'changed_at']
 
 # Serializer for RationTableComponentLog
-class RationTableComponentLogSerializer(serializers.ModelSerializer):
+class RationTableComponentLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     table_component_name = serializers.CharField(source='table_component.component.name', read_only=True)
     ration_table_name = serializers.CharField(source='table_component.ration_table.name', read_only=True)
 
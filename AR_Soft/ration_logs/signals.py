@@ -1,143 +1,244 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_init, post_save, pre_save, post_delete
 from django.dispatch import receiver
-from ration_components.models import RationComponent, RationTable, RationTableComponent
+from ration_components.models import RationComponent, RationTable, RationTableComponent, RationTableAggregate
+from ration_components.signals import refreshed, restored, soft_deleted
+from ration_logs.audit import previous_values, record, take_snapshot, update_snapshot, value_of
 from ration_logs.models import ComponentChangeLog, RationTableLog, RationTableComponentLog
 from django.utils.timezone import now
 
+COMPONENT_TRACKED_FIELDS = ['price', 'dry_matter', 'calori', 'nisasta']
+
+# Fields whose loaded values are remembered so saves can be diffed without a SELECT
+AUDITED_FIELDS = {
+    RationComponent: COMPONENT_TRACKED_FIELDS + ['deleted_at'],
+    RationTable: ['deleted_at'],
+    RationTableComponent: ['ration_table_id', 'component_id', 'quantity', 'deleted_at'],
+}
 
-def fetch_old_instance(sender, instance):
-    """
-    Fetch the old instance of a model using the `all_objects` manager.
-    Return None if `all_objects` is not defined or the instance does not exist.
-    """
-    try:
-        return sender.all_objects.filter(pk=instance.pk).first()
-    except AttributeError:
-        print(f"[WARNING] Model {sender.__name__} does not have 'all_objects' manager.")
-        return None
+
+@receiver(post_init, sender=RationComponent)
+@receiver(post_init, sender=RationTable)
+@receiver(post_init, sender=RationTableComponent)
+def snapshot_audited_fields(sender, instance, **kwargs):
+    take_snapshot(instance, AUDITED_FIELDS[sender])
 
 
 # Signal for RationComponent updates
 @receiver(pre_save, sender=RationComponent)
 def log_component_update(sender, instance, **kwargs):
-    old_instance = fetch_old_instance(sender, instance)
-    if not old_instance:
-        print(f"No old instance found; skipping update logging for {instance.name}.")
+    old = previous_values(sender, instance, AUDITED_FIELDS[sender])
+    if not old:
         return
 
-    print(f"Checking for updates to fields in component {instance.name}")
-    tracked_fields = ['price', 'dry_matter', 'calori', 'nisasta']
-    for field in tracked_fields:
-        old_value = getattr(old_instance, field, None)
-        new_value = getattr(instance, field, None)
+    changed_at = now()
+    entries = []
+    for field in COMPONENT_TRACKED_FIELDS:
+        old_value = old[field]
+        new_value = value_of(instance, field)
         if old_value != new_value:
-            print(f"Field '{field}' changed: {old_value} -> {new_value}")
-            ComponentChangeLog.objects.create(
+            instance._refresh_aggregates = True
+            entries.append(ComponentChangeLog(
                 component=instance,
                 field_name=field,
                 old_value=old_value,
                 new_value=new_value,
-            )
+                changed_at=changed_at,
+            ))
 
     # Detect soft delete or restore
-    if old_instance.deleted_at != instance.deleted_at:
-        action = "Soft Deleted" if instance.deleted_at else "Restored"
-        print(f"{action}: {instance.name}")
-        ComponentChangeLog.objects.create(
+    if old['deleted_at'] != instance.deleted_at:
+        entries.append(ComponentChangeLog(
             component=instance,
             field_name="deleted_at",
-            old_value=str(old_instance.deleted_at) if old_instance.deleted_at else None,
+            old_value=str(old['deleted_at']) if old['deleted_at'] else None,
             new_value=str(instance.deleted_at) if instance.deleted_at else None,
-            changed_at=now(),
-        )
+            changed_at=changed_at,
+        ))
+    record(*entries, using=kwargs.get('using'))
 
 
 # Signal for RationComponent creation
 @receiver(post_save, sender=RationComponent)
 def log_component_creation(sender, instance, created, **kwargs):
     if created:
-        print(f"Component created: {instance.name}")
-        tracked_fields = ['price', 'dry_matter', 'calori', 'nisasta']
-        for field in tracked_fields:
-            base_value = getattr(instance, field, None)
-            ComponentChangeLog.objects.create(
+        changed_at = now()
+        record(*[
+            ComponentChangeLog(
                 component=instance,
                 field_name=field,
                 old_value=None,
-                new_value=base_value,
+                new_value=value_of(instance, field),
+                changed_at=changed_at,
             )
+            for field in COMPONENT_TRACKED_FIELDS
+        ], using=kwargs.get('using'))
+
+
+# Signal for refreshing ration table totals after a price/nutrient change
+@receiver(post_save, sender=RationComponent)
+def refresh_component_aggregates(sender, instance, **kwargs):
+    if getattr(instance, '_refresh_aggregates', False):
+        instance._refresh_aggregates = False
+        RationTableAggregate.refresh_for(instance)
 
 
 # Signal for RationTable creation and updates
 @receiver(post_save, sender=RationTable)
 def log_ration_table_creation_or_update(sender, instance, created, **kwargs):
     action = "Created" if created else "Updated"
-    print(f"RationTable {action}: {instance.name}")
-    RationTableLog.objects.create(
+    record(RationTableLog(
         ration_table=instance,
         action=action,
         description=f"RationTable {action.lower()}d.",
         changed_at=now(),
-    )
+    ), using=kwargs.get('using'))
+    if created:
+        RationTableAggregate.refresh_for(instance)
 
 
 # Signal for RationTable soft delete or restore
 @receiver(pre_save, sender=RationTable)
 def log_ration_table_soft_delete_restore(sender, instance, **kwargs):
-    old_instance = fetch_old_instance(sender, instance)
-    if not old_instance:
+    old = previous_values(sender, instance, AUDITED_FIELDS[sender])
+    if not old:
         return
 
-    if old_instance.deleted_at != instance.deleted_at:
+    if old['deleted_at'] != instance.deleted_at:
         action = "Soft Deleted" if instance.deleted_at else "Restored"
-        print(f"{action} RationTable: {instance.name}")
-        RationTableLog.objects.create(
+        record(RationTableLog(
             ration_table=instance,
             action=action,
             description=f"RationTable {action.lower()}.",
             changed_at=now(),
-        )
+        ), using=kwargs.get('using'))
 
 
 # Signal for RationTableComponent creation
 @receiver(post_save, sender=RationTableComponent)
 def log_table_component_creation(sender, instance, created, **kwargs):
     if created:
-        print(f"RationTableComponent created: {instance.component.name} in {instance.ration_table.name}")
-        RationTableComponentLog.objects.create(
+        record(RationTableComponentLog(
             table_component=instance,
             action="Created",
             new_quantity=instance.quantity,
-        )
+            changed_at=now(),
+        ), using=kwargs.get('using'))
 
 
 # Signal for RationTableComponent updates
 @receiver(pre_save, sender=RationTableComponent)
 def log_table_component_update(sender, instance, **kwargs):
-    old_instance = fetch_old_instance(sender, instance)
-    if not old_instance:
+    old = previous_values(sender, instance, AUDITED_FIELDS[sender])
+    if not old:
         return
 
-    if old_instance.quantity != instance.quantity:
-        print(f"RationTableComponent updated: {instance.component.name} in {instance.ration_table.name}")
-        RationTableComponentLog.objects.create(
+    # Moving the row to another table or component changes both tables' totals
+    if (old['ration_table_id'], old['component_id']) != (instance.ration_table_id, instance.component_id):
+        instance._refresh_aggregates = True
+        instance._previous_ration_table_id = old['ration_table_id']
+
+    changed_at = now()
+    entries = []
+    if old['quantity'] != instance.quantity:
+        instance._refresh_aggregates = True
+        entries.append(RationTableComponentLog(
             table_component=instance,
             action="Updated",
-            old_quantity=old_instance.quantity,
+            old_quantity=old['quantity'],
             new_quantity=instance.quantity,
-        )
+            changed_at=changed_at,
+        ))
 
     # Detect soft delete or restore
-    if old_instance.deleted_at != instance.deleted_at:
+    if old['deleted_at'] != instance.deleted_at:
         action = "Soft Deleted" if instance.deleted_at else "Restored"
-        print(f"{action} RationTableComponent: {instance.component.name}")
-        RationTableComponentLog.objects.create(
+        instance._refresh_aggregates = True
+        entries.append(RationTableComponentLog(
             table_component=instance,
             action=action,
             old_quantity=None if action == "Soft Deleted" else instance.quantity,
             new_quantity=None if action == "Soft Deleted" else instance.quantity,
-            changed_at=now(),
-        )
+            changed_at=changed_at,
+        ))
+    record(*entries, using=kwargs.get('using'))
+
+
+# The saved or reloaded values are the baseline for the instance's next save
+@receiver(post_save, sender=RationComponent)
+@receiver(post_save, sender=RationTable)
+@receiver(post_save, sender=RationTableComponent)
+def refresh_audit_snapshot(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None:
+        take_snapshot(instance, AUDITED_FIELDS[sender])
+    else:
+        update_snapshot(instance, AUDITED_FIELDS[sender], update_fields)
+
+
+# Includes the instance's own soft delete or restore, which write through the queryset
+@receiver(refreshed, sender=RationComponent)
+@receiver(refreshed, sender=RationTable)
+@receiver(refreshed, sender=RationTableComponent)
+def refresh_audit_snapshot_on_reload(sender, instance, fields=None, **kwargs):
+    refresh_audit_snapshot(sender, instance, update_fields=fields)
+
+
+# Signal for refreshing ration table totals after a table component change
+@receiver(post_save, sender=RationTableComponent)
+def refresh_table_component_aggregates(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_refresh_aggregates', False):
+        instance._refresh_aggregates = False
+        previous_table_id = instance.__dict__.pop('_previous_ration_table_id', instance.ration_table_id)
+        RationTableAggregate.refresh({instance.ration_table_id, previous_table_id})
+
+
+# Signal for refreshing ration table totals after a table component is hard deleted
+@receiver(post_delete, sender=RationTableComponent)
+def refresh_aggregates_on_table_component_delete(sender, instance, origin=None, **kwargs):
+    # The table itself is being deleted; its aggregate goes with it
+    if isinstance(origin, RationTable) or getattr(origin, 'model', None) is RationTable:
+        return
+    RationTableAggregate.refresh_for(instance)
+
+
+
+# Signals for set-based soft deletes and restores, which bypass pre_save
+@receiver(soft_deleted)
+def log_bulk_soft_delete(sender, pks, deleted_at, using=None, **kwargs):
+    changed_at = now()
+    if sender is RationComponent:
+        entries = [ComponentChangeLog(component_id=pk, field_name="deleted_at", old_value=None,
+                                      new_value=str(deleted_at), changed_at=changed_at) for pk in pks]
+    elif sender is RationTable:
+        entries = [RationTableLog(ration_table_id=pk, action="Soft Deleted",
+                                  description="RationTable soft deleted.", changed_at=changed_at) for pk in pks]
+    elif sender is RationTableComponent:
+        entries = [RationTableComponentLog(table_component_id=pk, action="Soft Deleted",
+                                           changed_at=changed_at) for pk in pks]
+    else:
+        return
+    record(*entries, using=using)
+
+
+@receiver(restored)
+def log_bulk_restore(sender, deleted_at_by_pk, using=None, **kwargs):
+    changed_at = now()
+    if sender is RationComponent:
+        entries = [ComponentChangeLog(component_id=pk, field_name="deleted_at", old_value=str(deleted_at),
+                                      new_value=None, changed_at=changed_at)
+                   for pk, deleted_at in deleted_at_by_pk.items()]
+    elif sender is RationTable:
+        entries = [RationTableLog(ration_table_id=pk, action="Restored",
+                                  description="RationTable restored.", changed_at=changed_at)
+                   for pk in deleted_at_by_pk]
+    elif sender is RationTableComponent:
+        quantities = RationTableComponent.all_objects.using(using).filter(pk__in=list(deleted_at_by_pk))
+        entries = [RationTableComponentLog(table_component_id=pk, action="Restored", old_quantity=quantity,
+                                           new_quantity=quantity, changed_at=changed_at)
+                   for pk, quantity in quantities.values_list('pk', 'quantity')]
+    else:
+        return
+    record(*entries, using=using)
+
 from django.test import TestCase
 from django.utils.timezone import now
 from rest_framework.test import APIClient
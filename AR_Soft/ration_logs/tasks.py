@@ -0,0 +1,24 @@
+from celery import shared_task
+from ration_logs.as_of import take_snapshots
+from ration_logs.audit import write_rows
+
+
+@shared_task
+def write_audit_logs(payload, using='default'):
+    """
+    Write audit log rows buffered by a committed transaction, one bulk
+    insert per log model. Queued instead of written in the request when
+    ``AUDIT_LOG_ASYNC`` is enabled.
+    """
+    written = write_rows(payload, using)
+    return f"Wrote {written} audit log rows."
+
+
+@shared_task
+def snapshot_ration_tables():
+    """
+    Snapshot every ration table so as-of lookups only replay the logs
+    written since the latest snapshot. Scheduled by Celery beat.
+    """
+    snapshots = take_snapshots()
+    return f"Took {len(snapshots)} ration table snapshots."
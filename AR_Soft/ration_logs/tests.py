@@ -1,51 +1,61 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from ration_components.models import RationComponent, RationTable, RationTableComponent
-from ration_logs.models import ComponentChangeLog, RationTableLog, RationTableComponentLog
-from django.utils.timezone import now
+from ration_logs.as_of import ration_table_as_of, take_snapshots
+from ration_logs.models import ComponentChangeLog, RationTableLog, RationTableComponentLog, RationTableSnapshot
+from django.utils.timezone import now, timedelta
 
 
 class RationComponentsIntegrationTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
 
-        # Create sample RationComponent
-        self.component = RationComponent.objects.create(
-            name="Sample Component",
-            description="A test component",
-            dry_matter=85.0,
-            calori=12.5,
-            nisasta=45.0,
-            price=100.0,
-        )
+        # Creation logs are buffered until the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            # Create sample RationComponent
+            self.component = RationComponent.objects.create(
+                name="Sample Component",
+                description="A test component",
+                dry_matter=85.0,
+                calori=12.5,
+                nisasta=45.0,
+                price=100.0,
+            )
 
-        # Create sample RationTable
-        self.table = RationTable.objects.create(
-            name="Sample Table",
-            description="A test ration table",
-        )
+            # Create sample RationTable
+            self.table = RationTable.objects.create(
+                name="Sample Table",
+                description="A test ration table",
+            )
 
-        # Create sample RationTableComponent
-        self.table_component = RationTableComponent.objects.create(
-            ration_table=self.table,
-            component=self.component,
-            quantity=10.0,
-        )
+            # Create sample RationTableComponent
+            self.table_component = RationTableComponent.objects.create(
+                ration_table=self.table,
+                component=self.component,
+                quantity=10.0,
+            )
 
     def test_create_ration_component_and_log(self):
         """Test creating a RationComponent and logging the initial values."""
-        response = self.client.post(
-            "/api/ration-components/",
-            {
-                "name": "New Component",
-                "description": "A new test component",
-                "dry_matter": 80.0,
-                "calori": 10.0,
-                "nisasta": 50.0,
-                "price": 200.0,
-            },
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/ration-components/",
+                {
+                    "name": "New Component",
+                    "description": "A new test component",
+                    "dry_matter": 80.0,
+                    "calori": 10.0,
+                    "nisasta": 50.0,
+                    "price": 200.0,
+                },
+            )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
         component_id = response.data["id"]
@@ -54,7 +64,8 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_soft_delete_ration_component_and_log(self):
         """Test soft-deleting a RationComponent and creating a log."""
-        response = self.client.delete(f"/api/ration-components/{self.component.id}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/ration-components/{self.component.id}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         log = ComponentChangeLog.objects.filter(
@@ -65,8 +76,9 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_restore_ration_component_and_log(self):
         """Test restoring a soft-deleted RationComponent and logging the restoration."""
-        self.component.delete()
-        response = self.client.post(f"/api/ration-components/{self.component.id}/restore/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.component.delete()
+            response = self.client.post(f"/api/ration-components/{self.component.id}/restore/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         log = ComponentChangeLog.objects.filter(
@@ -77,10 +89,11 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_create_ration_table_and_log(self):
         """Test creating a RationTable and logging the creation."""
-        response = self.client.post(
-            "/api/ration-tables/",
-            {"name": "New Table", "description": "A new test table"},
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/ration-tables/",
+                {"name": "New Table", "description": "A new test table"},
+            )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
         table_id = response.data["id"]
@@ -89,7 +102,8 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_soft_delete_ration_table_and_log(self):
         """Test soft-deleting a RationTable and creating a log."""
-        response = self.client.delete(f"/api/ration-tables/{self.table.id}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/ration-tables/{self.table.id}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         log = RationTableLog.objects.filter(ration_table=self.table, action="Soft Deleted").last()
@@ -97,8 +111,9 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_restore_ration_table_and_log(self):
         """Test restoring a soft-deleted RationTable and logging the restoration."""
-        self.table.delete()
-        response = self.client.post(f"/api/ration-tables/{self.table.id}/restore/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.table.delete()
+            response = self.client.post(f"/api/ration-tables/{self.table.id}/restore/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         log = RationTableLog.objects.filter(ration_table=self.table, action="Restored").last()
@@ -106,15 +121,15 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_create_ration_table_component_and_log(self):
         """Test creating a RationTableComponent and logging the creation."""
-        response = self.client.post(
-            "/api/ration-table-components/",
-            {
-                "ration_table": self.ration_table.id,  # Ensure this ID is unique in combination
-                "component": self.component.id + 1,   # Use a different component ID
-                "quantity": 15.0,
-            },
-        )
-        print("Response JSON:", response.data)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/ration-table-components/",
+                {
+                    "ration_table": self.ration_table.id,  # Ensure this ID is unique in combination
+                    "component": self.component.id + 1,   # Use a different component ID
+                    "quantity": 15.0,
+                },
+            )
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
         table_component_id = response.data["id"]
@@ -125,10 +140,11 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_update_ration_table_component_and_log(self):
         """Test updating a RationTableComponent quantity and logging the update."""
-        response = self.client.patch(
-            f"/api/ration-table-components/{self.table_component.id}/",
-            {"quantity": 20.0},
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/ration-table-components/{self.table_component.id}/",
+                {"quantity": 20.0},
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         log = RationTableComponentLog.objects.filter(
@@ -140,7 +156,8 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_soft_delete_ration_table_component_and_log(self):
         """Test soft-deleting a RationTableComponent and creating a log."""
-        response = self.client.delete(f"/api/ration-table-components/{self.table_component.id}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/ration-table-components/{self.table_component.id}/")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         log = RationTableComponentLog.objects.filter(
@@ -150,11 +167,240 @@ class RationComponentsIntegrationTestCase(TestCase):
 
     def test_restore_ration_table_component_and_log(self):
         """Test restoring a soft-deleted RationTableComponent and logging the restoration."""
-        self.table_component.delete()
-        response = self.client.post(f"/api/ration-table-components/{self.table_component.id}/restore/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.table_component.delete()
+            response = self.client.post(f"/api/ration-table-components/{self.table_component.id}/restore/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         log = RationTableComponentLog.objects.filter(
             table_component=self.table_component, action="Restored"
         ).last()
         self.assertIsNotNone(log)
+
+
+class LogPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.component = RationComponent.objects.create(
+                name="Sample Component", dry_matter=85.0, calori=12.5, nisasta=45.0, price=100.0,
+            )
+            for price in (110.0, 120.0, 130.0):
+                self.component.price = price
+                self.component.save()
+
+    def test_component_logs_are_paged_newest_first(self):
+        response = self.client.get(
+            f"/api/component-change-logs/component/{self.component.id}/", {"page_size": 4}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertEqual(response.data["results"][0]["new_value"], "130.00")
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNone(response.data["next"])
+
+
+class AuditPipelineTestCase(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.components = [
+                RationComponent.objects.create(name=f"C{i}", dry_matter=85.0, calori=12.5, nisasta=45.0, price=100.0)
+                for i in range(5)
+            ]
+        self.components = list(RationComponent.objects.filter(pk__in=[c.pk for c in self.components]))
+
+    def test_logs_are_written_on_commit_with_one_insert(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for component in self.components:
+                    component.price = 150.0
+                    component.dry_matter = 90.0
+                    component.save()
+        self.assertFalse(ComponentChangeLog.objects.filter(field_name="price", old_value="100.00").exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(ComponentChangeLog.objects.filter(field_name="price", old_value="100.00").count(), 5)
+
+    def test_diff_needs_no_select(self):
+        component = self.components[0]
+        component.price = 175.0
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks():
+                component.save()
+        self.assertFalse(any(
+            query["sql"].startswith("SELECT") and "ration_components_rationcomponent" in query["sql"]
+            for query in queries
+        ))
+
+    def price_changes(self, component):
+        return list(ComponentChangeLog.objects.filter(component=component, field_name="price")
+                    .exclude(old_value=None).order_by("id").values_list("old_value", "new_value"))
+
+    def test_snapshot_follows_saves_and_refreshes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            component = RationComponent.objects.create(name="New", dry_matter=85.0, calori=12.5,
+                                                       nisasta=45.0, price=100.0)
+            component.price = 110.0
+            component.save()
+            component.price = 120.0
+            component.save()
+        RationComponent.objects.filter(pk=component.pk).update(price=130)
+        component.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            component.price = 140.0
+            component.save()
+
+        self.assertEqual(self.price_changes(component), [
+            ("100.00", "110.00"), ("110.00", "120.00"), ("130.00", "140.00"),
+        ])
+
+    def test_save_after_soft_delete_or_restore_logs_it_once(self):
+        component = self.components[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            component.price = 110.0  # Not saved yet, still logged by the next save
+            component.delete()
+            component.name = "Renamed"
+            component.save()
+            component.restore()
+            component.name = "Renamed again"
+            component.save()
+
+        removals = (ComponentChangeLog.objects.filter(component=component, field_name="deleted_at")
+                    .exclude(old_value=None, new_value=None).order_by("id"))
+        self.assertEqual([(old is None, new is None) for old, new in removals.values_list("old_value", "new_value")],
+                         [(True, False), (False, True)])
+        self.assertEqual(self.price_changes(component), [("100.00", "110.00")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            table = RationTable.objects.create(name="T")
+            row = RationTableComponent.objects.create(ration_table=table, component=self.components[1], quantity=2.0)
+            row.delete()
+            row.save()
+            row.restore()
+            row.save()
+        self.assertEqual(list(RationTableComponentLog.objects.filter(table_component=row)
+                              .order_by("id").values_list("action", flat=True)),
+                         ["Created", "Soft Deleted", "Restored"])
+
+    def test_rolled_back_savepoint_discards_its_logs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.components[0].price = 120.0
+                self.components[0].save()
+                try:
+                    with transaction.atomic():
+                        self.components[1].price = 130.0
+                        self.components[1].save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+
+        logged = set(ComponentChangeLog.objects.filter(field_name="price", old_value="100.00")
+                     .values_list("component_id", flat=True))
+        self.assertEqual(logged, {self.components[0].pk})
+
+    @override_settings(AUDIT_LOG_ASYNC=True)
+    def test_async_flush_queues_serialized_rows(self):
+        from ration_logs.audit import write_rows
+
+        component = self.components[0]
+        component.price = 180.0
+        with mock.patch("ration_logs.tasks.write_audit_logs.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                component.save()
+
+        payload, using = delay.call_args.args
+        self.assertEqual(list(payload), ["ration_logs.ComponentChangeLog"])
+        self.assertEqual(write_rows(payload, using), 1)
+        log = ComponentChangeLog.objects.get(component=component, field_name="price", new_value="180.00")
+        self.assertEqual(log.old_value, "100.00")
+
+
+class RationTableAsOfTestCase(TestCase):
+    """A table's history: priced, re-priced, a quantity changed, a row removed."""
+
+    def setUp(self):
+        self.start = now() - timedelta(days=10)
+        self.clock = self.start
+
+        with mock.patch("ration_logs.signals.now", lambda: self.clock), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.barley = RationComponent.objects.create(
+                name="Barley", dry_matter=88.0, calori=12.0, nisasta=55.0, price=10.00,
+            )
+            self.silage = RationComponent.objects.create(
+                name="Silage", dry_matter=35.0, calori=6.0, nisasta=25.0, price=2.00,
+            )
+            self.table = RationTable.objects.create(name="Finisher")
+            self.barley_row = RationTableComponent.objects.create(
+                ration_table=self.table, component=self.barley, quantity=4.0,
+            )
+            self.silage_row = RationTableComponent.objects.create(
+                ration_table=self.table, component=self.silage, quantity=10.0,
+            )
+
+            self.clock = self.day(1)
+            self.barley.price = 12.50
+            self.barley.save()
+
+            take_snapshots(self.day(1, 12))
+
+            self.clock = self.day(2)
+            self.silage_row.quantity = 5.0
+            self.silage_row.save()
+
+            self.clock = self.day(3)
+            self.silage_row.delete()
+
+    def day(self, offset, hours=0):
+        return self.start + timedelta(days=offset, hours=hours)
+
+    def cost_at(self, at):
+        return ration_table_as_of(self.table, at)["cost"]
+
+    def assertHistory(self):
+        self.assertEqual(self.cost_at(self.day(0, -1)), 0)
+        self.assertEqual(self.cost_at(self.day(0, 1)), Decimal("60.00"))
+        self.assertEqual(self.cost_at(self.day(1, 1)), Decimal("70.00"))
+        self.assertEqual(self.cost_at(self.day(2, 1)), Decimal("60.00"))
+
+        state = ration_table_as_of(self.table, self.day(3, 1))
+        self.assertEqual(state["cost"], Decimal("50.00"))
+        self.assertEqual([line["name"] for line in state["components"]], ["Barley"])
+
+    def test_replays_prices_quantities_and_removals(self):
+        self.assertHistory()
+        RationTableSnapshot.objects.all().delete()
+        self.assertHistory()
+
+    def test_snapshot_bounds_the_lookup_and_survives_hard_deletes(self):
+        with self.assertNumQueries(4):
+            state = ration_table_as_of(self.table, self.day(2, 1))
+        self.assertEqual(state["snapshot_taken_at"], self.day(1, 12))
+        self.assertEqual(state["cost"], Decimal("60.00"))
+
+        # The logs of a hard-deleted row go with it; the snapshot still has it
+        self.barley_row.delete(hard_delete=True)
+        self.assertEqual(self.cost_at(self.day(2, 1)), Decimal("60.00"))
+        self.assertEqual(self.cost_at(self.day(0, 1)), Decimal("20.00"))
+
+    def test_as_of_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("vet", password="secret"))
+        url = f"/api/ration-tables/{self.table.pk}/as-of/"
+
+        response = client.get(url, {"at": self.day(1, 1).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cost"], Decimal("70.00"))
+        self.assertEqual(len(response.data["components"]), 2)
+
+        response = client.get(url, {"at": self.day(3).date().isoformat()})
+        self.assertEqual(response.data["cost"], Decimal("50.00"))
+
+        self.assertEqual(client.get(url, {"at": "last week"}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,44 +1,56 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from AR_Soft.optimizer import OptimizedQuerysetMixin
 from .models import ComponentChangeLog, RationTableLog, RationTableComponentLog
 from .serializers import ComponentChangeLogSerializer, RationTableLogSerializer, RationTableComponentLogSerializer
 
+
+class LogListMixin:
+    """Serialize a filtered log queryset, paginating it when the client asks for pages."""
+
+    def list_logs(self, logs):
+        page = self.paginate_queryset(logs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = self.get_serializer(logs, many=True)
+        return Response(serializer.data)
+
+
 # ViewSet for ComponentChangeLog
-class ComponentChangeLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ComponentChangeLogViewSet(OptimizedQuerysetMixin, LogListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ComponentChangeLog.objects.all().order_by('-changed_at')
     serializer_class = ComponentChangeLogSerializer
+    cursor_ordering = ('-changed_at', 'id')
 
     @action(detail=False, methods=['get'], url_path='component/(?P<component_id>[^/.]+)')
     def logs_by_component(self, request, component_id=None):
         logs = self.queryset.filter(component_id=component_id)
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data)
+        return self.list_logs(logs)
 
 # ViewSet for RationTableLog
-class RationTableLogViewSet(viewsets.ReadOnlyModelViewSet):
+class RationTableLogViewSet(OptimizedQuerysetMixin, LogListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = RationTableLog.objects.all().order_by('-changed_at')
     serializer_class = RationTableLogSerializer
+    cursor_ordering = ('-changed_at', 'id')
 
     @action(detail=False, methods=['get'], url_path='table/(?P<table_id>[^/.]+)')
     def logs_by_table(self, request, table_id=None):
         logs = self.queryset.filter(ration_table_id=table_id)
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data)
+        return self.list_logs(logs)
 
 # ViewSet for RationTableComponentLog
-class RationTableComponentLogViewSet(viewsets.ReadOnlyModelViewSet):
+class RationTableComponentLogViewSet(OptimizedQuerysetMixin, LogListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = RationTableComponentLog.objects.all().order_by('-changed_at')
     serializer_class = RationTableComponentLogSerializer
+    cursor_ordering = ('-changed_at', 'id')
 
     @action(detail=False, methods=['get'], url_path='table-component/(?P<component_id>[^/.]+)')
     def logs_by_table_component(self, request, component_id=None):
         logs = self.queryset.filter(table_component_id=component_id)
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data)
+        return self.list_logs(logs)
 
     @action(detail=False, methods=['get'], url_path='ration-table/(?P<ration_table_id>[^/.]+)')
     def logs_by_ration_table(self, request, ration_table_id=None):
         logs = self.queryset.filter(table_component__ration_table_id=ration_table_id)
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data)
+        return self.list_logs(logs)